@@ -9,6 +9,8 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from config import Config
 from .models.database import init_db
+from .utils.metrics import init_metrics
+from .utils.profiling import ProfileStore, RequestProfiler, init_profiling
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -22,12 +24,29 @@ def create_app(config_class=Config):
     # Initialize database
     init_db(app)
     
+    # Stage timers, Server-Timing headers and /metrics
+    init_metrics(app, service='backend')
+    
+    # Sampling profiles of requests asking for one, served under /api/profiles
+    init_profiling(app, RequestProfiler(
+        ProfileStore(app.config['PROFILE_FOLDER'], app.config['PROFILE_LIMIT']),
+        token=app.config['PROFILE_TOKEN'],
+        sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+        interval=app.config['PROFILE_INTERVAL'],
+    ), service='backend')
+    
     # Import and register blueprints
     from app.routes.models import bp as models_bp
     from app.routes.assemblies import bp as assemblies_bp
+    from app.routes.storage import bp as storage_bp
+    from app.routes.blobs import bp as blobs_bp
+    from app.routes.sync import bp as sync_bp
     
     app.register_blueprint(models_bp, url_prefix='/api')
     app.register_blueprint(assemblies_bp, url_prefix='/api')
+    app.register_blueprint(storage_bp, url_prefix='/api')
+    app.register_blueprint(blobs_bp, url_prefix='/api')
+    app.register_blueprint(sync_bp, url_prefix='/api')
     
     @app.route('/')
     def index():
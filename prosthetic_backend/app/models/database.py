@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, insert, select, text, update
 
 db = SQLAlchemy()
 
@@ -8,6 +9,29 @@ def init_db(app):
     # Create all tables
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+
+def upgrade_schema():
+    """Add columns that models gained after their table was created.
+
+    ``create_all`` only creates missing tables; new columns are nullable,
+    so existing rows need no default.
+    """
+    inspector = db.inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            with db.engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+                                        f"{column.type.compile(db.engine.dialect)}"))
+            for index in table.indexes:
+                if column.name in index.columns:
+                    index.create(db.engine, checkfirst=True)
 
 class Part(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -15,6 +39,8 @@ class Part(db.Model):
     type = db.Column(db.String(50), nullable=False)
     file_path = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    revision = db.Column(db.Integer, index=True)
     model_metadata = db.Column(db.JSON)
     assemblies = db.relationship('AssemblyPart', back_populates='part')
 
@@ -24,6 +50,7 @@ class Assembly(db.Model):
     status = db.Column(db.String(50), default='draft')
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    revision = db.Column(db.Integer, index=True)
     merged_file_path = db.Column(db.String(200))
     parts = db.relationship('AssemblyPart', back_populates='assembly')
 
@@ -34,5 +61,50 @@ class AssemblyPart(db.Model):
     position = db.Column(db.JSON)
     rotation = db.Column(db.JSON)
     scale = db.Column(db.JSON)
+    revision = db.Column(db.Integer, index=True)
     assembly = db.relationship('Assembly', back_populates='parts')
-    part = db.relationship('Part', back_populates='assemblies')
\ No newline at end of file
+    part = db.relationship('Part', back_populates='assemblies')
+
+class Tombstone(db.Model):
+    """A deleted row, kept so clients syncing by revision learn of the delete"""
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    revision = db.Column(db.Integer, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+class SyncState(db.Model):
+    """Single row holding the last change revision handed out"""
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+
+# Models whose changes are numbered for sync, by the name clients know them by
+TRACKED = {Part: 'parts', Assembly: 'assemblies', AssemblyPart: 'assembly_parts'}
+
+def next_revision(session):
+    """Claim the next change revision.
+
+    The counter row stays locked until the transaction ends, so
+    revisions become visible in the order they were handed out.
+    """
+    table = SyncState.__table__
+    if not session.execute(update(table).where(table.c.id == 1).values(revision=table.c.revision + 1)).rowcount:
+        session.execute(insert(table).values(id=1, revision=1))
+    return session.execute(select(table.c.revision).where(table.c.id == 1)).scalar_one()
+
+def current_revision(session):
+    return session.execute(select(SyncState.revision).where(SyncState.id == 1)).scalar() or 0
+
+@event.listens_for(db.session, 'before_flush')
+def _stamp_revisions(session, flush_context, instances):
+    """Give every tracked row written by a flush the same new revision"""
+    changed = [obj for obj in session.new if type(obj) in TRACKED]
+    changed += [obj for obj in session.dirty if type(obj) in TRACKED and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if type(obj) in TRACKED]
+    if not changed and not deleted:
+        return
+    revision = next_revision(session)
+    for obj in changed:
+        obj.revision = revision
+    for obj in deleted:
+        session.add(Tombstone(entity=TRACKED[type(obj)], entity_id=obj.id, revision=revision))
@@ -1,9 +1,49 @@
-from flask import Blueprint, jsonify, request, send_file
+import logging
+import os
+
+from flask import Blueprint, Response, jsonify, redirect, request, send_file, stream_with_context, url_for
+
+from config import Config
 
 from ..models.database import Assembly, Part
 from ..services.assembly_service import AssemblyService
+from ..services.export_service import ExportService
+from ..services.interference_service import InterferenceService
+from ..services.thumbnail_service import ThumbnailService
+from ..utils import blob_storage, thumbnail
 
 bp = Blueprint('assemblies', __name__)
+logger = logging.getLogger(__name__)
+
+def thumbnail_version(assembly):
+    """Every merge writes a new file, so its name versions the thumbnail"""
+    return os.path.splitext(os.path.basename(assembly.merged_file_path))[0] if assembly.merged_file_path else None
+
+def thumbnail_url(assembly):
+    version = thumbnail_version(assembly)
+    return url_for('assemblies.get_assembly_thumbnail', assembly_id=assembly.id, v=version) if version else None
+
+def assembly_json(assembly):
+    return {
+        'id': assembly.id,
+        'name': assembly.name,
+        'status': assembly.status,
+        'created_at': assembly.created_at,
+        'updated_at': assembly.updated_at,
+        'thumbnail_url': thumbnail_url(assembly),
+        'revision': assembly.revision
+    }
+
+def assembly_part_json(assembly_part):
+    return {
+        'id': assembly_part.id,
+        'assembly_id': assembly_part.assembly_id,
+        'part_id': assembly_part.part_id,
+        'position': assembly_part.position,
+        'rotation': assembly_part.rotation,
+        'scale': assembly_part.scale,
+        'revision': assembly_part.revision
+    }
 
 @bp.route('/assemblies', methods=['POST'])
 def create_assembly():
@@ -40,14 +80,7 @@ def update_assembly(assembly_id):
 @bp.route('/assemblies/<int:assembly_id>', methods=['DELETE'])
 def delete_assembly(assembly_id):
     try:
-        # First, delete all associated assembly parts
-        from ..models.database import AssemblyPart, db
-
-        # Delete all related assembly parts first
-        AssemblyPart.query.filter_by(assembly_id=assembly_id).delete()
-        db.session.commit()
-        
-        # Then delete the assembly
+        # Deletes the assembly's parts along with it
         AssemblyService.delete_assembly(assembly_id)
         return jsonify({'message': 'Assembly deleted successfully'}), 200
     except Exception as e:
@@ -76,7 +109,7 @@ def add_part_to_assembly(assembly_id):
             return jsonify({'error': f'Part with ID {part_id} not found'}), 404
             
         # Log part being added for debugging
-        print(f"Adding part {part_id} ({part.name}) to assembly {assembly_id}")
+        logger.debug("Adding part %s (%s) to assembly %s", part_id, part.name, assembly_id)
             
         assembly_part = AssemblyService.add_part_to_assembly(
             assembly_id=assembly_id,
@@ -100,35 +133,96 @@ def add_part_to_assembly(assembly_id):
             'scale': assembly_part.scale
         }), 201
     except Exception as e:
-        print(f"Error adding part to assembly: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception("Error adding part to assembly: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/assemblies/<int:assembly_id>/merge', methods=['POST', 'GET'])
 def merge_assembly(assembly_id):
+    if request.args.get('stream', type=int):
+        return stream_merged_assembly(assembly_id)
     try:
         merged_path = AssemblyService.merge_assembly(assembly_id)
+        if merged_path and request.args.get('format') == 'glb':
+            glb_path, _ = ExportService.export_glb(merged_path)
+            return send_file(glb_path, as_attachment=True, mimetype='model/gltf-binary')
         if merged_path:
             return send_file(merged_path, as_attachment=True)
         return jsonify({'error': 'No parts to merge'}), 400
     except Exception as e:
-        print(f"Error merging assembly: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception("Error merging assembly: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def stream_merged_assembly(assembly_id):
+    try:
+        merge = AssemblyService.stream_merge(assembly_id)
+        if merge is None:
+            return jsonify({'error': 'No parts to merge'}), 400
+    except Exception as e:
+        logger.exception("Error merging assembly: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+    chunks, merged_path, size = merge
+    return Response(stream_with_context(chunks), mimetype='model/stl', headers={
+        'Content-Length': str(size),
+        'Content-Disposition': f'attachment; filename={os.path.basename(merged_path)}',
+    })
+
+@bp.route('/assemblies/<int:assembly_id>/download', methods=['GET'])
+def download_merged_assembly(assembly_id):
+    try:
+        assembly = AssemblyService.get_assembly(assembly_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+    if not assembly.merged_file_path:
+        return jsonify({'error': 'Assembly has not been merged'}), 404
+
+    try:
+        url = blob_storage.url(assembly.merged_file_path)
+        if request.args.get('redirect', type=int):
+            return redirect(url)
+        return jsonify({'url': url, 'expires_in': Config.BLOB_URL_EXPIRES})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/assemblies/<int:assembly_id>/thumbnail', methods=['GET'])
+def get_assembly_thumbnail(assembly_id):
+    image_format = request.args.get('format', 'webp')
+    if image_format not in thumbnail.IMAGE_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(thumbnail.IMAGE_FORMATS)}"}), 400
+
+    try:
+        assembly = AssemblyService.get_assembly(assembly_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+    if not assembly.merged_file_path:
+        return jsonify({'error': 'Assembly has not been merged'}), 404
+
+    try:
+        return ThumbnailService.send(assembly.merged_file_path, image_format,
+                                     thumbnail_version(assembly), request.args.get('v'))
+    except Exception as e:
+        logger.exception("Error rendering thumbnail: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/assemblies/<int:assembly_id>/interference', methods=['GET'])
+def check_interference(assembly_id):
+    tolerance = request.args.get('tolerance', 0.0, type=float)
+    try:
+        assembly = AssemblyService.get_assembly(assembly_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        return jsonify(InterferenceService.check_assembly(assembly, tolerance))
+    except Exception as e:
+        logger.exception("Error checking interference: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/assemblies', methods=['GET'])
 def get_assemblies():
     try:
         assemblies = AssemblyService.get_all_assemblies()
-        return jsonify([{
-            'id': assembly.id,
-            'name': assembly.name,
-            'status': assembly.status,
-            'created_at': assembly.created_at,
-            'updated_at': assembly.updated_at
-        } for assembly in assemblies])
+        return jsonify([assembly_json(assembly) for assembly in assemblies])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -166,7 +260,7 @@ def get_assembly(assembly_id):
                     'scale': assembly_part.scale
                 })
             except Exception as inner_e:
-                print(f"Error processing part {assembly_part.id}: {str(inner_e)}")
+                logger.warning("Error processing part %s: %s", assembly_part.id, inner_e)
                 # Still include the part in the response, but with error info
                 assembly_parts.append({
                     'assembly_part_id': assembly_part.id,
@@ -181,16 +275,7 @@ def get_assembly(assembly_id):
                     'scale': assembly_part.scale
                 })
         
-        return jsonify({
-            'id': assembly.id,
-            'name': assembly.name,
-            'status': assembly.status,
-            'created_at': assembly.created_at,
-            'updated_at': assembly.updated_at,
-            'parts': assembly_parts
-        })
+        return jsonify({**assembly_json(assembly), 'parts': assembly_parts})
     except Exception as e:
-        import traceback
-        print(f"Error in get_assembly: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in get_assembly: %s", e)
         return jsonify({'error': str(e)}), 404
\ No newline at end of file
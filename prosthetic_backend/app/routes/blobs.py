@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify, send_file
+
+from ..utils import blob_storage
+
+bp = Blueprint('blobs', __name__)
+
+@bp.route('/blobs/<token>', methods=['GET'])
+def download_blob(token):
+    """Serve a locally stored file through a signed link from blob_storage.url()"""
+    ref = blob_storage.verify_token(token)
+    if ref is None:
+        return jsonify({'error': 'Invalid or expired download link'}), 403
+
+    try:
+        return send_file(blob_storage.fetch(ref), as_attachment=True)
+    except FileNotFoundError:
+        return jsonify({'error': 'File not found'}), 404
@@ -1,6 +1,12 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, redirect, send_file, url_for
+from ..services.export_service import ExportService
+from ..services.matching_service import MatchingService
 from ..services.model_service import ModelService
+from ..services.scaling_service import ScalingService
+from ..services.thumbnail_service import ThumbnailService
 from ..models.database import Part
+from ..utils import blob_storage, thumbnail
+from config import Config
 from werkzeug.utils import secure_filename
 import os
 
@@ -10,6 +16,30 @@ def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'stl', 'obj'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def thumbnail_url(part):
+    """Versioned thumbnail URL, or None for parts rendered before thumbnails existed"""
+    version = (part.model_metadata or {}).get('thumbnail')
+    return url_for('models.get_part_thumbnail', part_id=part.id, v=version) if version else None
+
+# Metadata only the server reads; the descriptor alone is a few kilobytes per part
+_SERVER_METADATA = ('shape_descriptor',)
+
+def client_metadata(metadata):
+    if metadata is None:
+        return None
+    return {key: value for key, value in metadata.items() if key not in _SERVER_METADATA}
+
+def part_json(part):
+    return {
+        'id': part.id,
+        'name': part.name,
+        'type': part.type,
+        'model_metadata': client_metadata(part.model_metadata),
+        'thumbnail_url': thumbnail_url(part),
+        'updated_at': part.updated_at,
+        'revision': part.revision
+    }
+
 @bp.route('/parts', methods=['POST'])
 def upload_part():
     if 'file' not in request.files:
@@ -27,12 +57,7 @@ def upload_part():
     
     try:
         part = ModelService.save_part(file, name, type)
-        return jsonify({
-            'id': part.id,
-            'name': part.name,
-            'type': part.type,
-            'model_metadata': part.model_metadata
-        }), 201
+        return jsonify(part_json(part)), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -40,12 +65,19 @@ def upload_part():
 def get_parts():
     try:
         parts = ModelService.get_all_parts()
-        return jsonify([{
-            'id': part.id,
-            'name': part.name,
-            'type': part.type,
-            'model_metadata': part.model_metadata
-        } for part in parts])
+        return jsonify([part_json(part) for part in parts])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/parts/match', methods=['GET'])
+def match_parts():
+    measurements = {name: request.args.get(name, type=float) for name in ('length', 'circumference', 'width')}
+    if any(value is None or value <= 0 for value in measurements.values()):
+        return jsonify({'error': 'length, circumference and width must be positive numbers (cm)'}), 400
+    k = min(max(request.args.get('k', 5, type=int), 1), Config.MATCH_MAX_RESULTS)
+
+    try:
+        return jsonify(MatchingService.match(measurements, request.args.get('limb'), k))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -53,14 +85,24 @@ def get_parts():
 def get_part(part_id):
     try:
         part = ModelService.get_part(part_id)
-        return jsonify({
-            'id': part.id,
-            'name': part.name,
-            'type': part.type,
-            'model_metadata': part.model_metadata
-        })
+        return jsonify(part_json(part))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+@bp.route('/parts/<int:part_id>/similar', methods=['GET'])
+def get_similar_parts(part_id):
+    try:
+        part = ModelService.get_part(part_id)
     except Exception as e:
         return jsonify({'error': str(e)}), 404
+    k = min(max(request.args.get('k', 10, type=int), 1), Config.MATCH_MAX_RESULTS)
+
+    try:
+        return jsonify(MatchingService.similar(part, k))
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @bp.route('/parts/<int:part_id>', methods=['DELETE'])
 def delete_part(part_id):
@@ -68,4 +110,75 @@ def delete_part(part_id):
         ModelService.delete_part(part_id)
         return jsonify({'message': 'Part deleted successfully'}), 200
     except Exception as e:
-        return jsonify({'error': str(e)}), 404
\ No newline at end of file
+        return jsonify({'error': str(e)}), 404
+
+@bp.route('/parts/<int:part_id>/scaled', methods=['GET'])
+def get_scaled_part(part_id):
+    age = request.args.get('age', type=int)
+    if age is None or age < 0:
+        return jsonify({'error': 'age must be a non-negative integer'}), 400
+
+    try:
+        part = ModelService.get_part(part_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        path, factors, cached = ScalingService.get_scaled_part(part, age, request.args.get('limb'))
+        response = send_file(path, as_attachment=True,
+                             download_name=f"scaled_{os.path.basename(part.file_path)}")
+        response.headers['X-Scale-Factors'] = ','.join(f"{factors[axis]:.4f}" for axis in 'xyz')
+        response.headers['X-Cache'] = 'hit' if cached else 'miss'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/parts/<int:part_id>/glb', methods=['GET'])
+def get_part_glb(part_id):
+    try:
+        part = ModelService.get_part(part_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        path, cached = ExportService.export_glb(part.file_path)
+        response = send_file(path, mimetype='model/gltf-binary')
+        response.headers['X-Cache'] = 'hit' if cached else 'miss'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/parts/<int:part_id>/thumbnail', methods=['GET'])
+def get_part_thumbnail(part_id):
+    image_format = request.args.get('format', 'webp')
+    if image_format not in thumbnail.IMAGE_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(thumbnail.IMAGE_FORMATS)}"}), 400
+
+    try:
+        part = ModelService.get_part(part_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        return ThumbnailService.send(part.file_path, image_format,
+                                     (part.model_metadata or {}).get('thumbnail'), request.args.get('v'))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/parts/<int:part_id>/download', methods=['GET'])
+def download_part(part_id):
+    try:
+        part = ModelService.get_part(part_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        url = blob_storage.url(part.file_path)
+        if request.args.get('redirect', type=int):
+            return redirect(url)
+        return jsonify({'url': url, 'expires_in': Config.BLOB_URL_EXPIRES})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,29 @@
+from flask import Blueprint, jsonify, request
+
+from config import Config
+
+from ..services.storage_service import StorageService
+
+bp = Blueprint('storage', __name__)
+
+@bp.route('/storage', methods=['GET'])
+def get_storage():
+    try:
+        return jsonify({
+            'usage': StorageService.usage(),
+            'last_collection': StorageService.last_run() or None,
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/storage/collect', methods=['POST'])
+def collect_storage():
+    # Callers may wait longer than the configured grace, never less: younger
+    # files may be uploads or merges whose rows are not committed yet
+    grace = request.args.get('grace', type=int)
+    if grace is not None:
+        grace = max(grace, Config.STORAGE_GC_GRACE)
+    try:
+        return jsonify(StorageService.collect(grace=grace))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify, request
+
+from ..services.sync_service import SyncService
+from .assemblies import assembly_json, assembly_part_json
+from .models import part_json
+
+bp = Blueprint('sync', __name__)
+
+SERIALIZERS = {'parts': part_json, 'assemblies': assembly_json, 'assembly_parts': assembly_part_json}
+
+@bp.route('/sync', methods=['GET'])
+def sync():
+    if not request.args.get('since', '0').isdigit():
+        return jsonify({'error': 'since must be a non-negative revision'}), 400
+    since = int(request.args.get('since', 0))
+
+    try:
+        revision, full, changed, deleted = SyncService.changes(since)
+        response = {'revision': revision, 'full': full, 'deleted': deleted}
+        for name, rows in changed.items():
+            response[name] = [SERIALIZERS[name](row) for row in rows]
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
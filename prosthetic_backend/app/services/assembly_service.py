@@ -1,11 +1,28 @@
+import json
+import logging
 import os
+import tempfile
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+
 from config import Config
 
 from ..models.database import Assembly, AssemblyPart, db
+from ..utils import blob_storage, stl
+from ..utils.helpers import run_each
+from ..utils.metrics import stage
+from ..utils.transforms import apply_transform, transform_matrix
 from .blender_service import BlenderService
+from .compaction_service import CompactionService
+from .export_service import ExportService
+from .thumbnail_service import ThumbnailService
+
+logger = logging.getLogger(__name__)
+
+# Triangle records per chunk of a streamed merge (about 3 MB)
+STREAM_CHUNK_TRIANGLES = 65536
 
 
 class AssemblyService:
@@ -31,14 +48,12 @@ class AssemblyService:
         """Delete an assembly and its associated parts"""
         assembly = Assembly.query.get_or_404(assembly_id)
         
-        # Delete any merged file if it exists
-        if assembly.merged_file_path and os.path.exists(assembly.merged_file_path):
-            try:
-                os.remove(assembly.merged_file_path)
-            except Exception as e:
-                print(f"Warning: Could not delete merged file: {e}")
+        # Delete any merged file and its derived copies
+        AssemblyService._discard_merged(assembly.merged_file_path)
         
-        # Delete from database
+        # Delete from database, one row at a time so each leaves a tombstone
+        for assembly_part in assembly.parts:
+            db.session.delete(assembly_part)
         db.session.delete(assembly)
         db.session.commit()
         return True
@@ -97,30 +112,158 @@ class AssemblyService:
             merged_path.parent.mkdir(parents=True, exist_ok=True)
             
             # Use Blender service to merge parts
-            success = BlenderService.merge_assembly(
-                assembly.parts,
-                str(merged_path)
-            )
+            with stage('merge'):
+                success = BlenderService.merge_assembly(
+                    AssemblyService.serialize_parts(assembly.parts),
+                    str(merged_path)
+                )
             
             if success:
+                # Weld the merged soup for the exporters; the STL itself
+                # is returned as Blender wrote it
+                mesh = None
+                try:
+                    mesh, compaction = CompactionService.compact_file(merged_path)
+                    logger.info("Merged assembly %s: %d -> %d vertices", assembly_id,
+                                compaction['vertices_before'], compaction['vertices_after'])
+                except Exception as e:
+                    logger.warning("Could not compact %s: %s", merged_path, e)
+                
+                # Previews of streamed merges are rendered on first request instead
+                with stage('thumbnail'):
+                    try:
+                        ThumbnailService.generate(merged_path, mesh)
+                    except Exception as e:
+                        logger.warning("Could not render a thumbnail of %s: %s", merged_path, e)
+                
                 # Update assembly
-                assembly.merged_file_path = str(merged_path)
+                previous = assembly.merged_file_path
+                with stage('store'):
+                    assembly.merged_file_path = blob_storage.put(merged_path, 'merged')
                 assembly.status = 'complete'
                 assembly.updated_at = datetime.utcnow()
-                db.session.commit()
+                with stage('db'):
+                    db.session.commit()
+                
+                # The superseded merge is no longer referenced by any row
+                if previous != assembly.merged_file_path:
+                    AssemblyService._discard_merged(previous)
                 
                 return str(merged_path)
             else:
                 raise Exception("Failed to merge assembly")
             
         except Exception as e:
-            print(f"Error merging assembly: {str(e)}")
+            logger.error("Error merging assembly: %s", e)
             raise
 
+    @staticmethod
+    def stream_merge(assembly_id):
+        """Merge an assembly one part at a time while streaming the STL.
+
+        Returns (chunks, merged path, total bytes) or None without parts.
+        The triangle count comes from the face counts recorded at upload,
+        so the header goes out before any part is loaded; each part is
+        then transformed and its records are written to the merged file
+        and yielded together. A part whose mesh no longer has its recorded
+        count fails the stream rather than break the promised length.
+        """
+        assembly = Assembly.query.get_or_404(assembly_id)
+        if not assembly.parts:
+            return None
+
+        placements = [(assembly_part.part.file_path,
+                       transform_matrix(assembly_part.position, assembly_part.rotation, assembly_part.scale))
+                      for assembly_part in assembly.parts]
+        with stage('count'):
+            counts = {}
+            for assembly_part in assembly.parts:
+                part = assembly_part.part
+                compaction = (part.model_metadata or {}).get('compaction') or {}
+                if part.file_path not in counts:
+                    # Parts whose compaction failed at upload are counted from their cache
+                    counts[part.file_path] = compaction.get('faces_after') or CompactionService.face_count(
+                        part.file_path)
+        total = sum(counts[path] for path, _ in placements)
+
+        merged_filename = f"merged_{assembly_id}_{int(datetime.utcnow().timestamp())}.stl"
+        merged_path = Path(Config.MERGED_FOLDER) / merged_filename
+        merged_path.parent.mkdir(parents=True, exist_ok=True)
+
+        def chunks():
+            fd, tmp_path = tempfile.mkstemp(dir=merged_path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    head = stl.stl_header(total, f"prosthetic assembly {assembly_id}".encode())
+                    f.write(head)
+                    yield head
+                    for data in AssemblyService._part_records(placements, counts):
+                        f.write(data)
+                        yield data
+                os.replace(tmp_path, merged_path)
+            except BaseException:
+                # Includes the client disconnecting mid-stream
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+            merged = Assembly.query.get(assembly_id)
+            previous = merged.merged_file_path
+            merged.merged_file_path = blob_storage.put(merged_path, 'merged')
+            merged.status = 'complete'
+            merged.updated_at = datetime.utcnow()
+            db.session.commit()
+            if previous != merged.merged_file_path:
+                AssemblyService._discard_merged(previous)
+
+        return chunks(), str(merged_path), stl.HEADER_SIZE + total * stl.TRIANGLE_DTYPE.itemsize
+
+    @staticmethod
+    def _discard_merged(ref):
+        """Delete a merged file and its derived copies, each on its own"""
+        if not ref:
+            return
+        for step, error in run_each((blob_storage.delete, ExportService.delete_glb, CompactionService.delete), ref):
+            logger.warning("Could not delete %s (%s): %s", ref, step.__qualname__, error)
+
+    @staticmethod
+    def _part_records(placements, counts):
+        """Binary STL records for each placed part, in chunks.
+
+        Raises before yielding a part whose face count differs from
+        ``counts``, the counts the STL header was written with.
+        """
+        loaded_path, mesh = None, None
+        for path, matrix in placements:
+            # Assemblies often repeat a part; only the last one is kept loaded
+            if path != loaded_path:
+                mesh, loaded_path = CompactionService.load(path), path
+                if len(mesh.faces) != counts[path]:
+                    raise RuntimeError(f"{Path(path).name} has {len(mesh.faces)} faces, "
+                                       f"{counts[path]} were announced in the STL header")
+            vertices = apply_transform(mesh.vertices, matrix).astype(np.float32)
+            # A mirroring scale turns the faces inside out unless the winding flips too
+            flip = np.linalg.det(matrix[:3, :3]) < 0
+            for start in range(0, len(mesh.faces), STREAM_CHUNK_TRIANGLES):
+                faces = mesh.faces[start:start + STREAM_CHUNK_TRIANGLES]
+                if flip:
+                    faces = faces[:, ::-1]
+                yield stl.triangle_records(vertices[faces]).tobytes()
+
+    @staticmethod
+    def serialize_parts(assembly_parts):
+        """JSON list of part files and transforms, as the Blender script expects"""
+        return json.dumps([{
+            'file_path': str(blob_storage.fetch(assembly_part.part.file_path)),
+            'position': assembly_part.position,
+            'rotation': assembly_part.rotation,
+            'scale': assembly_part.scale
+        } for assembly_part in assembly_parts])
+
     @staticmethod
     def get_all_assemblies():
         """Get all assemblies"""
-        return Assembly.query.all()
+        with stage('db'):
+            return Assembly.query.all()
 
     @staticmethod
     def get_assembly(assembly_id):
@@ -1,9 +1,15 @@
 import json
+import logging
 import os
 import subprocess
+import tempfile
 from datetime import datetime
 from pathlib import Path
 
+from config import Config
+
+logger = logging.getLogger(__name__)
+
 
 class BlenderService:
     @staticmethod
@@ -22,7 +28,7 @@ class BlenderService:
             subprocess.run(cmd, check=True)
             return True
         except subprocess.CalledProcessError as e:
-            print(f"Error running Blender script: {e}")
+            logger.error("Error running Blender script: %s", e)
             return False
 
     @staticmethod
@@ -150,19 +156,19 @@ else:
     print("Error: No objects to export")
     sys.exit(1)
 """
-        # Create a temporary directory for the script
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
+        # Write the script to a scratch file of its own so concurrent merges don't collide
+        temp_dir = Path(Config.TEMP_FOLDER)
+        temp_dir.mkdir(parents=True, exist_ok=True)
         
-        script_path = temp_dir / "merge_script.py"
-        with open(script_path, "w") as f:
+        with tempfile.NamedTemporaryFile("w", dir=temp_dir, prefix="merge_script_", suffix=".py",
+                                         delete=False) as f:
             f.write(script_content)
+        script_path = Path(f.name)
         
         # Prepare assembly data for the script
         assembly_data = []
-        print("Assembly Parts: ", assembly_parts)
+        logger.debug("Assembly parts: %s", assembly_parts)
         for part in json.loads(assembly_parts):
-            print("This is part: ", part)
             assembly_data.append({
                 'file_path': part["file_path"],  # Changed to access the part relationship
                 'position': part["position"],
@@ -173,13 +179,12 @@ else:
         assembly_json = json.dumps(assembly_data)
         
         # Run the Blender script
-        success = BlenderService.run_blender_script(
-            str(script_path),
-            assembly_json,
-            output_path
-        )
-        
-        # Clean up
-        script_path.unlink()
-        
-        return success
\ No newline at end of file
+        try:
+            return BlenderService.run_blender_script(
+                str(script_path),
+                assembly_json,
+                output_path
+            )
+        finally:
+            # Clean up, also when Blender could not be started
+            os.remove(script_path)
\ No newline at end of file
@@ -0,0 +1,87 @@
+import logging
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import trimesh
+
+from config import Config
+
+from ..utils import blob_storage
+from ..utils.compaction import compact
+from ..utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class CompactionService:
+    @staticmethod
+    def cache_path(file_path):
+        """Location of the welded, indexed copy of a model file"""
+        return Path(Config.MESH_CACHE_FOLDER) / f"{Path(file_path).name}.mesh.npz"
+
+    @staticmethod
+    def compact(file_path, mesh):
+        """Weld a parsed mesh, store the indexed result and return (mesh, stats)"""
+        vertices, faces, stats = compact(mesh.vertices, mesh.faces)
+        path = CompactionService.cache_path(file_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, vertices=vertices, faces=faces.astype(np.int32))
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        logger.debug("Compacted %s: %d -> %d vertices", Path(file_path).name,
+                     stats['vertices_before'], stats['vertices_after'])
+        return trimesh.Trimesh(vertices, faces, process=False), stats
+
+    @staticmethod
+    def compact_file(file_path):
+        """Parse and compact a model file, e.g. a merge result"""
+        with stage('fetch'):
+            source = blob_storage.fetch(file_path)
+        with stage('parse'):
+            mesh = trimesh.load(str(source), force='mesh', process=False)
+        with stage('compact'):
+            return CompactionService.compact(file_path, mesh)
+
+    @staticmethod
+    def is_fresh(file_path):
+        path = CompactionService.cache_path(file_path)
+        source = blob_storage.local_path(file_path)
+        # A cache without a local source (e.g. evicted from blob storage's cache) is still current
+        return path.exists() and (not source.exists() or path.stat().st_mtime_ns >= source.stat().st_mtime_ns)
+
+    @staticmethod
+    def load(file_path):
+        """The compacted mesh for a model file, compacting it first if the cache is stale"""
+        if CompactionService.is_fresh(file_path):
+            with np.load(CompactionService.cache_path(file_path)) as data:
+                return trimesh.Trimesh(data['vertices'], data['faces'], process=False)
+        return CompactionService.compact_file(file_path)[0]
+
+    @staticmethod
+    def face_count(file_path):
+        """Faces in the compacted mesh, read from the cached array header"""
+        if not CompactionService.is_fresh(file_path):
+            return len(CompactionService.compact_file(file_path)[0].faces)
+        with zipfile.ZipFile(CompactionService.cache_path(file_path)) as archive, \
+                archive.open('faces.npy') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, _ = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, _ = np.lib.format.read_array_header_2_0(f)
+        return shape[0]
+
+    @staticmethod
+    def delete(file_path):
+        try:
+            os.remove(CompactionService.cache_path(file_path))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,38 @@
+import logging
+import os
+from pathlib import Path
+
+from ..utils import blob_storage
+from ..utils.gltf import write_glb
+from ..utils.metrics import stage
+from .compaction_service import CompactionService
+
+logger = logging.getLogger(__name__)
+
+
+class ExportService:
+    @staticmethod
+    def glb_path(file_path):
+        """GLB exports are cached next to their source file"""
+        return Path(file_path).with_suffix('.glb')
+
+    @staticmethod
+    def export_glb(file_path):
+        """Return (path, cached) for a GLB export of a model file, reusing a fresh one"""
+        source = blob_storage.fetch(file_path)
+        path = ExportService.glb_path(source)
+        if path.exists() and path.stat().st_mtime_ns >= source.stat().st_mtime_ns:
+            return path, True
+
+        mesh = CompactionService.load(file_path)
+        with stage('export'):
+            size = write_glb(path, mesh.vertices, mesh.faces, name=source.stem)
+        logger.info("Exported %s as GLB (%d -> %d bytes)", source.name, source.stat().st_size, size)
+        return path, False
+
+    @staticmethod
+    def delete_glb(file_path):
+        try:
+            os.remove(ExportService.glb_path(blob_storage.local_path(file_path)))
+        except FileNotFoundError:
+            pass
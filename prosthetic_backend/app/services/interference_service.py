@@ -0,0 +1,142 @@
+import logging
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+
+from ..utils import blob_storage
+from ..utils.bvh import MeshBVH, boxes_overlap, contains_points, intersecting_triangles
+from ..utils.metrics import stage
+from ..utils.transforms import apply_transform, transform_matrix
+from .compaction_service import CompactionService
+
+logger = logging.getLogger(__name__)
+
+# Vertices sampled per part for the containment test when no surfaces cross
+_CONTAINMENT_SAMPLES = 5
+
+# Intersecting triangle pairs after which a part pair's search stops
+MAX_CONTACTS = 512
+
+
+@lru_cache(maxsize=64)
+def _load_index(path, mtime_ns):
+    return MeshBVH.load(path)
+
+
+class InterferenceService:
+    @staticmethod
+    def index_path(file_path):
+        """Location of the precomputed BVH for a part file"""
+        return Path(Config.MESH_CACHE_FOLDER) / f"{Path(file_path).name}.bvh.npz"
+
+    @staticmethod
+    def build_index(file_path, mesh=None):
+        """Build and store the BVH for a part file"""
+        if mesh is None:
+            mesh = CompactionService.load(file_path)
+        bvh = MeshBVH.build(mesh.vertices, mesh.faces)
+        bvh.save(InterferenceService.index_path(file_path))
+        return bvh
+
+    @staticmethod
+    def get_index(file_path):
+        """Load a part's BVH, building it first for parts uploaded before indexing"""
+        path = InterferenceService.index_path(file_path)
+        if not path.exists():
+            logger.info("Building missing mesh index for %s", file_path)
+            InterferenceService.build_index(file_path)
+        return _load_index(str(path), path.stat().st_mtime_ns)
+
+    @staticmethod
+    def delete_index(file_path):
+        try:
+            os.remove(InterferenceService.index_path(file_path))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def check_assembly(assembly, tolerance=0.0):
+        """Find overlapping parts of an assembly as placed, without merging"""
+        start = time.perf_counter()
+        placed, skipped = [], []
+        with stage('index'):
+            for assembly_part in assembly.parts:
+                part = assembly_part.part
+                if part is None or not blob_storage.exists(part.file_path):
+                    skipped.append(assembly_part.id)
+                    continue
+                bvh = InterferenceService.get_index(part.file_path)
+                matrix = transform_matrix(assembly_part.position, assembly_part.rotation, assembly_part.scale)
+                placed.append({'assembly_part': assembly_part, 'bvh': bvh, 'matrix': matrix,
+                               'bounds': bvh.world_bounds(matrix), 'triangles': None})
+
+        # Broad phase: every pair of transformed root boxes at once
+        with stage('broad_phase'):
+            lo = np.array([item['bounds'][0] for item in placed]).reshape(-1, 3)
+            hi = np.array([item['bounds'][1] for item in placed]).reshape(-1, 3)
+            overlaps = boxes_overlap(lo[:, None], hi[:, None], lo[None], hi[None])
+            candidates = np.argwhere(np.triu(overlaps, k=1))
+
+        interferences = []
+        with stage('narrow_phase'):
+            for i, j in candidates.tolist():
+                a, b = placed[i], placed[j]
+                faces_a, faces_b = intersecting_triangles(
+                    a['bvh'], a['matrix'], b['bvh'], b['matrix'], tolerance, max_pairs=MAX_CONTACTS)
+                contained = False
+                if not len(faces_a):
+                    contained = InterferenceService._contains(a, b) or InterferenceService._contains(b, a)
+                    if not contained:
+                        continue
+                interferences.append(InterferenceService._describe(
+                    a, b, lo[[i, j]], hi[[i, j]], faces_a, faces_b, contained))
+
+        return {
+            'assembly_id': assembly.id,
+            'parts_checked': len(placed),
+            'skipped_parts': skipped,
+            'candidate_pairs': len(candidates),
+            'interferences': interferences,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    @staticmethod
+    def _contains(outer, inner):
+        """True when sampled vertices of ``inner`` lie inside ``outer``"""
+        if outer['triangles'] is None:
+            outer['triangles'] = outer['bvh'].world_triangles(outer['matrix'])
+        vertices = inner['bvh'].vertices
+        samples = vertices[np.linspace(0, len(vertices) - 1, _CONTAINMENT_SAMPLES).astype(int)]
+        samples = apply_transform(samples, inner['matrix'])
+        inside = contains_points(outer['triangles'], samples)
+        return np.count_nonzero(inside) * 2 > len(inside)
+
+    @staticmethod
+    def _describe(a, b, lo, hi, faces_a, faces_b, contained):
+        overlap_lo = lo.max(axis=0)
+        overlap_hi = hi.min(axis=0)
+        contact_bounds = None
+        if len(faces_a):
+            contact = np.concatenate([a['bvh'].world_triangles(a['matrix'], faces_a),
+                                      b['bvh'].world_triangles(b['matrix'], faces_b)]).reshape(-1, 3)
+            contact_bounds = [contact.min(axis=0).tolist(), contact.max(axis=0).tolist()]
+        return {
+            'parts': [{
+                'assembly_part_id': item['assembly_part'].id,
+                'part_id': item['assembly_part'].part_id,
+                'name': item['assembly_part'].part.name,
+            } for item in (a, b)],
+            'contacts': int(len(faces_a)),
+            'contacts_truncated': len(faces_a) >= MAX_CONTACTS,
+            'contained': bool(contained),
+            # Smallest extent of the overlapping bounds: an upper bound on
+            # how far one part must move along an axis to clear the other
+            'penetration_depth': float(np.maximum(overlap_hi - overlap_lo, 0).min()),
+            'overlap_bounds': [overlap_lo.tolist(), overlap_hi.tolist()],
+            'contact_bounds': contact_bounds,
+        }
@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func
+
+from config import Config
+
+from ..models.database import Part, db
+from ..utils.metrics import stage
+from ..utils import shape_descriptor
+from ..utils.part_index import FEATURES, PartIndex, dimensions
+from ..utils.shape_descriptor import ShapeIndex
+from .scaling_service import ScalingService
+
+logger = logging.getLogger(__name__)
+
+# Indexed parts by id as (limb type, sizes in cm, shape descriptor), the
+# size and shape indexes built from them, the catalog stamp they reflect
+# and when that was last checked
+_state = {'entries': {}, 'index': None, 'shapes': None, 'stamp': None, 'checked': 0.0}
+_lock = threading.Lock()
+
+
+class MatchingService:
+    @staticmethod
+    def part_sizes(metadata):
+        """A part's (length, circumference, width) in centimetres from its metadata"""
+        metadata = metadata or {}
+        sizes = metadata.get('dimensions')
+        if sizes is None:
+            # Parts uploaded before dimensions were recorded: axis-aligned bounds
+            bounds = metadata.get('bounds')
+            if not bounds:
+                return (0.0, 0.0, 0.0)
+            sizes = dimensions(np.ptp(np.asarray(bounds, dtype=np.float64), axis=0))
+        return tuple(sizes[feature] / Config.MODEL_UNITS_PER_CM for feature in FEATURES)
+
+    @staticmethod
+    def part_limb(name, file_path):
+        return ScalingService.limb_type_from_name(f"{name} {os.path.basename(file_path)}")
+
+    @staticmethod
+    def entry(part):
+        metadata = part.model_metadata or {}
+        descriptor = metadata.get('shape_descriptor')
+        return (MatchingService.part_limb(part.name, part.file_path), MatchingService.part_sizes(metadata),
+                shape_descriptor.decode(descriptor) if descriptor else None)
+
+    @staticmethod
+    def _load(*criteria):
+        """Index entries for the parts matching ``criteria``"""
+        # Only the indexed fields are read out of the metadata
+        sizes = Part.model_metadata['dimensions']
+        rows = db.session.query(Part.id, Part.name, Part.file_path,
+                                Part.model_metadata['shape_descriptor'].as_string(),
+                                *(sizes[feature].as_float() for feature in FEATURES)).filter(*criteria)
+        entries, legacy = {}, []
+        for part_id, name, file_path, descriptor, *values in rows:
+            if None in values:
+                legacy.append(part_id)
+                values = (0.0, 0.0, 0.0)
+            entries[part_id] = (MatchingService.part_limb(name, file_path),
+                                tuple(value / Config.MODEL_UNITS_PER_CM for value in values),
+                                shape_descriptor.decode(descriptor) if descriptor else None)
+        # Rows without recorded dimensions need their whole metadata
+        for start in range(0, len(legacy), 500):
+            for part_id, metadata in db.session.query(Part.id, Part.model_metadata).filter(
+                    Part.id.in_(legacy[start:start + 500])):
+                limb, _, descriptor = entries[part_id]
+                entries[part_id] = (limb, MatchingService.part_sizes(metadata), descriptor)
+        return entries
+
+    @staticmethod
+    def _sync(count, max_id):
+        """Bring the entries in line with the catalog, loading only what changed"""
+        entries = _state['entries']
+        known_max = max(entries, default=0)
+        entries.update(MatchingService._load(Part.id > known_max))
+        if len(entries) != count:
+            # Parts were deleted, or added by another process below our newest id
+            ids = {part_id for part_id, in db.session.query(Part.id)}
+            for part_id in entries.keys() - ids:
+                del entries[part_id]
+            missing = list(ids - entries.keys())
+            for start in range(0, len(missing), 500):
+                entries.update(MatchingService._load(Part.id.in_(missing[start:start + 500])))
+        _state['index'] = _state['shapes'] = None
+
+    @staticmethod
+    def _refresh(kind):
+        """The ``kind`` index ('index' or 'shapes') for the current catalog"""
+        now = time.monotonic()
+        index = _state[kind]
+        if index is not None and now - _state['checked'] < Config.MATCH_INDEX_CHECK_INTERVAL:
+            return index
+
+        with _lock:
+            # Other workers change the catalog too, so compare against the database
+            stamp = tuple(db.session.query(func.count(Part.id), func.max(Part.id)).one())
+            if stamp != _state['stamp']:
+                with stage('sync'):
+                    MatchingService._sync(*stamp)
+                _state['stamp'] = stamp
+            if _state[kind] is None:
+                entries = _state['entries']
+                with stage('index'):
+                    if kind == 'index':
+                        _state[kind] = PartIndex(list(entries), [entry[0] for entry in entries.values()],
+                                                 [entry[1] for entry in entries.values()])
+                    else:
+                        described = [(part_id, entry[2]) for part_id, entry in entries.items()
+                                     if entry[2] is not None]
+                        _state[kind] = ShapeIndex([part_id for part_id, _ in described],
+                                                  [descriptor for _, descriptor in described])
+                logger.debug("Built the %s index over %d parts", kind, _state[kind].size)
+            _state['checked'] = now
+            return _state[kind]
+
+    @staticmethod
+    def get_index():
+        """The size index for the current catalog, refreshed when parts were added or removed"""
+        return MatchingService._refresh('index')
+
+    @staticmethod
+    def get_shape_index():
+        return MatchingService._refresh('shapes')
+
+    @staticmethod
+    def add(part):
+        """Index a newly saved part"""
+        with _lock:
+            _state['entries'][part.id] = MatchingService.entry(part)
+            _state['index'] = _state['shapes'] = None
+
+    @staticmethod
+    def remove(part_id):
+        with _lock:
+            if _state['entries'].pop(part_id, None) is not None:
+                _state['index'] = _state['shapes'] = None
+
+    @staticmethod
+    def invalidate():
+        """Drop everything; the next lookup reloads the whole catalog"""
+        with _lock:
+            _state.update({'entries': {}, 'index': None, 'shapes': None, 'stamp': None})
+
+    @staticmethod
+    def match(measurements, limb=None, k=5):
+        """The ``k`` parts closest to ``measurements`` (cm) with the scale factors that fit them"""
+        limb_type = ScalingService.limb_type_from_name(limb) if limb else 'generic'
+        index = MatchingService.get_index()
+        with stage('query'):
+            target = np.array([measurements[feature] for feature in FEATURES], dtype=np.float64)
+            hits = index.query(target, k, None if limb_type == 'generic' else limb_type)
+
+        with stage('db'):
+            parts = {part.id: part for part in Part.query.filter(Part.id.in_([part_id for part_id, _, _ in hits]))}
+        matches = []
+        for part_id, sizes, distance in hits:
+            part = parts.get(part_id)
+            if part is None:
+                continue
+            factors = target / sizes
+            matches.append({
+                'id': part.id,
+                'name': part.name,
+                'type': part.type,
+                'dimensions': {feature: round(float(value), 3) for feature, value in zip(FEATURES, sizes)},
+                'scale_factors': {
+                    **{feature: round(float(value), 4) for feature, value in zip(FEATURES, factors)},
+                    'uniform': round(float(np.exp(np.log(factors).mean())), 4),
+                },
+                'distance': round(distance, 4),
+            })
+        return {'limb_type': limb_type, 'index_size': index.size, 'matches': matches}
+
+    @staticmethod
+    def similar(part, k=10):
+        """The ``k`` parts whose shape descriptors are closest to ``part``'s"""
+        descriptor = (part.model_metadata or {}).get('shape_descriptor')
+        if descriptor is None:
+            raise LookupError('No shape descriptor recorded for this part')
+        index = MatchingService.get_shape_index()
+        with stage('query'):
+            hits = index.query(shape_descriptor.decode(descriptor), k, exclude=part.id)
+
+        with stage('db'):
+            parts = {row.id: row for row in Part.query.filter(Part.id.in_([part_id for part_id, _ in hits]))}
+        return {
+            'id': part.id,
+            'index_size': index.size,
+            'similar': [{
+                'id': part_id,
+                'name': parts[part_id].name,
+                'type': parts[part_id].type,
+                'distance': round(distance, 4),
+            } for part_id, distance in hits if part_id in parts],
+        }
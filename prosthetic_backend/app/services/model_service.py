@@ -1,9 +1,22 @@
+import logging
+
 import trimesh
 import numpy as np
 from datetime import datetime
 from pathlib import Path
 from ..models.database import db, Part
 from config import Config
+from ..utils import blob_storage, shape_descriptor
+from ..utils.helpers import run_each
+from ..utils.metrics import stage
+from ..utils.part_index import dimensions, principal_extents
+from .compaction_service import CompactionService
+from .export_service import ExportService
+from .interference_service import InterferenceService
+from .matching_service import MatchingService
+from .thumbnail_service import ThumbnailService
+
+logger = logging.getLogger(__name__)
 
 class ModelService:
     @staticmethod
@@ -16,42 +29,98 @@ class ModelService:
         filepath.parent.mkdir(parents=True, exist_ok=True)
         
         # Save file
-        file.save(str(filepath))
+        with stage('save'):
+            file.save(str(filepath))
+        
+        with stage('parse'):
+            mesh = ModelService.load_mesh(filepath, process=False)
+        
+        # Weld the triangle soup and cache the indexed mesh; on failure the
+        # parsed mesh is used as is
+        compaction = None
+        with stage('compact'):
+            try:
+                mesh, compaction = CompactionService.compact(filepath, mesh)
+            except Exception as e:
+                logger.warning("Could not compact %s: %s", filepath, e)
+        
+        model_metadata = ModelService.extract_metadata(filepath, mesh)
+        if compaction:
+            model_metadata['compaction'] = compaction
+        
+        # Shape descriptor for similarity search, so queries never load meshes
+        with stage('describe'):
+            try:
+                model_metadata['shape_descriptor'] = shape_descriptor.encode(
+                    shape_descriptor.describe(mesh.vertices, mesh.faces))
+            except Exception as e:
+                logger.warning("Could not describe %s: %s", filepath, e)
+        
+        # Render the preview now so list screens only ever serve cached images
+        with stage('thumbnail'):
+            try:
+                model_metadata['thumbnail'] = ThumbnailService.generate(filepath, mesh)
+            except Exception as e:
+                logger.warning("Could not render a thumbnail of %s: %s", filepath, e)
+        
+        # Precompute the spatial index used by interference checks; a
+        # failure here only means it is built on first use instead
+        with stage('index'):
+            try:
+                InterferenceService.build_index(filepath, mesh)
+            except Exception as e:
+                logger.warning("Could not index %s: %s", filepath, e)
+        
+        # Hand the file to blob storage; the local copy stays as its cache
+        with stage('store'):
+            file_ref = blob_storage.put(filepath, 'uploads')
         
         # Create database entry
         part = Part(
             name=name,
             type=type,
-            file_path=str(filepath),
-            model_metadata=ModelService.extract_metadata(filepath)  # Changed from metadata to model_metadata
+            file_path=file_ref,
+            model_metadata=model_metadata  # Changed from metadata to model_metadata
         )
-        db.session.add(part)
-        db.session.commit()
+        with stage('db'):
+            db.session.add(part)
+            db.session.commit()
+        MatchingService.add(part)
         
         return part
 
     @staticmethod
-    def extract_metadata(filepath):
-        """Extract metadata from 3D model file"""
-        mesh = trimesh.load(str(filepath))
+    def load_mesh(filepath, process=True):
+        """Load a 3D model file as a single mesh"""
+        mesh = trimesh.load(str(filepath), process=process)
 
         if isinstance(mesh, trimesh.Scene):
             if not mesh.geometry:  # No mesh data found
                 raise ValueError("No geometry found in the provided scene file.")
             # Merge all meshes in the scene into one, or pick the first available mesh
             mesh = trimesh.util.concatenate(list(mesh.geometry.values()))
+        return mesh
+
+    @staticmethod
+    def extract_metadata(filepath, mesh=None):
+        """Extract metadata from 3D model file"""
+        if mesh is None:
+            mesh = ModelService.load_mesh(filepath)
 
         return {
             'vertices': len(mesh.vertices),
             'faces': len(mesh.faces),
             'bounds': mesh.bounds if isinstance(mesh.bounds, list) else mesh.bounds.tolist(),
-            'center_mass': mesh.center_mass if isinstance(mesh.center_mass, list) else mesh.center_mass.tolist()
+            'center_mass': mesh.center_mass if isinstance(mesh.center_mass, list) else mesh.center_mass.tolist(),
+            # Principal-axis sizes in model units, for matching parts to measurements
+            'dimensions': dimensions(principal_extents(mesh.vertices))
         }
 
     @staticmethod
     def get_all_parts():
         """Get all parts from database"""
-        return Part.query.all()
+        with stage('db'):
+            return Part.query.all()
 
     @staticmethod
     def get_part(part_id):
@@ -63,14 +132,16 @@ class ModelService:
         """Delete a part and its associated file"""
         part = Part.query.get_or_404(part_id)
         
-        # Delete file
-        try:
-            Path(part.file_path).unlink(missing_ok=True)
-        except Exception as e:
-            print(f"Error deleting file: {e}")
+        # Delete the file and what was derived from it, each on its own so
+        # one failure does not leave the rest behind; left-over files are
+        # removed by the next storage collection
+        for step, error in run_each((blob_storage.delete, InterferenceService.delete_index,
+                                     ExportService.delete_glb, CompactionService.delete), part.file_path):
+            logger.warning("Could not delete %s (%s): %s", part.file_path, step.__qualname__, error)
         
         # Delete database entry
         db.session.delete(part)
         db.session.commit()
+        MatchingService.remove(part_id)
         
         return True
\ No newline at end of file
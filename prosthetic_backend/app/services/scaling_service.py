@@ -0,0 +1,109 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import trimesh
+
+from config import Config
+
+from ..utils import blob_storage
+from ..utils.helpers import file_sha256
+from ..utils.metrics import stage
+from ..utils import stl
+
+logger = logging.getLogger(__name__)
+
+# (upper age bound, scale factor); mirrors lib/utils/prosthetic_scaler.dart
+AGE_BRACKETS = (
+    (6, 0.5),       # Children under 6
+    (12, 0.7),      # Children 6-11
+    (18, 0.85),     # Teenagers
+    (30, 1.0),      # Young adults
+    (65, 0.98),     # Adults
+)
+SENIOR_FACTOR = 0.95
+
+# Per-axis multipliers on the age factor, checked in order against the limb type
+LIMB_ADJUSTMENTS = (
+    ('arm', {'x': 0.9, 'y': 1.1}),     # Arms are longer and thinner
+    ('leg', {'x': 0.95, 'y': 1.2}),    # Legs are longer, slightly thinner
+    ('hand', {'x': 0.8, 'y': 0.8}),    # Hands are smaller
+    ('foot', {'x': 1.1, 'y': 0.7}),    # Feet are wider and flatter
+)
+
+LIMB_KEYWORDS = (
+    ('arm', ('arm', 'hand', 'elbow', 'wrist')),
+    ('leg', ('leg', 'foot', 'knee', 'ankle')),
+    ('hand', ('cyborg',)),  # Special case for the Cyborg Beast model
+)
+
+
+class ScalingService:
+    @staticmethod
+    def scale_factors(age, limb_type):
+        """Per-axis scale factors for a patient's age and limb type"""
+        factor = next((value for bound, value in AGE_BRACKETS if age < bound), SENIOR_FACTOR)
+        factors = {'x': factor, 'y': factor, 'z': factor}
+        limb_type = limb_type.lower()
+        for keyword, adjustment in LIMB_ADJUSTMENTS:
+            if keyword in limb_type:
+                factors.update({axis: factor * value for axis, value in adjustment.items()})
+                break
+        return factors
+
+    @staticmethod
+    def limb_type_from_path(path):
+        """Guess the limb type from a model's file name"""
+        return ScalingService.limb_type_from_name(Path(path).name)
+
+    @staticmethod
+    def limb_type_from_name(name):
+        """Limb type for a name such as a file name or a limb like 'Left_Knee'"""
+        name = name.lower()
+        for limb_type, keywords in LIMB_KEYWORDS:
+            if any(keyword in name for keyword in keywords):
+                return limb_type
+        return 'generic'
+
+    @staticmethod
+    def cache_path(part, factors):
+        """Scaled variants are keyed by the part's content and the scale vector"""
+        source = blob_storage.fetch(part.file_path)
+        vector = '_'.join(f"{factors[axis]:.4f}" for axis in 'xyz')
+        return Path(Config.MESH_CACHE_FOLDER) / 'scaled' / f"{file_sha256(source)}_{vector}{source.suffix.lower()}"
+
+    @staticmethod
+    def get_scaled_part(part, age, limb_type=None):
+        """Return (path, factors, cached) for a part scaled for a patient"""
+        limb_type = limb_type or ScalingService.limb_type_from_path(part.file_path)
+        factors = ScalingService.scale_factors(age, limb_type)
+        with stage('hash'):
+            path = ScalingService.cache_path(part, factors)
+        if path.exists():
+            return path, factors, True
+
+        with stage('scale'):
+            ScalingService.scale_file(blob_storage.fetch(part.file_path), path, [factors[axis] for axis in 'xyz'])
+        return path, factors, False
+
+    @staticmethod
+    def scale_file(source, destination, scale):
+        """Write a copy of ``source`` scaled per axis"""
+        scale = np.asarray(scale, dtype=np.float32)
+        if stl.is_binary_stl(source):
+            header, triangles = stl.read_binary_stl(source)
+            triangles['vertices'] *= scale
+            # Normals take the inverse-transpose of the scale, then renormalize
+            normals = triangles['normal'] / scale
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            triangles['normal'] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+            stl.write_binary_stl(destination, triangles, header)
+            return
+
+        # ASCII STL and OBJ go through trimesh
+        mesh = trimesh.load(str(source), force='mesh')
+        mesh.vertices *= scale
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = destination.with_name(destination.name + '.tmp')
+        mesh.export(str(tmp_path), file_type=destination.suffix.lstrip('.'))
+        tmp_path.replace(destination)
@@ -0,0 +1,264 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from config import Config
+
+from ..models.database import Assembly, Part, db, next_revision
+from ..utils import blob_storage
+from ..utils.helpers import file_sha256
+from ..utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Derived files in the mesh cache are named after their source file
+_CACHE_SUFFIXES = ('.bvh.npz', '.mesh.npz')
+
+# Evict down to this fraction of a quota so eviction does not run on every pass
+_QUOTA_TARGET = 0.9
+
+# Report of the most recent collection pass, for /api/storage and /metrics
+_last_run = {}
+
+
+def _folders():
+    return {
+        'uploads': Path(Config.UPLOAD_FOLDER),
+        'merged': Path(Config.MERGED_FOLDER),
+        'mesh_cache': Path(Config.MESH_CACHE_FOLDER),
+        'temp': Path(Config.TEMP_FOLDER),
+    }
+
+
+def _quotas():
+    return {'merged': Config.MERGED_QUOTA_BYTES, 'mesh_cache': Config.MESH_CACHE_QUOTA_BYTES}
+
+
+def _walk(folder):
+    """Files under ``folder``, depth first, without building a full listing"""
+    try:
+        entries = os.scandir(folder)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+class _References:
+    """What the database still points at, loaded once per pass"""
+
+    def __init__(self):
+        part_paths = [path for path, in db.session.query(Part.file_path)]
+        merged_paths = [path for path, in db.session.query(Assembly.merged_file_path)
+                        .filter(Assembly.merged_file_path.isnot(None))]
+        self.refs = set(part_paths + merged_paths)
+        # Local files, or the local copies of objects in blob storage
+        self.sources = {os.path.abspath(blob_storage.local_path(ref)) for ref in part_paths + merged_paths}
+        # GLB exports sit next to their source
+        self.sources |= {os.path.splitext(path)[0] + '.glb' for path in self.sources}
+        self.names = {Path(path).name for path in part_paths + merged_paths}
+        self._local_paths = [blob_storage.local_path(ref) for ref in part_paths + merged_paths]
+        self._hashes = None
+
+    def hashes(self):
+        """Content hashes of live files, which key scaled variants and thumbnails"""
+        if self._hashes is None:
+            self._hashes = {file_sha256(path) for path in self._local_paths if os.path.exists(path)}
+        return self._hashes
+
+    def __contains__(self, item):
+        kind, path = item
+        if kind == 'temp':
+            return False
+        if kind != 'mesh_cache':
+            return os.path.abspath(path) in self.sources
+        name = os.path.basename(path)
+        if os.path.basename(os.path.dirname(path)) in ('scaled', 'thumbnails'):
+            return name.split('_', 1)[0] in self.hashes()
+        return any(name.endswith(suffix) and name[:-len(suffix)] in self.names for suffix in _CACHE_SUFFIXES)
+
+
+class StorageService:
+    @staticmethod
+    def usage():
+        """File count, bytes and quota per storage folder"""
+        quotas = _quotas()
+        usage = {}
+        for kind, folder in _folders().items():
+            files = total = 0
+            for entry in _walk(folder):
+                files += 1
+                total += entry.stat().st_size
+            usage[kind] = {'path': str(folder), 'files': files, 'bytes': total, 'quota_bytes': quotas.get(kind)}
+        return usage
+
+    @staticmethod
+    def last_run():
+        return dict(_last_run)
+
+    @staticmethod
+    def collect(grace=None, batch_size=None, pause=0.0):
+        """Delete orphaned files, then evict least recently used ones over quota.
+
+        A file is orphaned when nothing in the database refers to it, directly
+        or as the source it was derived from, and it is older than ``grace``
+        seconds (so uploads and merges still being written are left alone).
+        With S3 storage the bucket is swept the same way. Deletions happen
+        ``batch_size`` at a time with ``pause`` seconds between batches.
+        """
+        grace = Config.STORAGE_GC_GRACE if grace is None else grace
+        batch_size = batch_size or Config.STORAGE_GC_BATCH
+        start = time.perf_counter()
+        report = {'scanned': 0, 'deleted': 0, 'evicted': 0, 'freed_bytes': 0, 'errors': 0}
+
+        references = _References()
+        cutoff = time.time() - grace
+        batch = []
+        for kind, folder in _folders().items():
+            for entry in _walk(folder):
+                report['scanned'] += 1
+                stat = entry.stat()
+                if stat.st_mtime > cutoff or (kind, entry.path) in references:
+                    continue
+                batch.append((entry.path, stat.st_size))
+                if len(batch) >= batch_size:
+                    StorageService._delete(batch, report, 'deleted')
+                    batch = []
+                    time.sleep(pause)
+        StorageService._delete(batch, report, 'deleted')
+        StorageService._collect_objects(references, cutoff, report, batch_size, pause)
+
+        for kind, quota in _quotas().items():
+            if quota:
+                StorageService.enforce_quota(kind, quota, report, batch_size, pause)
+
+        report['usage'] = StorageService.usage()
+        report['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        report['finished_at'] = time.time()
+        _last_run.clear()
+        _last_run.update(report)
+        logger.info("Storage collection: %d deleted, %d evicted, %d bytes freed",
+                    report['deleted'], report['evicted'], report['freed_bytes'])
+        return report
+
+    @staticmethod
+    def _collect_objects(references, cutoff, report, batch_size, pause=0.0):
+        """Delete bucket objects no row refers to, such as superseded merges"""
+        batch = []
+        for category in ('uploads', 'merged'):
+            for ref, size, modified in blob_storage.objects(category):
+                report['scanned'] += 1
+                if modified > cutoff or ref in references.refs:
+                    continue
+                batch.append((ref, size))
+                if len(batch) >= batch_size:
+                    StorageService._delete_objects(batch, report)
+                    batch = []
+                    time.sleep(pause)
+        StorageService._delete_objects(batch, report)
+
+    @staticmethod
+    def enforce_quota(kind, quota, report, batch_size, pause=0.0):
+        """Evict the least recently used files of a folder until it is under quota"""
+        files = []
+        total = 0
+        for entry in _walk(_folders()[kind]):
+            stat = entry.stat()
+            # atime is only coarse under relatime, so a write also counts as a use
+            files.append((max(stat.st_atime, stat.st_mtime), entry.path, stat.st_size))
+            total += stat.st_size
+        if total <= quota:
+            return
+
+        files.sort()
+        target = quota * _QUOTA_TARGET
+        evicted = []
+        for _, path, size in files:
+            if total <= target:
+                break
+            evicted.append((path, size))
+            total -= size
+
+        if kind == 'merged':
+            # Evicted merge results have to be merged again
+            paths = [path for path, _ in evicted]
+            Assembly.query.filter(Assembly.merged_file_path.in_(paths)).update(
+                {'merged_file_path': None, 'revision': next_revision(db.session)}, synchronize_session=False)
+            db.session.commit()
+
+        for start in range(0, len(evicted), batch_size):
+            StorageService._delete(evicted[start:start + batch_size], report, 'evicted')
+            time.sleep(pause)
+
+    @staticmethod
+    def _delete(batch, report, counter):
+        for path, size in batch:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                report['errors'] += 1
+                logger.warning("Could not delete %s: %s", path, e)
+                continue
+            report[counter] += 1
+            report['freed_bytes'] += size
+
+
+    @staticmethod
+    def _delete_objects(batch, report):
+        for ref, size in batch:
+            try:
+                blob_storage.delete(ref)
+            except Exception as e:
+                report['errors'] += 1
+                logger.warning("Could not delete %s: %s", ref, e)
+                continue
+            report['deleted'] += 1
+            report['freed_bytes'] += size
+
+
+class StorageManager:
+    """Runs storage collection periodically on a background thread"""
+
+    def __init__(self, app, interval=None, pause=0.05):
+        self.app = app
+        self.interval = Config.STORAGE_GC_INTERVAL if interval is None else interval
+        self.pause = pause
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name='storage-gc', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    StorageService.collect(pause=self.pause)
+            except Exception as e:
+                logger.exception("Storage collection failed: %s", e)
+
+
+def _usage_gauge(kind):
+    return lambda: _last_run.get('usage', {}).get(kind, {}).get('bytes', 0)
+
+
+for _kind in ('uploads', 'merged', 'mesh_cache', 'temp'):
+    REGISTRY.gauge(f'storage_{_kind}_bytes', f'Bytes in the {_kind} folder at the last storage collection.',
+                   _usage_gauge(_kind))
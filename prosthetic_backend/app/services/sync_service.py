@@ -0,0 +1,36 @@
+from ..models.database import TRACKED, Tombstone, current_revision, db
+from ..utils.metrics import stage
+
+
+class SyncService:
+    @staticmethod
+    def changes(since=0):
+        """Rows changed and ids deleted after revision ``since``.
+
+        Returns (revision, full, changed, deleted) where ``changed`` and
+        ``deleted`` are keyed by entity name. ``since`` of 0, or one ahead
+        of this database (e.g. after a restore), gives a full snapshot
+        with ``full`` set, which replaces what the client holds.
+        """
+        with stage('db'):
+            # Read first: rows committed while the changes are read are sent
+            # again next time rather than missed
+            revision = current_revision(db.session)
+            full = not since or since > revision
+            changed = {}
+            for model, name in TRACKED.items():
+                query = model.query if full else model.query.filter(model.revision > since)
+                changed[name] = query.order_by(model.id).all()
+            deleted = {name: [] for name in TRACKED.values()}
+            if not full:
+                tombstones = (db.session.query(Tombstone.entity, Tombstone.entity_id)
+                              .filter(Tombstone.revision > since).order_by(Tombstone.revision))
+                for entity, entity_id in tombstones:
+                    deleted[entity].append(entity_id)
+
+        for name, rows in changed.items():
+            revision = max([revision] + [row.revision for row in rows if row.revision])
+            # An id reused after its delete (SQLite may do this) is live again
+            live = {row.id for row in rows}
+            deleted[name] = sorted({entity_id for entity_id in deleted[name] if entity_id not in live})
+        return revision, full, changed, deleted
@@ -0,0 +1,70 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from flask import send_file
+
+from config import Config
+
+from ..utils import blob_storage, thumbnail
+from ..utils.helpers import file_sha256
+from ..utils.metrics import stage
+from .compaction_service import CompactionService
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail URLs carry a version; a response to the current one never changes
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class ThumbnailService:
+    @staticmethod
+    def cache_path(content_hash, image_format='webp'):
+        """Thumbnails are cached by the content hash of their model file"""
+        extension, _ = thumbnail.IMAGE_FORMATS[image_format]
+        return Path(Config.MESH_CACHE_FOLDER) / 'thumbnails' / f"{content_hash}_{Config.THUMBNAIL_SIZE}{extension}"
+
+    @staticmethod
+    def generate(file_path, mesh=None):
+        """Render every thumbnail format of a model file; returns its content hash"""
+        content_hash = file_sha256(blob_storage.fetch(file_path))
+        if mesh is None:
+            mesh = CompactionService.load(file_path)
+        with stage('render'):
+            image = thumbnail.render(mesh.vertices, mesh.faces, Config.THUMBNAIL_SIZE)
+        for image_format in thumbnail.IMAGE_FORMATS:
+            path = ThumbnailService.cache_path(content_hash, image_format)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(thumbnail.encode(image, image_format))
+                os.replace(tmp_path, path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        logger.debug("Rendered thumbnail of %s", Path(file_path).name)
+        return content_hash
+
+    @staticmethod
+    def get(file_path, image_format='webp'):
+        """Return (path, content hash) of a model file's thumbnail, rendering it if missing"""
+        content_hash = file_sha256(blob_storage.fetch(file_path))
+        path = ThumbnailService.cache_path(content_hash, image_format)
+        if not path.exists():
+            ThumbnailService.generate(file_path)
+        return path, content_hash
+
+    @staticmethod
+    def send(file_path, image_format, version, requested_version=None):
+        """Response with a model file's thumbnail, conditional on its ETag.
+
+        Requests naming the current ``version`` may be cached forever;
+        others are revalidated.
+        """
+        path, content_hash = ThumbnailService.get(file_path, image_format)
+        _, mimetype = thumbnail.IMAGE_FORMATS[image_format]
+        response = send_file(path, mimetype=mimetype, etag=content_hash, conditional=True, max_age=0)
+        response.headers['Cache-Control'] = IMMUTABLE if requested_version == version else 'no-cache'
+        return response
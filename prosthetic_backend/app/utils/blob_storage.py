@@ -0,0 +1,221 @@
+"""Where part files and merge results live.
+
+Files are referred to by the string kept in ``Part.file_path`` and
+``Assembly.merged_file_path``:
+
+- local storage (the default) keeps absolute paths, as before
+- S3-compatible storage (``BLOB_STORAGE=s3``) uses ``s3://<bucket>/<key>``
+  and the local upload and merged folders become a read-through cache
+
+Mesh processing always works on a local copy from ``fetch``. Downloads go
+through ``url``: a presigned GET straight from the object store, or for
+local storage a signed, expiring link to ``/api/blobs/<token>``. Those
+links need ``SECRET_KEY`` set to something other than its 'dev' default,
+and only ever serve files inside the upload and merged folders.
+
+S3 support needs ``boto3``; ``S3_ENDPOINT_URL`` points it at MinIO or
+another S3-compatible service.
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from flask import url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from config import Config
+
+S3_SCHEME = 's3://'
+
+# Config.SECRET_KEY's development default, which anyone can sign links with
+_DEFAULT_SECRET_KEY = 'dev'
+
+
+def _folder(category):
+    return Path(Config.UPLOAD_FOLDER if category == 'uploads' else Config.MERGED_FOLDER)
+
+
+def _serializer():
+    if not Config.SECRET_KEY or Config.SECRET_KEY == _DEFAULT_SECRET_KEY:
+        raise RuntimeError("Set SECRET_KEY to issue download links for local storage")
+    return URLSafeSerializer(Config.SECRET_KEY, salt='blob-download')
+
+
+def _servable(ref):
+    """Whether ``ref`` is a local file inside the upload or merged folder"""
+    if str(ref).startswith(S3_SCHEME):
+        return False
+    path = Path(ref).resolve()
+    return any(path.is_relative_to(Path(_folder(category)).resolve()) for category in ('uploads', 'merged'))
+
+
+class LocalBlobStore:
+    """Files stay where they were written; refs are their paths"""
+
+    def put(self, path, category):
+        return str(path)
+
+    def local_path(self, ref):
+        return Path(ref)
+
+    def fetch(self, ref):
+        return Path(ref)
+
+    def exists(self, ref):
+        return Path(ref).exists()
+
+    def delete(self, ref):
+        Path(ref).unlink(missing_ok=True)
+
+    def objects(self, category):
+        # Local files are found by walking the folders themselves
+        return iter(())
+
+    def url(self, ref, expires):
+        if not _servable(ref):
+            raise ValueError(f"{ref} is outside the storage folders")
+        token = _serializer().dumps({'ref': ref, 'exp': int(time.time() + expires)})
+        return url_for('blobs.download_blob', token=token, _external=True)
+
+
+class S3BlobStore:
+    """Objects in an S3-compatible bucket, cached in the local folders"""
+
+    def __init__(self, bucket, endpoint_url=None, region=None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("S3 blob storage requires boto3") from e
+        self.bucket = bucket
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    @staticmethod
+    def split(ref):
+        bucket, _, key = ref[len(S3_SCHEME):].partition('/')
+        return bucket, key
+
+    def put(self, path, category):
+        key = f"{category}/{Path(path).name}"
+        self.client.upload_file(str(path), self.bucket, key)
+        return f"{S3_SCHEME}{self.bucket}/{key}"
+
+    def local_path(self, ref):
+        _, key = self.split(ref)
+        category, _, name = key.rpartition('/')
+        return _folder(category) / name
+
+    def fetch(self, ref):
+        path = self.local_path(ref)
+        if not path.exists():
+            bucket, key = self.split(ref)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    self.client.download_fileobj(bucket, key, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        return path
+
+    def exists(self, ref):
+        if self.local_path(ref).exists():
+            return True
+        bucket, key = self.split(ref)
+        try:
+            self.client.head_object(Bucket=bucket, Key=key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def delete(self, ref):
+        bucket, key = self.split(ref)
+        self.client.delete_object(Bucket=bucket, Key=key)
+        try:
+            os.remove(self.local_path(ref))
+        except FileNotFoundError:
+            pass
+
+    def objects(self, category):
+        """(ref, size, modified time) of every object stored under ``category``"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{category}/"):
+            for item in page.get('Contents', ()):
+                yield f"{S3_SCHEME}{self.bucket}/{item['Key']}", item['Size'], item['LastModified'].timestamp()
+
+    def url(self, ref, expires):
+        bucket, key = self.split(ref)
+        return self.client.generate_presigned_url('get_object', ExpiresIn=int(expires), Params={
+            'Bucket': bucket,
+            'Key': key,
+            'ResponseContentDisposition': f'attachment; filename="{Path(key).name}"',
+        })
+
+
+_stores = {}
+
+
+def get_store(ref=None):
+    """The store for ``ref``, or the configured store for new files"""
+    if ref is not None and not str(ref).startswith(S3_SCHEME):
+        kind = 'local'
+    elif ref is not None:
+        kind = 's3'
+    else:
+        kind = Config.BLOB_STORAGE
+    settings = (kind, Config.S3_BUCKET, Config.S3_ENDPOINT_URL, Config.S3_REGION) if kind == 's3' else (kind,)
+    if settings not in _stores:
+        if kind == 's3':
+            _stores[settings] = S3BlobStore(Config.S3_BUCKET, Config.S3_ENDPOINT_URL, Config.S3_REGION)
+        elif kind == 'local':
+            _stores[settings] = LocalBlobStore()
+        else:
+            raise ValueError(f"Unknown blob storage: {kind}")
+    return _stores[settings]
+
+
+def put(path, category):
+    """Store a local file and return its ref"""
+    return get_store().put(path, category)
+
+
+def fetch(ref):
+    """A local path holding the file's content, downloading it if needed"""
+    return get_store(ref).fetch(ref)
+
+
+def local_path(ref):
+    """Where the local copy of ``ref`` is (or would be) kept"""
+    return get_store(ref).local_path(ref)
+
+
+def exists(ref):
+    return get_store(ref).exists(ref)
+
+
+def delete(ref):
+    get_store(ref).delete(ref)
+
+
+def objects(category):
+    """Objects of ``category`` in the configured store that exist outside the local folders"""
+    return get_store().objects(category)
+
+
+def url(ref, expires=None):
+    """A time-limited download URL for ``ref``"""
+    return get_store(ref).url(ref, Config.BLOB_URL_EXPIRES if expires is None else expires)
+
+
+def verify_token(token):
+    """The ref a local download token was issued for, or None if invalid, expired or out of bounds"""
+    try:
+        payload = _serializer().loads(token)
+    except (BadSignature, RuntimeError):
+        return None
+    ref = payload.get('ref')
+    if payload.get('exp', 0) < time.time() or not isinstance(ref, str) or not _servable(ref):
+        return None
+    return ref
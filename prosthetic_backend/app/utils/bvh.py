@@ -0,0 +1,276 @@
+"""Bounding-volume hierarchies over triangle meshes and interference tests.
+
+Triangles are sorted along a Morton curve and grouped into fixed-size
+leaves; the hierarchy is a complete binary tree over those leaves stored
+in heap order, so building, saving and traversing it are all vectorized
+numpy operations. Node boxes are kept in the part's local frame and
+transformed as they are visited, so one hierarchy serves every placement
+of a part.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .transforms import apply_transform
+
+LEAF_SIZE = 4
+
+# Candidate triangle pairs tested per batch in the narrow phase
+PAIR_BATCH = 1 << 16
+
+def _morton_codes(points):
+    """30-bit Morton codes for points quantized to a 1024^3 grid"""
+    lo = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lo, 1e-12)
+    grid = ((points - lo) / extent * 1023).astype(np.uint32)
+    codes = np.zeros(len(points), dtype=np.uint32)
+    for bit in range(10):
+        for axis in range(3):
+            codes |= ((grid[:, axis] >> np.uint32(bit)) & np.uint32(1)) << np.uint32(3 * bit + axis)
+    return codes
+
+
+class MeshBVH:
+    """A triangle mesh with a heap-ordered hierarchy of leaf bounding boxes"""
+
+    def __init__(self, vertices, faces, lo, hi, leaf_size=LEAF_SIZE):
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        self.faces = np.asarray(faces, dtype=np.int64)
+        self.lo = np.asarray(lo, dtype=np.float64)
+        self.hi = np.asarray(hi, dtype=np.float64)
+        self.leaf_size = int(leaf_size)
+        self.n_leaves = (len(self.lo) + 1) // 2
+        self.depth = self.n_leaves.bit_length() - 1
+
+    @classmethod
+    def build(cls, vertices, faces, leaf_size=LEAF_SIZE):
+        vertices = np.asarray(vertices, dtype=np.float64)
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        if not len(faces):
+            raise ValueError("Cannot index a mesh without faces")
+        triangles = vertices[faces]
+
+        order = np.argsort(_morton_codes(triangles.mean(axis=1)), kind='stable')
+        faces = faces[order]
+        triangles = triangles[order]
+
+        starts = np.arange(0, len(faces), leaf_size)
+        n_leaves = 1 << (len(starts) - 1).bit_length()
+        lo = np.full((2 * n_leaves - 1, 3), np.inf)
+        hi = np.full((2 * n_leaves - 1, 3), -np.inf)
+        first = n_leaves - 1
+        tri_lo, tri_hi = _triangle_boxes(triangles)
+        lo[first:first + len(starts)] = np.minimum.reduceat(tri_lo, starts)
+        hi[first:first + len(starts)] = np.maximum.reduceat(tri_hi, starts)
+
+        # Fill parents level by level; padding leaves stay empty (inf, -inf)
+        while first > 0:
+            parent = (first - 1) // 2
+            count = first - parent
+            lo[parent:first] = lo[first:first + 2 * count].reshape(count, 2, 3).min(axis=1)
+            hi[parent:first] = hi[first:first + 2 * count].reshape(count, 2, 3).max(axis=1)
+            first = parent
+        return cls(vertices, faces, lo, hi, leaf_size)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['vertices'], data['faces'], data['lo'], data['hi'], int(data['leaf_size']))
+
+    def save(self, path):
+        """Write the hierarchy atomically as an .npz file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, vertices=self.vertices, faces=self.faces, lo=self.lo, hi=self.hi,
+                         leaf_size=self.leaf_size)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @property
+    def bounds(self):
+        return self.lo[0], self.hi[0]
+
+    def world_boxes(self, matrix, nodes=None):
+        """Axis-aligned boxes of ``nodes`` (default: all) after transforming by ``matrix``.
+
+        Uses the centre/half-extent form, which gives the same box as
+        transforming all eight corners.
+        """
+        lo = self.lo if nodes is None else self.lo[nodes]
+        hi = self.hi if nodes is None else self.hi[nodes]
+        valid = np.all(lo <= hi, axis=-1, keepdims=True)
+        lo, hi = np.where(valid, lo, 0), np.where(valid, hi, 0)
+        center = apply_transform((lo + hi) / 2, matrix)
+        half = (hi - lo) / 2 @ np.abs(matrix[:3, :3]).T
+        return np.where(valid, center - half, np.inf), np.where(valid, center + half, -np.inf)
+
+    def world_bounds(self, matrix):
+        lo, hi = self.world_boxes(matrix, np.zeros(1, dtype=np.int64))
+        return lo[0], hi[0]
+
+    def world_triangles(self, matrix, faces=None):
+        if faces is None:
+            return apply_transform(self.vertices, matrix)[self.faces]
+        return apply_transform(self.vertices[self.faces[faces]].reshape(-1, 3), matrix).reshape(-1, 3, 3)
+
+    def leaf_faces(self, leaves):
+        """(len(leaves), leaf_size) face indices, -1 where a leaf is short"""
+        index = leaves[:, None] * self.leaf_size + np.arange(self.leaf_size)
+        return np.where(index < len(self.faces), index, -1)
+
+
+def boxes_overlap(lo_a, hi_a, lo_b, hi_b):
+    overlap = (lo_a <= hi_b) & (lo_b <= hi_a)
+    return overlap[..., 0] & overlap[..., 1] & overlap[..., 2]
+
+
+def _triangle_boxes(triangles):
+    lo = np.minimum(np.minimum(triangles[:, 0], triangles[:, 1]), triangles[:, 2])
+    hi = np.maximum(np.maximum(triangles[:, 0], triangles[:, 1]), triangles[:, 2])
+    return lo, hi
+
+
+def overlapping_leaves(a, matrix_a, b, matrix_b):
+    """Leaf pairs whose transformed boxes overlap, by simultaneous descent.
+
+    Only the nodes visited are transformed, so the cost follows the size of
+    the overlap rather than the size of the meshes.
+    """
+    i = np.zeros(1, dtype=np.int64)
+    j = np.zeros(1, dtype=np.int64)
+    depth_a = depth_b = 0
+    while True:
+        nodes_a, index_a = np.unique(i, return_inverse=True)
+        nodes_b, index_b = np.unique(j, return_inverse=True)
+        lo_a, hi_a = a.world_boxes(matrix_a, nodes_a)
+        lo_b, hi_b = b.world_boxes(matrix_b, nodes_b)
+        keep = boxes_overlap(lo_a[index_a], hi_a[index_a], lo_b[index_b], hi_b[index_b])
+        i, j = i[keep], j[keep]
+        if not len(i) or (depth_a == a.depth and depth_b == b.depth):
+            break
+        if depth_a < a.depth:
+            i, j = np.concatenate([2 * i + 1, 2 * i + 2]), np.concatenate([j, j])
+            depth_a += 1
+        if depth_b < b.depth:
+            i, j = np.concatenate([i, i]), np.concatenate([2 * j + 1, 2 * j + 2])
+            depth_b += 1
+    return i - (a.n_leaves - 1), j - (b.n_leaves - 1)
+
+
+def _project(axes, triangles):
+    """(min, max) of each triangle's vertices along each of its axes"""
+    projected = axes @ triangles.transpose(0, 2, 1)
+    first, second, third = projected[..., 0], projected[..., 1], projected[..., 2]
+    return np.minimum(np.minimum(first, second), third), np.maximum(np.maximum(first, second), third)
+
+
+def _separated(axes, t1, t2, tolerance):
+    norms = np.sqrt(np.einsum('pad,pad->pa', axes, axes))
+    min1, max1 = _project(axes, t1)
+    min2, max2 = _project(axes, t2)
+    gap = np.maximum(min2 - max1, min1 - max2)
+    # Parallel edges give (near) zero axes, which separate nothing
+    usable = norms > 1e-9 * norms.max(axis=1, keepdims=True)
+    return (usable & (gap >= -tolerance * norms)).any(axis=1)
+
+
+def triangles_intersect(t1, t2, tolerance=0.0):
+    """Separating-axis test for pairs of triangles.
+
+    ``t1`` and ``t2`` are (P, 3, 3). Pairs that only touch, or overlap by
+    no more than ``tolerance`` along some axis, do not count as
+    intersecting. Returns a (P,) bool array.
+    """
+    e1 = np.roll(t1, -1, axis=1) - t1
+    e2 = np.roll(t2, -1, axis=1) - t2
+    n1 = np.cross(e1[:, 0], e1[:, 1])
+    n2 = np.cross(e2[:, 0], e2[:, 1])
+
+    # Face normals first: they reject most candidate pairs cheaply
+    result = ~_separated(np.stack([n1, n2], axis=1), t1, t2, tolerance)
+    rest = np.flatnonzero(result)
+    if len(rest):
+        e1, e2, n1, n2 = e1[rest], e2[rest], n1[rest], n2[rest]
+        axes = np.concatenate([
+            np.cross(e1[:, :, None, :], e2[:, None, :, :]).reshape(-1, 9, 3),
+            # In-plane edge normals separate coplanar triangles
+            np.cross(n1[:, None, :], e1), np.cross(n2[:, None, :], e2),
+        ], axis=1)
+        result[rest] = ~_separated(axes, t1[rest], t2[rest], tolerance)
+    return result
+
+
+def _candidate_faces(bvh, leaves, matrix):
+    """World triangles and boxes for the faces of the given leaves only"""
+    unique, inverse = np.unique(leaves, return_inverse=True)
+    faces = bvh.leaf_faces(unique)
+    present = faces >= 0
+    # Position of each (leaf, slot) in the compact triangle array, -1 if empty
+    slots = np.full(faces.shape, -1, dtype=np.int64)
+    slots[present] = np.arange(np.count_nonzero(present))
+    triangles = bvh.world_triangles(matrix, faces[present])
+    return faces[present], triangles, _triangle_boxes(triangles), slots[inverse]
+
+
+def intersecting_triangles(a, matrix_a, b, matrix_b, tolerance=0.0, max_pairs=None):
+    """Face index pairs (into ``a.faces`` and ``b.faces``) whose placed triangles intersect.
+
+    Stops after the batch in which ``max_pairs`` intersections have been
+    found, so heavily overlapping parts do not cost a full enumeration.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    leaves_a, leaves_b = overlapping_leaves(a, matrix_a, b, matrix_b)
+    if not len(leaves_a):
+        return empty, empty
+
+    faces_a, world_a, (lo_a, hi_a), slots_a = _candidate_faces(a, leaves_a, matrix_a)
+    faces_b, world_b, (lo_b, hi_b), slots_b = _candidate_faces(b, leaves_b, matrix_b)
+    found_a, found_b = [], []
+    found = 0
+    step = max(1, PAIR_BATCH // (a.leaf_size * b.leaf_size))
+    for start in range(0, len(leaves_a), step):
+        ta, tb = np.broadcast_arrays(slots_a[start:start + step, :, None], slots_b[start:start + step, None, :])
+        ta, tb = ta.ravel(), tb.ravel()
+        keep = (ta >= 0) & (tb >= 0)
+        ta, tb = ta[keep], tb[keep]
+        keep = boxes_overlap(lo_a[ta], hi_a[ta], lo_b[tb], hi_b[tb])
+        ta, tb = ta[keep], tb[keep]
+        if len(ta):
+            hit = triangles_intersect(world_a[ta], world_b[tb], tolerance)
+            found_a.append(faces_a[ta[hit]])
+            found_b.append(faces_b[tb[hit]])
+            found += np.count_nonzero(hit)
+            if max_pairs is not None and found >= max_pairs:
+                break
+    if not found_a:
+        return empty, empty
+    return np.concatenate(found_a), np.concatenate(found_b)
+
+
+def contains_points(triangles, points):
+    """Ray-parity inside test of ``points`` against a closed triangle mesh"""
+    direction = np.array([0.5771, 0.5776, 0.5774])
+    v0 = triangles[:, 0]
+    e1 = triangles[:, 1] - v0
+    e2 = triangles[:, 2] - v0
+    h = np.cross(direction, e2)
+    det = np.einsum('fd,fd->f', e1, h)
+    usable = np.abs(det) > 1e-12
+    inv_det = np.where(usable, 1.0 / np.where(usable, det, 1.0), 0.0)
+    inside = []
+    for point in points:
+        s = point - v0
+        u = np.einsum('fd,fd->f', s, h) * inv_det
+        q = np.cross(s, e1)
+        v = (q @ direction) * inv_det
+        t = np.einsum('fd,fd->f', e2, q) * inv_det
+        hits = usable & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > 0)
+        inside.append(np.count_nonzero(hits) % 2 == 1)
+    return np.array(inside, dtype=bool)
@@ -0,0 +1,148 @@
+"""Vertex welding and face clean-up for triangle soups.
+
+Binary STL stores three independent corners per triangle, so a freshly
+parsed part carries every shared vertex about six times. ``compact``
+welds corners that lie within a tolerance of each other, drops faces
+that collapse or repeat, and returns an indexed mesh.
+
+Welding hashes vertices into cells at least ``tolerance`` wide: any two
+vertices closer than that sit in the same or neighbouring cells, so only
+those pairs are measured. Clusters are then joined transitively.
+"""
+import numpy as np
+
+# Default weld distance as a fraction of the bounding box diagonal
+RELATIVE_TOLERANCE = 1e-6
+
+# Grid cells per axis are capped so packed cell keys fit in int64
+_MAX_CELLS = 1 << 20
+
+# Neighbour cell offsets with each unordered pair of cells visited once
+_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+            if (dx, dy, dz) >= (0, 0, 0)]
+
+
+def unique_rows(rows):
+    """Like ``np.unique(rows, axis=0, return_index=True, return_inverse=True)``.
+
+    Sorts with ``lexsort`` over the columns, which is several times faster
+    than the structured comparison ``np.unique`` uses for rows.
+    """
+    order = np.lexsort(rows.T[::-1])
+    ordered = rows[order]
+    starts = np.zeros(len(rows), dtype=bool)
+    starts[:1] = True
+    for column in range(rows.shape[1]):
+        starts[1:] |= ordered[1:, column] != ordered[:-1, column]
+    inverse = np.empty(len(rows), dtype=np.int64)
+    inverse[order] = np.cumsum(starts) - 1
+    first = order[starts]
+    return rows[first], first, inverse
+
+
+def _close_pairs(points, tolerance):
+    """Index pairs (i, j) of points at most ``tolerance`` apart"""
+    lo = points.min(axis=0)
+    cell = max(tolerance, float((points.max(axis=0) - lo).max()) / _MAX_CELLS)
+    # Offset by one cell so neighbours of the first cell stay non-negative
+    grid = np.floor((points - lo) / cell).astype(np.int64) + 1
+    dims = grid.max(axis=0) + 2
+    keys = (grid[:, 0] * dims[1] + grid[:, 1]) * dims[2] + grid[:, 2]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    pairs_i, pairs_j = [], []
+    for dx, dy, dz in _OFFSETS:
+        target = keys + (dx * dims[1] + dy) * dims[2] + dz
+        start = np.searchsorted(sorted_keys, target, side='left')
+        counts = np.searchsorted(sorted_keys, target, side='right') - start
+        total = int(counts.sum())
+        if not total:
+            continue
+        i = np.repeat(np.arange(len(points)), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(start, counts) + within]
+        keep = i < j if (dx, dy, dz) == (0, 0, 0) else np.ones(total, dtype=bool)
+        i, j = i[keep], j[keep]
+        close = np.einsum('ij,ij->i', points[i] - points[j], points[i] - points[j]) <= tolerance ** 2
+        pairs_i.append(i[close])
+        pairs_j.append(j[close])
+    if not pairs_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+def _components(count, i, j):
+    """Smallest member index of each point's connected component"""
+    labels = np.arange(count)
+    while len(i):
+        smaller = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, smaller)
+        np.minimum.at(updated, j, smaller)
+        # Pointer jumping collapses chains before the next pass
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return labels
+
+
+def weld(vertices, tolerance=0.0):
+    """Merge vertices within ``tolerance``; returns (welded vertices, index per input vertex)"""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    # Exact duplicates first: in a triangle soup they are most of the work
+    unique, _, inverse = unique_rows(vertices)
+    if tolerance <= 0 or len(unique) < 2:
+        return unique, inverse
+
+    labels = _components(len(unique), *_close_pairs(unique, tolerance))
+    representatives, remap = np.unique(labels, return_inverse=True)
+    return unique[representatives], remap.reshape(-1)[inverse]
+
+
+def compact(vertices, faces, tolerance=None):
+    """Weld an indexed or soup mesh and drop degenerate and duplicate faces.
+
+    ``tolerance`` defaults to ``RELATIVE_TOLERANCE`` of the bounding box
+    diagonal. Returns (vertices, faces, stats).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    stats = {'vertices_before': len(vertices), 'faces_before': len(faces)}
+    if tolerance is None:
+        extent = [np.ptp(vertices[:, axis]) for axis in range(3)] if len(vertices) else [0.0]
+        diagonal = float(np.linalg.norm(extent))
+        tolerance = diagonal * RELATIVE_TOLERANCE
+
+    vertices, inverse = weld(vertices, tolerance)
+    faces = inverse[faces]
+
+    # Faces that lost a corner to welding, or have no area
+    triangles = vertices[faces]
+    area = np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]), axis=1)
+    degenerate = ((faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2])
+                  | (area == 0))
+    faces = faces[~degenerate]
+
+    # Faces over the same three vertices, whatever their winding; the first is kept
+    _, first, _ = unique_rows(np.sort(faces, axis=1))
+    duplicates = len(faces) - len(first)
+    faces = faces[np.sort(first)]
+
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    vertices = vertices[used]
+
+    stats.update({
+        'vertices_after': len(vertices),
+        'faces_after': len(faces),
+        'degenerate_faces': int(degenerate.sum()),
+        'duplicate_faces': int(duplicates),
+        'tolerance': tolerance,
+    })
+    return vertices, faces, stats
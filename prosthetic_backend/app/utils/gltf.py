@@ -0,0 +1,216 @@
+"""Compact binary glTF (GLB) export for triangle meshes.
+
+Meshes are written indexed and quantized with KHR_mesh_quantization:
+positions as int16 on a uniform grid (dequantized by the node's scale and
+translation) and normals as normalized int8. Corners whose face normal
+is close to the smoothed vertex normal share that normal, so curved
+surfaces weld into one vertex while creases keep their hard edges.
+
+Triangles are ordered along a Morton curve so neighbouring triangles
+reuse recently fetched vertices, vertices are renumbered in order of
+first use, and the mesh is split into primitives of at most 65535
+vertices so every index buffer fits in uint16.
+"""
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .bvh import _morton_codes
+
+# Corners within this angle of the smoothed vertex normal use it
+CREASE_ANGLE = np.radians(30)
+
+MAX_PRIMITIVE_VERTICES = 65535
+
+_BYTE, _SHORT, _UNSIGNED_SHORT = 5120, 5122, 5123
+_ARRAY_BUFFER, _ELEMENT_ARRAY_BUFFER = 34962, 34963
+
+
+def _unit(vectors):
+    lengths = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0)
+
+
+def corner_normals(vertices, faces, crease_angle=CREASE_ANGLE):
+    """(F, 3, 3) normals per triangle corner.
+
+    Each corner averages the area-weighted normals of the faces around its
+    vertex that lie within ``crease_angle`` of its own face, so smooth
+    regions share a normal and creases stay sharp.
+    """
+    triangles = vertices[faces]
+    # Cross product length is twice the area, so sums are area weighted
+    weighted = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+
+    # Corners grouped by vertex; each shift pairs corners that share one
+    order = np.argsort(faces.ravel(), kind='stable')
+    corner_vertex = faces.ravel()[order]
+    corner_weighted = weighted[order // 3]
+    corner_unit = _unit(corner_weighted)
+    total = corner_weighted.copy()
+    threshold = np.cos(crease_angle)
+    for shift in range(1, len(order)):
+        shared = corner_vertex[shift:] == corner_vertex[:-shift]
+        if not shared.any():
+            break
+        close = shared & (np.einsum('ij,ij->i', corner_unit[shift:], corner_unit[:-shift]) >= threshold)
+        total[shift:][close] += corner_weighted[:-shift][close]
+        total[:-shift][close] += corner_weighted[shift:][close]
+
+    normals = np.empty_like(total)
+    normals[order] = _unit(total)
+    return normals.reshape(-1, 3, 3)
+
+
+def quantize(vertices, faces, crease_angle=CREASE_ANGLE):
+    """Quantize and weld a mesh.
+
+    Returns (positions int16 (V, 3), normals int8 (V, 3), faces (F, 3),
+    scale, offset) where ``positions * scale + offset`` recovers the
+    original coordinates.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    triangles = vertices[faces]
+    area = np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]), axis=1)
+    faces = faces[area > 0]
+    lo, hi = vertices.min(axis=0), vertices.max(axis=0)
+    offset = (lo + hi) / 2
+    scale = max(float((hi - lo).max()) / (2 * 32767), 1e-12)
+
+    positions = np.round((vertices - offset) / scale).astype(np.int16)[faces].reshape(-1, 3)
+    normals = np.round(corner_normals(vertices, faces, crease_angle) * 127).astype(np.int8).reshape(-1, 3)
+
+    # Corners that quantize to the same position and normal are one vertex
+    keys = np.empty((len(positions), 9), dtype=np.uint8)
+    keys[:, :6] = positions.view(np.uint8)
+    keys[:, 6:] = normals.view(np.uint8)
+    _, first, inverse = np.unique(keys.view('V9').ravel(), return_index=True, return_inverse=True)
+    faces = inverse.reshape(-1, 3)
+
+    # Drop triangles that collapsed onto a grid point or an edge
+    degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2])
+    return positions[first], normals[first], faces[~degenerate], scale, offset
+
+
+def optimize(positions, faces):
+    """Reorder triangles for locality and vertices by first use"""
+    if not len(faces):
+        return np.arange(0), faces
+    order = np.argsort(_morton_codes(positions[faces].mean(axis=1).astype(np.float64)), kind='stable')
+    faces = faces[order]
+    used, first = np.unique(faces.ravel(), return_index=True)
+    remap = np.empty(len(positions), dtype=np.int64)
+    vertex_order = used[np.argsort(first, kind='stable')]
+    remap[vertex_order] = np.arange(len(vertex_order))
+    return vertex_order, remap[faces]
+
+
+def split_primitives(faces, max_vertices=MAX_PRIMITIVE_VERTICES):
+    """Split consecutive runs of faces so each references at most ``max_vertices``.
+
+    Yields (vertex indices, local faces) per run.
+    """
+    start = 0
+    while start < len(faces):
+        count = min(len(faces) - start, max_vertices)
+        while True:
+            chunk = faces[start:start + count]
+            used, local = np.unique(chunk, return_inverse=True)
+            if len(used) <= max_vertices:
+                break
+            count = max(1, count * max_vertices // len(used) - 1)
+        yield used, local.reshape(-1, 3)
+        start += count
+
+
+class _BufferBuilder:
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self.views = []
+        self.accessors = []
+
+    def add(self, data, target, component_type, accessor_type, count, stride=None, normalized=False, **extra):
+        data = data.tobytes()
+        self.views.append({'buffer': 0, 'byteOffset': self.length, 'byteLength': len(data), 'target': target})
+        if stride:
+            self.views[-1]['byteStride'] = stride
+        padding = -len(data) % 4
+        self.chunks.append(data + b'\0' * padding)
+        self.length += len(data) + padding
+
+        accessor = {'bufferView': len(self.views) - 1, 'componentType': component_type,
+                    'count': int(count), 'type': accessor_type, **extra}
+        if normalized:
+            accessor['normalized'] = True
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def _padded(values, width, dtype):
+    """Pad vec3 rows to ``width`` components so each element is 4-byte aligned"""
+    out = np.zeros((len(values), width), dtype=dtype)
+    out[:, :3] = values
+    return out
+
+
+def to_glb(vertices, faces, name='mesh'):
+    """Encode a triangle mesh as GLB bytes"""
+    positions, normals, faces, scale, offset = quantize(vertices, faces)
+    vertex_order, faces = optimize(positions, faces)
+    positions, normals = positions[vertex_order], normals[vertex_order]
+
+    buffer = _BufferBuilder()
+    primitives = []
+    for used, local in split_primitives(faces):
+        chunk = positions[used]
+        attributes = {
+            'POSITION': buffer.add(_padded(chunk, 4, '<i2'), _ARRAY_BUFFER, _SHORT, 'VEC3', len(used), stride=8,
+                                   min=chunk.min(axis=0).tolist(), max=chunk.max(axis=0).tolist()),
+            'NORMAL': buffer.add(_padded(normals[used], 4, 'i1'), _ARRAY_BUFFER, _BYTE, 'VEC3', len(used),
+                                 stride=4, normalized=True),
+        }
+        indices = buffer.add(local.astype('<u2'), _ELEMENT_ARRAY_BUFFER, _UNSIGNED_SHORT, 'SCALAR', local.size)
+        primitives.append({'attributes': attributes, 'indices': indices, 'mode': 4})
+
+    binary = b''.join(buffer.chunks)
+    document = {
+        'asset': {'version': '2.0', 'generator': 'prosthetic_backend'},
+        'extensionsUsed': ['KHR_mesh_quantization'],
+        'extensionsRequired': ['KHR_mesh_quantization'],
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0, 'name': name, 'scale': [scale] * 3, 'translation': offset.tolist()}],
+        'meshes': [{'name': name, 'primitives': primitives}],
+        'buffers': [{'byteLength': len(binary)}],
+        'bufferViews': buffer.views,
+        'accessors': buffer.accessors,
+    }
+    content = json.dumps(document, separators=(',', ':')).encode()
+    content += b' ' * (-len(content) % 4)
+
+    return b''.join([
+        struct.pack('<4sII', b'glTF', 2, 12 + 8 + len(content) + 8 + len(binary)),
+        struct.pack('<I4s', len(content), b'JSON'), content,
+        struct.pack('<I4s', len(binary), b'BIN\0'), binary,
+    ])
+
+
+def write_glb(path, vertices, faces, name='mesh'):
+    """Write a mesh as GLB atomically"""
+    path = Path(path)
+    data = to_glb(vertices, faces, name)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return len(data)
@@ -0,0 +1,29 @@
+import hashlib
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def _file_sha256(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    """Content hash of a file, memoized until the file changes"""
+    stat = os.stat(path)
+    return _file_sha256(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def run_each(steps, *args):
+    """Call every step with ``args``, carrying on past failures; returns (step, error) for each failure"""
+    failures = []
+    for step in steps:
+        try:
+            step(*args)
+        except Exception as e:
+            failures.append((step, e))
+    return failures
@@ -0,0 +1,39 @@
+"""Flask wiring for ``telemetry.metrics``.
+
+The metrics themselves live in ``telemetry.metrics``, outside this
+package, so the measurement service can use them without importing the
+Flask app; their names are re-exported here for the backend's services.
+"""
+import time
+
+from flask import Response, g, request
+
+from telemetry.metrics import (  # noqa: F401
+    CONTENT_TYPE, DEFAULT_BUCKETS, REGISTRY, REQUEST_SECONDS, STAGE_SECONDS, Gauge, Histogram, Registry,
+    begin_request, record, server_timing, stage,
+)
+
+
+def init_metrics(app, service='backend'):
+    """Register Server-Timing hooks and a /metrics endpoint on a Flask app"""
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_timings = begin_request(service)
+
+    @app.after_request
+    def _add_server_timing(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, service=service, method=request.method,
+                                route=route, status=response.status_code)
+        response.headers['Server-Timing'] = server_timing(g.pop('metrics_timings', []), elapsed)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
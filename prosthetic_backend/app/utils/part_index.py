@@ -0,0 +1,61 @@
+"""Nearest-neighbour lookup of catalog parts by limb measurements.
+
+Parts are described by the three sizes ``calculate_measurements``
+recommends: length, circumference and width, in centimetres. Length is a
+part's largest principal extent; circumference and width describe the
+cross-section across the other two. The KD-trees hold the logarithms of
+the sizes, so the distance from a measurement to a part is the amount of
+scaling needed to fit it, and a part 10% too large is as close as one
+10% too small.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+FEATURES = ('length', 'circumference', 'width')
+
+
+def principal_extents(vertices):
+    """Extents of a point cloud along its principal axes, largest first"""
+    points = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    if len(points) < 2:
+        return np.zeros(3)
+    centered = points - points.mean(axis=0)
+    _, axes = np.linalg.eigh(centered.T @ centered)
+    projected = centered @ axes
+    return np.sort(projected.max(axis=0) - projected.min(axis=0))[::-1]
+
+
+def dimensions(extents):
+    """Length, width, depth and cross-section circumference for three extents"""
+    length, width, depth = sorted((float(value) for value in extents), reverse=True)
+    # Ramanujan's approximation of the perimeter of an ellipse with those axes
+    a, b = width / 2, depth / 2
+    circumference = np.pi * (3 * (a + b) - np.sqrt((3 * a + b) * (a + 3 * b)))
+    return {'length': length, 'width': width, 'depth': depth, 'circumference': float(circumference)}
+
+
+class PartIndex:
+    """KD-trees over log part sizes, one for the whole catalog and one per limb type"""
+
+    def __init__(self, ids, limbs, features):
+        ids = np.asarray(ids, dtype=np.int64)
+        limbs = np.asarray(limbs, dtype=object)
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURES))
+        # Parts without a usable size (flat or empty meshes) cannot be matched
+        valid = (features > 0).all(axis=1)
+        self.size = int(valid.sum())
+        self._trees = {}
+        for limb in {None, *limbs[valid]}:
+            selected = valid if limb is None else valid & (limbs == limb)
+            if selected.any():
+                self._trees[limb] = (cKDTree(np.log(features[selected])), ids[selected], features[selected])
+
+    def query(self, measurements, k=5, limb=None):
+        """[(part id, part sizes, distance)] for the ``k`` parts closest to ``measurements``"""
+        entry = self._trees.get(limb)
+        if entry is None:
+            return []
+        tree, ids, features = entry
+        distances, indices = tree.query(np.log(np.asarray(measurements, dtype=np.float64)), k=min(k, len(ids)))
+        return [(int(ids[i]), features[i], float(distance))
+                for distance, i in zip(np.atleast_1d(distances), np.atleast_1d(indices))]
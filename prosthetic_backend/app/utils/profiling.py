@@ -0,0 +1,80 @@
+"""Flask wiring for ``telemetry.profiling``.
+
+The profiler itself lives in ``telemetry.profiling``, outside this
+package, so the measurement service can use it without importing the
+Flask app; its names are re-exported here for the backend.
+"""
+import functools
+import time
+
+from flask import Response, g, jsonify, request
+
+from telemetry.profiling import (  # noqa: F401
+    FOLDED_CONTENT_TYPE, ID_HEADER, SVG_CONTENT_TYPE, TOKEN_HEADER, Profile, ProfileStore, ProfilingMiddleware,
+    RequestProfiler, flamegraph_title, follow, render_flamegraph,
+)
+
+
+def init_profiling(app, profiler, service='backend'):
+    """Profile selected requests to a Flask app and serve its profiles under /api/profiles.
+
+    Installs nothing unless the profiler is enabled, and the endpoints
+    only with a token to guard them.
+    """
+    if not profiler.enabled:
+        return
+
+    @app.before_request
+    def _start_profile():
+        trigger = profiler.trigger(request.headers)
+        if trigger is not None:
+            g.profile_start = time.perf_counter()
+            g.profile = profiler.start(service, request.method, request.path, trigger)
+
+    @app.after_request
+    def _add_profile_id(response):
+        profile = g.get('profile')
+        if profile is not None:
+            g.profile_status = response.status_code
+            response.headers[ID_HEADER] = profile.id
+        return response
+
+    @app.teardown_request
+    def _finish_profile(error):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.finish(profile, g.pop('profile_status', 500), time.perf_counter() - g.pop('profile_start'))
+
+    if profiler.token is None:
+        return
+
+    def guarded(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not profiler.authorized(request.headers):
+                return jsonify({'error': f'A valid {TOKEN_HEADER} header is required'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+
+    @app.route('/api/profiles')
+    @guarded
+    def list_profiles():
+        return jsonify({'profiles': profiler.store.list()})
+
+    @app.route('/api/profiles/<profile_id>')
+    @guarded
+    def download_profile(profile_id):
+        found = profiler.store.get(profile_id)
+        if found is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return Response(found[1], content_type=FOLDED_CONTENT_TYPE, headers={
+            'Content-Disposition': f'attachment; filename={profile_id}.folded'})
+
+    @app.route('/api/profiles/<profile_id>/flamegraph')
+    @guarded
+    def profile_flamegraph(profile_id):
+        found = profiler.store.get(profile_id)
+        if found is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        metadata, folded = found
+        return Response(render_flamegraph(folded, flamegraph_title(metadata)), content_type=SVG_CONTENT_TYPE)
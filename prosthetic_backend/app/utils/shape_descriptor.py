@@ -0,0 +1,107 @@
+"""Rotation-invariant shape descriptors for finding similar parts.
+
+A descriptor concatenates:
+
+- the D2 shape distribution: a histogram of distances between random
+  pairs of surface points, relative to their mean distance, so it ignores
+  position, rotation and scale. Bins hold square roots of frequencies so
+  Euclidean distance between descriptors is the Hellinger distance.
+- moment invariants of the surface: principal variance ratios and the
+  magnitude of the skew along each principal axis.
+
+Sampling is seeded, so identical geometry always gives the same
+descriptor. Descriptors are stored as base64 float16 (74 bytes).
+"""
+import base64
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+SAMPLES = 4096
+PAIRS = 16384
+BINS = 32
+# D2 distances beyond this multiple of the mean fall in the last bin
+MAX_RELATIVE_DISTANCE = 3.0
+# Weight of the moment invariants against the D2 histogram
+MOMENT_WEIGHT = 0.5
+SIZE = BINS + 5
+
+# The approximate index searches this many principal components, then re-ranks
+_INDEX_COMPONENTS = 8
+
+
+def sample_surface(vertices, faces, count=SAMPLES, seed=0):
+    """``count`` points uniformly distributed over the surface by area"""
+    rng = np.random.default_rng(seed)
+    triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(faces, dtype=np.int64)]
+    edges = triangles[:, 1:] - triangles[:, :1]
+    areas = np.linalg.norm(np.cross(edges[:, 0], edges[:, 1]), axis=1)
+    chosen = np.searchsorted(np.cumsum(areas), rng.random(count) * areas.sum())
+    chosen = np.minimum(chosen, len(triangles) - 1)
+    # Reflect points of the unit square into the triangle
+    u, v = rng.random((2, count))
+    outside = u + v > 1
+    u[outside], v[outside] = 1 - u[outside], 1 - v[outside]
+    return triangles[chosen, 0] + u[:, None] * edges[chosen, 0] + v[:, None] * edges[chosen, 1]
+
+
+def describe(vertices, faces, seed=0):
+    """The descriptor of a triangle mesh as a float32 vector"""
+    points = sample_surface(vertices, faces, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    first, second = rng.integers(0, len(points), (2, PAIRS))
+    distances = np.linalg.norm(points[first] - points[second], axis=1)
+    relative = distances / max(distances.mean(), 1e-12)
+    histogram, _ = np.histogram(np.minimum(relative, MAX_RELATIVE_DISTANCE - 1e-9), bins=BINS,
+                                range=(0, MAX_RELATIVE_DISTANCE))
+
+    centered = points - points.mean(axis=0)
+    variances, axes = np.linalg.eigh(centered.T @ centered / len(points))
+    variances, axes = np.maximum(variances[::-1], 0), axes[:, ::-1]
+    projected = centered @ axes
+    deviations = np.sqrt(np.maximum(variances, 1e-24))
+    skew = np.abs((projected ** 3).mean(axis=0)) / deviations ** 3
+    moments = np.concatenate([np.sqrt(variances[1:] / max(variances[0], 1e-24)), np.tanh(skew)])
+
+    return np.concatenate([np.sqrt(histogram / PAIRS), MOMENT_WEIGHT * moments]).astype(np.float32)
+
+
+def encode(descriptor):
+    return base64.b64encode(np.asarray(descriptor, dtype='<f2').tobytes()).decode('ascii')
+
+
+def decode(text):
+    return np.frombuffer(base64.b64decode(text), dtype='<f2').astype(np.float32)
+
+
+class ShapeIndex:
+    """Approximate nearest neighbours among descriptors.
+
+    A KD-tree over the leading principal components finds candidates,
+    which are re-ranked by distance between the full descriptors.
+    """
+
+    def __init__(self, ids, descriptors):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.descriptors = np.asarray(descriptors, dtype=np.float32).reshape(-1, SIZE)
+        self.size = len(self.ids)
+        self._tree = None
+        if self.size:
+            self._mean = self.descriptors.mean(axis=0)
+            _, _, components = np.linalg.svd(self.descriptors - self._mean, full_matrices=False)
+            self._components = components[:_INDEX_COMPONENTS].T
+            self._tree = cKDTree((self.descriptors - self._mean) @ self._components)
+
+    def query(self, descriptor, k=10, exclude=None, candidates=None):
+        """[(part id, distance)] for the ``k`` parts most similar to ``descriptor``"""
+        if self._tree is None:
+            return []
+        descriptor = np.asarray(descriptor, dtype=np.float32)
+        count = min(self.size, candidates or max(8 * k, 64))
+        _, nearby = self._tree.query((descriptor - self._mean) @ self._components, k=count)
+        nearby = np.atleast_1d(nearby)
+        if exclude is not None:
+            nearby = nearby[self.ids[nearby] != exclude]
+        distances = np.linalg.norm(self.descriptors[nearby] - descriptor, axis=1)
+        order = np.argsort(distances, kind='stable')[:k]
+        return [(int(self.ids[nearby[i]]), float(distances[i])) for i in order]
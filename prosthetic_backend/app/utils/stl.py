@@ -0,0 +1,72 @@
+"""Direct access to binary STL files as numpy record arrays.
+
+A binary STL is an 80-byte header, a little-endian uint32 triangle count
+and one 50-byte record per triangle, so the whole file maps onto a
+structured dtype and can be transformed without building a mesh object.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+HEADER_SIZE = 84
+
+TRIANGLE_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attributes', '<u2'),
+])
+
+
+def is_binary_stl(path):
+    """True when the file size matches the triangle count in its header"""
+    path = Path(path)
+    if path.suffix.lower() != '.stl':
+        return False
+    size = path.stat().st_size
+    if size < HEADER_SIZE:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+    return size == HEADER_SIZE + count * TRIANGLE_DTYPE.itemsize
+
+
+def stl_header(count, text=b''):
+    """The 84 bytes before the triangle records of a binary STL"""
+    return text[:80].ljust(80, b'\0') + np.uint32(count).astype('<u4').tobytes()
+
+
+def read_binary_stl(path):
+    """Return (header bytes, triangle records) for a binary STL file"""
+    with open(path, 'rb') as f:
+        header = f.read(80)
+        count = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        triangles = np.fromfile(f, dtype=TRIANGLE_DTYPE, count=count)
+    return header, triangles
+
+
+def write_binary_stl(path, triangles, header=b''):
+    """Write triangle records atomically"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(stl_header(len(triangles), header))
+            triangles.astype(TRIANGLE_DTYPE, copy=False).tofile(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def triangle_records(triangles):
+    """Triangle records for an (N, 3, 3) array, with normals from the winding"""
+    records = np.zeros(len(triangles), dtype=TRIANGLE_DTYPE)
+    records['vertices'] = triangles
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    records['normal'] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    return records
@@ -0,0 +1,174 @@
+"""Offscreen CPU rendering of mesh thumbnails.
+
+Meshes are drawn with a NumPy z-buffer rasterizer, so no GPU or display
+is needed: an orthographic three-quarter view fitted to the image, flat
+shading from a light near the viewer, and 2x supersampling for smooth
+edges. The background is transparent.
+
+Triangles are rasterized together: each row a triangle covers is
+clipped to the span of pixel centres inside its three edges, every
+pixel in a span becomes a candidate with its interpolated depth, and
+the nearest candidate per pixel wins.
+"""
+import cv2
+import numpy as np
+
+IMAGE_FORMATS = {'png': ('.png', 'image/png'), 'webp': ('.webp', 'image/webp')}
+
+# Direction from the model towards the camera, z up
+VIEW_DIRECTION = np.array([1.0, -1.4, 0.9])
+# Light in view space (x right, y up, z towards the viewer)
+LIGHT = np.array([-0.2, 0.45, 1.0]) / np.linalg.norm([-0.2, 0.45, 1.0])
+AMBIENT = 0.35
+BASE_COLOR = np.array([205, 190, 176], dtype=np.float64)  # BGR
+MARGIN = 0.06
+SUPERSAMPLE = 2
+
+# Candidate pixels depth-tested per pass, bounding memory for large meshes
+_CHUNK = 1 << 20
+# Depth resolution when sorting candidates
+_DEPTH_LEVELS = 1 << 24
+
+
+def _camera():
+    forward = -VIEW_DIRECTION / np.linalg.norm(VIEW_DIRECTION)
+    right = np.cross(forward, [0.0, 0.0, 1.0])
+    right /= np.linalg.norm(right)
+    up = np.cross(right, forward)
+    # Rows map world coordinates to (x right, y up, z towards the viewer)
+    return np.stack([right, up, -forward])
+
+
+def project(vertices, resolution):
+    """Screen (x, y) in pixels and depth (smaller is nearer) of each vertex"""
+    view = (np.asarray(vertices, dtype=np.float64) @ _camera().T)
+    lo, hi = view.min(axis=0), view.max(axis=0)
+    scale = resolution * (1 - 2 * MARGIN) / max(float((hi - lo)[:2].max()), 1e-12)
+    centre = (lo + hi) / 2
+    screen = np.empty_like(view)
+    screen[:, 0] = (view[:, 0] - centre[0]) * scale + resolution / 2
+    screen[:, 1] = resolution / 2 - (view[:, 1] - centre[1]) * scale
+    screen[:, 2] = -view[:, 2]
+    return screen, view
+
+
+def rasterize(triangles, resolution):
+    """Index of the nearest triangle covering each pixel centre (-1 for none).
+
+    ``triangles`` is (F, 3, 3) of screen x, y and depth.
+    """
+    depth = np.full(resolution * resolution, np.inf)
+    owner = np.full(resolution * resolution, -1, dtype=np.int64)
+    x, y, z = triangles[..., 0], triangles[..., 1], triangles[..., 2]
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+
+    # Rows of pixel centres (i + 0.5) each triangle spans
+    y0 = np.clip(np.ceil(y.min(axis=1) - 0.5), 0, resolution).astype(np.int64)
+    y1 = np.clip(np.floor(y.max(axis=1) - 0.5), -1, resolution - 1).astype(np.int64)
+    visible = np.flatnonzero((y1 >= y0) & (area != 0))
+    if not len(visible):
+        return owner.reshape(resolution, resolution)
+    x, y, z, area = x[visible], y[visible], z[visible], area[visible]
+
+    # Each edge function as a*x + b*y + c, scaled by the signed area so a
+    # centre is inside when all three are >= 0; depth is a plane the same way
+    edges = np.empty((len(visible), 3, 3))
+    for i in range(3):
+        j, k = (i + 1) % 3, (i + 2) % 3
+        edges[:, i, 0] = y[:, j] - y[:, k]
+        edges[:, i, 1] = x[:, k] - x[:, j]
+        edges[:, i, 2] = x[:, j] * y[:, k] - x[:, k] * y[:, j]
+    edges /= area[:, None, None]
+    plane = np.einsum('fij,fi->fj', edges, z)
+
+    # Each row's span is where all three edge functions are non-negative
+    rows = y1[visible] - y0[visible] + 1
+    row_face = np.repeat(np.arange(len(visible)), rows)
+    py = y0[visible][row_face] + np.arange(len(row_face)) - np.repeat(np.cumsum(rows) - rows, rows)
+    cy = py + 0.5
+    lo = np.full(len(row_face), 0.0)
+    hi = np.full(len(row_face), float(resolution))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(3):
+            a, rest = edges[row_face, i, 0], edges[row_face, i, 1] * cy + edges[row_face, i, 2]
+            bound = -rest / a
+            lo = np.where(a > 0, np.maximum(lo, bound), lo)
+            hi = np.where(a < 0, np.minimum(hi, bound), hi)
+            # A horizontal edge either admits the whole row or none of it
+            hi = np.where((a == 0) & (rest < 0), -1.0, hi)
+    x0 = np.ceil(lo - 0.5).astype(np.int64)
+    widths = np.maximum(np.floor(hi - 0.5).astype(np.int64) - x0 + 1, 0)
+    spans = np.flatnonzero(widths)
+    row_face, py, x0, widths = row_face[spans], py[spans], x0[spans], widths[spans]
+    # Depth along the row is base + slope * x
+    base = plane[row_face, 1] * (py + 0.5) + plane[row_face, 2]
+    slope = plane[row_face, 0]
+    row_pixel = py * resolution + x0
+    z_lo = float(z.min())
+    z_scale = (_DEPTH_LEVELS - 1) / max(float(z.max()) - z_lo, 1e-12)
+
+    start = 0
+    ends = np.cumsum(widths)
+    while start < len(spans):
+        stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + _CHUNK, side='right')), start + 1)
+        chunk_widths = widths[start:stop]
+        span = np.repeat(np.arange(start, stop), chunk_widths)
+        offset = np.arange(len(span)) - np.repeat(ends[start:stop] - chunk_widths - (ends[start - 1] if start else 0),
+                                                  chunk_widths)
+        start = stop
+
+        pixel = row_pixel[span] + offset
+        d = base[span] + slope[span] * (x0[span] + offset + 0.5)
+
+        # Nearest candidate per pixel, then against what earlier passes drew.
+        # One sort on pixel and quantized depth packed into an integer key
+        quantized = np.clip((d - z_lo) * z_scale, 0, _DEPTH_LEVELS - 1).astype(np.int64)
+        order = np.argsort(pixel * _DEPTH_LEVELS + quantized)
+        pixel, d, span = pixel[order], d[order], span[order]
+        first = np.ones(len(pixel), dtype=bool)
+        first[1:] = pixel[1:] != pixel[:-1]
+        pixel, d, span = pixel[first], d[first], span[first]
+        nearer = d < depth[pixel]
+        depth[pixel[nearer]] = d[nearer]
+        owner[pixel[nearer]] = visible[row_face[span[nearer]]]
+    return owner.reshape(resolution, resolution)
+
+
+def render(vertices, faces, size=256):
+    """A ``size`` x ``size`` BGRA image of the mesh on a transparent background"""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    resolution = size * SUPERSAMPLE
+    image = np.zeros((resolution, resolution, 4), dtype=np.float64)
+    if len(faces) and len(vertices):
+        screen, view = project(vertices, resolution)
+        owner = rasterize(screen[faces], resolution)
+
+        # Flat shading, lit from the front whichever way a face winds
+        corners = view[faces]
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+        normals[normals[:, 2] < 0] *= -1
+        intensity = AMBIENT + (1 - AMBIENT) * np.clip(normals @ LIGHT, 0, 1)
+
+        covered = owner >= 0
+        image[covered, :3] = intensity[owner[covered], None] * BASE_COLOR
+        image[covered, 3] = 255
+
+    # Average each supersampled block; colour is weighted by coverage
+    blocks = image.reshape(size, SUPERSAMPLE, size, SUPERSAMPLE, 4).sum(axis=(1, 3))
+    alpha = blocks[..., 3:]
+    colour = np.divide(blocks[..., :3] * 255, alpha, out=np.zeros_like(blocks[..., :3]), where=alpha > 0)
+    out = np.concatenate([colour, alpha / SUPERSAMPLE ** 2], axis=2)
+    return np.clip(np.round(out), 0, 255).astype(np.uint8)
+
+
+def encode(image, image_format='webp'):
+    """Encode a BGRA image; returns the bytes"""
+    extension, _ = IMAGE_FORMATS[image_format]
+    params = [cv2.IMWRITE_WEBP_QUALITY, 90] if image_format == 'webp' else [cv2.IMWRITE_PNG_COMPRESSION, 6]
+    ok, buffer = cv2.imencode(extension, image, params)
+    if not ok:
+        raise ValueError(f"Could not encode thumbnail as {image_format}")
+    return buffer.tobytes()
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def _component(values, axis, default):
+    if not values:
+        return default
+    return float(values.get(axis, default))
+
+
+def transform_matrix(position=None, rotation=None, scale=None):
+    """4x4 matrix for an assembly part's location, rotation and scale.
+
+    Matches the merge script: ``rotation`` is read as Blender XYZ Euler
+    angles in radians (applied X, then Y, then Z) and the object's matrix
+    is translation @ rotation @ scale.
+    """
+    rx, ry, rz = (_component(rotation, axis, 0.0) for axis in 'xyz')
+    cx, cy, cz = np.cos([rx, ry, rz])
+    sx, sy, sz = np.sin([rx, ry, rz])
+    rotation_x = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    rotation_y = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rotation_z = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation_z @ rotation_y @ rotation_x * [_component(scale, axis, 1.0) for axis in 'xyz']
+    matrix[:3, 3] = [_component(position, axis, 0.0) for axis in 'xyz']
+    return matrix
+
+
+def apply_transform(points, matrix):
+    """Transform an (N, 3) array of points by a 4x4 matrix"""
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
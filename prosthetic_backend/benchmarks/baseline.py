@@ -0,0 +1,75 @@
+"""Timing statistics and JSON baselines shared by the benchmark suites."""
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+
+def time_stage(fn, iterations, warmup=1):
+    """Run ``fn`` and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'min_ms': samples[0],
+        'iterations': iterations,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'system': platform.system(),
+    }
+
+
+def load(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path, results, config):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'config': config, 'stages': results}, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold, metric='median_ms'):
+    """Return (stage, baseline ms, current ms, ratio) for every regressed stage.
+
+    A stage regresses when its ``metric`` exceeds the baseline value by more
+    than ``threshold`` (0.25 = 25%). Stages missing from either side are
+    ignored.
+    """
+    regressions = []
+    for name, stats in results.items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous or not previous.get(metric) or metric not in stats:
+            continue
+        ratio = stats[metric] / previous[metric]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous[metric], stats[metric], ratio))
+    return regressions
+
+
+def report(results, baseline=None):
+    lines = [f"{'stage':52s} {'median':>10s} {'p95':>10s} {'baseline':>10s}"]
+    for name, stats in results.items():
+        previous = (baseline or {}).get('stages', {}).get(name)
+        base = f"{previous['median_ms']:8.2f}ms" if previous else '         -'
+        lines.append(f"{name:52s} {stats['median_ms']:8.2f}ms {stats['p95_ms']:8.2f}ms {base}")
+    return '\n'.join(lines)
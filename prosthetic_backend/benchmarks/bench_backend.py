@@ -0,0 +1,487 @@
+"""In-process benchmark harness for the Flask backend.
+
+Drives ``create_app()`` through the Flask test client against a throwaway
+SQLite database and upload folders, with generated binary STL meshes, so
+no server has to be running. Measures:
+
+- upload + metadata extraction latency as mesh size grows
+- ``GET /api/parts`` and ``GET /api/assemblies`` at 1k, 10k and 100k rows,
+  and ``GET /api/sync`` catching up on ten changed parts at those sizes
+- ``GET /api/assemblies/<id>`` for assemblies with many parts
+- merge throughput (parts/s and MB/s of output), buffered and streamed,
+  and time to the first byte of a streamed merge
+- ``GET /api/assemblies/<id>/interference`` as assemblies grow
+- cold GLB export of parts and its size relative to the uploaded STL
+- thumbnail rendering as mesh size grows, and serving a cached one
+- ``GET /api/parts/match`` at 1k, 10k and 100k parts: a full index load,
+  a refresh after one part is saved, and the bare KD-tree lookup
+- ``GET /api/parts/<id>/similar`` and its shape index lookup at those sizes
+
+and reports the tracemalloc peak for each scenario.
+
+    python -m benchmarks.bench_backend
+    python -m benchmarks.bench_backend --rows 1000 10000 --update-baseline
+
+Blender is not available on most build machines, so merges run through an
+in-process trimesh implementation of the Blender script's contract unless
+``--blender`` is given.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from contextlib import ExitStack
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import trimesh
+
+from app.utils.transforms import transform_matrix
+from benchmarks import baseline
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines' / 'backend.json'
+
+# icosphere subdivisions -> 320, 1280, 5120, 20480 and 81920 faces
+MESH_SUBDIVISIONS = (2, 3, 4, 5, 6)
+ROW_COUNTS = (1000, 10000, 100000)
+ASSEMBLY_SIZES = (10, 100, 1000)
+MERGE_PARTS = (2, 8, 32)
+INTERFERENCE_PARTS = (8, 32, 128)
+SCENARIOS = ('upload', 'list', 'assembly', 'merge', 'interference', 'export', 'thumbnail', 'match')
+
+
+def stl_mesh(subdivisions=3, radius=10.0):
+    """Binary STL bytes for an icosphere with 20 * 4**subdivisions faces"""
+    mesh = trimesh.creation.icosphere(subdivisions=subdivisions, radius=radius)
+    return mesh.export(file_type='stl')
+
+
+def trimesh_merge(script_path, assembly_json, output_path):
+    """Stand-in for ``BlenderService.run_blender_script`` running the merge script"""
+    meshes = []
+    for part in json.loads(assembly_json):
+        if not os.path.exists(part['file_path']):
+            continue
+        mesh = trimesh.load(part['file_path'], force='mesh')
+        mesh.apply_transform(transform_matrix(part['position'], part['rotation'], part['scale']))
+        meshes.append(mesh)
+    if not meshes:
+        return False
+    trimesh.util.concatenate(meshes).export(output_path)
+    return True
+
+
+def peak_memory(fn):
+    """tracemalloc peak in bytes for a single call"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class BackendHarness:
+    """A backend app on temporary storage plus helpers to seed it"""
+
+    def __init__(self, workdir):
+        from config import Config
+
+        workdir = Path(workdir)
+
+        class BenchmarkConfig(Config):
+            UPLOAD_FOLDER = workdir / 'uploads'
+            MERGED_FOLDER = workdir / 'merged'
+            MESH_CACHE_FOLDER = workdir / 'mesh_cache'
+            TEMP_FOLDER = workdir / 'temp'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(workdir / 'bench.db')
+            TESTING = True
+
+        # Services read the folders from Config directly
+        self._patches = ExitStack()
+        self._patches.enter_context(mock.patch.object(Config, 'UPLOAD_FOLDER', BenchmarkConfig.UPLOAD_FOLDER))
+        self._patches.enter_context(mock.patch.object(Config, 'MERGED_FOLDER', BenchmarkConfig.MERGED_FOLDER))
+        self._patches.enter_context(
+            mock.patch.object(Config, 'MESH_CACHE_FOLDER', BenchmarkConfig.MESH_CACHE_FOLDER))
+        self._patches.enter_context(mock.patch.object(Config, 'TEMP_FOLDER', BenchmarkConfig.TEMP_FOLDER))
+
+        from app import create_app
+        from app.models.database import db
+
+        self.workdir = workdir
+        self.db = db
+        self.app = create_app(BenchmarkConfig)
+        self.client = self.app.test_client()
+
+    def close(self):
+        with self.app.app_context():
+            self.db.session.remove()
+            self.db.engine.dispose()
+        self._patches.close()
+
+    def upload(self, data, filename='part.stl'):
+        response = self.client.post('/api/parts', data={
+            'file': (io.BytesIO(data), filename),
+            'name': filename,
+            'type': 'benchmark',
+        }, content_type='multipart/form-data')
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+
+    def reset(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+
+    def seed_parts(self, count, file_path='unused.stl'):
+        """Insert ``count`` part rows directly, with realistic metadata"""
+        from app.models.database import Part
+
+        metadata = {'vertices': 2562, 'faces': 5120,
+                    'bounds': [[-10.0, -10.0, -10.0], [10.0, 10.0, 10.0]],
+                    'center_mass': [0.0, 0.0, 0.0]}
+        with self.app.app_context():
+            self.db.session.execute(Part.__table__.insert(), [
+                {'name': f'Part {i}', 'type': 'benchmark', 'file_path': file_path,
+                 'model_metadata': metadata} for i in range(count)])
+            self.db.session.commit()
+
+    def seed_sized_parts(self, count, seed=0):
+        """Insert ``count`` leg and arm part rows with varied dimensions (mm) and shapes"""
+        from app.models.database import Part
+        from app.utils import shape_descriptor
+
+        rng = np.random.default_rng(seed)
+        descriptors = rng.random((count, shape_descriptor.SIZE)).astype(np.float32) / 4
+        lengths = rng.uniform(100, 600, count)
+        widths = lengths * rng.uniform(0.1, 0.4, count)
+        rows = []
+        for i, (length, width) in enumerate(zip(lengths, widths)):
+            dimensions = {'length': length, 'width': width, 'depth': width, 'circumference': np.pi * width}
+            rows.append({'name': f"{'leg' if i % 2 else 'arm'} part {i}", 'type': 'benchmark',
+                         'file_path': 'unused.stl',
+                         'model_metadata': {'dimensions': {k: float(v) for k, v in dimensions.items()},
+                                            'shape_descriptor': shape_descriptor.encode(descriptors[i])}})
+        with self.app.app_context():
+            self.db.session.execute(Part.__table__.insert(), rows)
+            self.db.session.commit()
+
+    def seed_assemblies(self, count):
+        from app.models.database import Assembly
+
+        with self.app.app_context():
+            self.db.session.execute(Assembly.__table__.insert(), [
+                {'name': f'Assembly {i}', 'status': 'draft'} for i in range(count)])
+            self.db.session.commit()
+
+    def assembly_with_parts(self, part_ids, spacing=25.0):
+        """Create an assembly referencing ``part_ids`` (repeats allowed); returns its id"""
+        from app.models.database import Assembly, AssemblyPart
+
+        with self.app.app_context():
+            assembly = Assembly(name=f'Assembly of {len(part_ids)}')
+            self.db.session.add(assembly)
+            self.db.session.flush()
+            self.db.session.execute(AssemblyPart.__table__.insert(), [
+                {'assembly_id': assembly.id, 'part_id': part_id,
+                 'position': {'x': spacing * i, 'y': 0, 'z': 0},
+                 'rotation': {'x': 0, 'y': 0, 'z': 0.1 * i},
+                 'scale': {'x': 1, 'y': 1, 'z': 1}} for i, part_id in enumerate(part_ids)])
+            self.db.session.commit()
+            return assembly.id
+
+
+def measure(fn, iterations, warmup=1, memory=True):
+    stats = baseline.time_stage(fn, iterations, warmup)
+    if memory:
+        stats['peak_bytes'] = peak_memory(fn)
+    return stats
+
+
+def bench_uploads(harness, args, results):
+    for subdivisions in args.mesh_subdivisions:
+        data = stl_mesh(subdivisions)
+        faces = 20 * 4 ** subdivisions
+        stats = measure(lambda: harness.upload(data), args.iterations)
+        stats['bytes'] = len(data)
+        results[f'upload/{faces}_faces'] = stats
+
+
+def bench_lists(harness, args, results):
+    from app.models.database import Part, current_revision
+
+    for rows in args.rows:
+        harness.reset()
+        harness.seed_parts(rows)
+        harness.seed_assemblies(rows)
+        for route in ('/api/parts', '/api/assemblies'):
+            def fetch():
+                response = harness.client.get(route)
+                assert response.status_code == 200
+            results[f'list{route[4:]}/{rows}_rows'] = measure(fetch, args.list_iterations)
+
+        # A client catching up after ten parts changed, instead of listing again
+        with harness.app.app_context():
+            # Seeded rows bypass change tracking; revision 0 would ask for everything
+            Part.query.first().type = 'synced'
+            harness.db.session.commit()
+            since = current_revision(harness.db.session)
+            for part in Part.query.limit(10):
+                part.name += ' (revised)'
+            harness.db.session.commit()
+
+        def sync():
+            response = harness.client.get(f'/api/sync?since={since}')
+            assert response.status_code == 200 and len(response.get_json()['parts']) == 10
+        results[f'sync_delta/{rows}_rows'] = measure(sync, args.list_iterations)
+
+
+def bench_assembly_detail(harness, args, results):
+    harness.reset()
+    part = harness.upload(stl_mesh(2))
+    for size in args.assembly_sizes:
+        assembly_id = harness.assembly_with_parts([part['id']] * size)
+
+        def fetch():
+            response = harness.client.get(f'/api/assemblies/{assembly_id}')
+            assert response.status_code == 200
+        results[f'assembly_detail/{size}_parts'] = measure(fetch, args.list_iterations)
+
+
+def bench_merge(harness, args, results):
+    harness.reset()
+    part = harness.upload(stl_mesh(4))
+    for count in args.merge_parts:
+        assembly_id = harness.assembly_with_parts([part['id']] * count)
+        output = {}
+
+        def merge():
+            response = harness.client.post(f'/api/assemblies/{assembly_id}/merge')
+            assert response.status_code == 200, response.get_json()
+            output['bytes'] = len(response.data)
+
+        stats = measure(merge, args.merge_iterations)
+        seconds = stats['median_ms'] / 1000
+        stats['parts_per_s'] = count / seconds
+        stats['mb_per_s'] = output['bytes'] / seconds / 1e6
+        results[f'merge/{count}_parts'] = stats
+
+        def first_byte():
+            response = harness.client.post(f'/api/assemblies/{assembly_id}/merge?stream=1', buffered=False)
+            assert response.status_code == 200
+            next(iter(response.response))
+            response.close()
+
+        def stream():
+            response = harness.client.post(f'/api/assemblies/{assembly_id}/merge?stream=1')
+            assert response.status_code == 200
+            assert len(response.get_data()) == output['bytes']
+
+        stats = measure(stream, args.merge_iterations)
+        seconds = stats['median_ms'] / 1000
+        stats['parts_per_s'] = count / seconds
+        stats['mb_per_s'] = output['bytes'] / seconds / 1e6
+        results[f'merge_stream/{count}_parts'] = stats
+        results[f'merge_stream_first_byte/{count}_parts'] = measure(first_byte, args.merge_iterations, memory=False)
+
+
+class _chdir:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.previous = os.getcwd()
+        os.chdir(self.path)
+
+    def __exit__(self, *exc):
+        os.chdir(self.previous)
+
+
+def bench_interference(harness, args, results):
+    harness.reset()
+    # 5120-face spheres of radius 10, 18 apart: every neighbour overlaps
+    part = harness.upload(stl_mesh(4))
+    for count in args.interference_parts:
+        assembly_id = harness.assembly_with_parts([part['id']] * count, spacing=18.0)
+
+        def check():
+            response = harness.client.get(f'/api/assemblies/{assembly_id}/interference')
+            assert response.status_code == 200
+        results[f'interference/{count}_parts'] = measure(check, args.list_iterations)
+
+
+def bench_export(harness, args, results):
+    harness.reset()
+    for subdivisions in args.mesh_subdivisions:
+        data = stl_mesh(subdivisions)
+        part = harness.upload(data)
+        output = {}
+
+        def export():
+            # Time the conversion, not the cache
+            for path in (harness.workdir / 'uploads').glob('*.glb'):
+                path.unlink()
+            response = harness.client.get(f"/api/parts/{part['id']}/glb")
+            assert response.status_code == 200, response.get_json()
+            output['bytes'] = len(response.data)
+
+        stats = measure(export, args.iterations)
+        stats['glb_ratio'] = len(data) / output['bytes']
+        results[f'export_glb/{20 * 4 ** subdivisions}_faces'] = stats
+
+
+def bench_thumbnail(harness, args, results):
+    harness.reset()
+    for subdivisions in args.mesh_subdivisions:
+        part = harness.upload(stl_mesh(subdivisions))
+        faces = 20 * 4 ** subdivisions
+
+        def render():
+            # Time rendering, not the cache
+            for path in (harness.workdir / 'mesh_cache' / 'thumbnails').glob('*'):
+                path.unlink()
+            response = harness.client.get(part['thumbnail_url'])
+            assert response.status_code == 200, response.get_json()
+
+        def cached():
+            response = harness.client.get(part['thumbnail_url'])
+            assert response.status_code == 200, response.get_json()
+
+        results[f'thumbnail/{faces}_faces'] = measure(render, args.iterations)
+        results[f'thumbnail_cached/{faces}_faces'] = measure(cached, args.list_iterations)
+
+
+def bench_match(harness, args, results):
+    from app.models.database import Part
+    from app.services.matching_service import MatchingService
+
+    for rows in args.rows:
+        harness.reset()
+        harness.seed_sized_parts(rows)
+        MatchingService.invalidate()
+
+        def match():
+            response = harness.client.get('/api/parts/match?length=30&circumference=25&width=8&limb=Left_Knee')
+            assert response.status_code == 200 and response.get_json()['matches']
+
+        def rebuild():
+            MatchingService.invalidate()
+            match()
+
+        def refresh():
+            # A part saved in this process: re-index without reloading the catalog
+            with harness.app.app_context():
+                MatchingService.remove(1)
+                MatchingService.add(Part.query.get(1))
+            match()
+
+        with harness.app.app_context():
+            index = MatchingService.get_index()
+        results[f'match_index/{rows}_rows'] = measure(rebuild, args.merge_iterations)
+        results[f'match_refresh/{rows}_rows'] = measure(refresh, args.merge_iterations)
+        results[f'match/{rows}_rows'] = measure(match, args.list_iterations)
+        results[f'match_lookup/{rows}_rows'] = measure(
+            lambda: index.query([30, 25, 8], 5, 'leg'), args.list_iterations * 20, memory=False)
+
+        def similar():
+            response = harness.client.get('/api/parts/1/similar')
+            assert response.status_code == 200 and response.get_json()['similar']
+
+        with harness.app.app_context():
+            shapes = MatchingService.get_shape_index()
+        query = shapes.descriptors[0]
+        results[f'similar/{rows}_rows'] = measure(similar, args.list_iterations)
+        results[f'similar_lookup/{rows}_rows'] = measure(
+            lambda: shapes.query(query, 10), args.list_iterations * 20, memory=False)
+
+
+def run(args):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench_backend_') as workdir, ExitStack() as stack:
+        if not args.blender:
+            stack.enter_context(mock.patch(
+                'app.services.blender_service.BlenderService.run_blender_script', side_effect=trimesh_merge))
+        # Keep the merge script's scratch directory out of the checkout
+        stack.enter_context(_chdir(workdir))
+        harness = BackendHarness(workdir)
+        try:
+            if 'upload' in args.scenarios:
+                bench_uploads(harness, args, results)
+            if 'list' in args.scenarios:
+                bench_lists(harness, args, results)
+            if 'assembly' in args.scenarios:
+                bench_assembly_detail(harness, args, results)
+            if 'merge' in args.scenarios:
+                bench_merge(harness, args, results)
+            if 'interference' in args.scenarios:
+                bench_interference(harness, args, results)
+            if 'export' in args.scenarios:
+                bench_export(harness, args, results)
+            if 'thumbnail' in args.scenarios:
+                bench_thumbnail(harness, args, results)
+            if 'match' in args.scenarios:
+                bench_match(harness, args, results)
+        finally:
+            harness.close()
+    config = {'rows': list(args.rows), 'blender': args.blender}
+    return results, config
+
+
+def format_extras(results):
+    lines = []
+    for name, stats in results.items():
+        extras = []
+        if 'peak_bytes' in stats:
+            extras.append(f"peak {stats['peak_bytes'] / 2 ** 20:.1f} MiB")
+        if 'bytes' in stats:
+            extras.append(f"{stats['bytes'] / 2 ** 20:.2f} MiB upload")
+        if 'parts_per_s' in stats:
+            extras.append(f"{stats['parts_per_s']:.1f} parts/s, {stats['mb_per_s']:.1f} MB/s")
+        if 'glb_ratio' in stats:
+            extras.append(f"{stats['glb_ratio']:.1f}x smaller than STL")
+        lines.append(f"{name:52s} {', '.join(extras)}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument('--iterations', type=int, default=5, help='samples per upload size')
+    parser.add_argument('--list-iterations', type=int, default=5)
+    parser.add_argument('--merge-iterations', type=int, default=3)
+    parser.add_argument('--mesh-subdivisions', type=int, nargs='+', default=list(MESH_SUBDIVISIONS))
+    parser.add_argument('--rows', type=int, nargs='+', default=list(ROW_COUNTS))
+    parser.add_argument('--assembly-sizes', type=int, nargs='+', default=list(ASSEMBLY_SIZES))
+    parser.add_argument('--merge-parts', type=int, nargs='+', default=list(MERGE_PARTS))
+    parser.add_argument('--interference-parts', type=int, nargs='+', default=list(INTERFERENCE_PARTS))
+    parser.add_argument('--blender', action='store_true', help='merge through the real Blender executable')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('BENCH_REGRESSION_THRESHOLD', 0.25)))
+    args = parser.parse_args(argv)
+
+    results, config = run(args)
+    previous = baseline.load(args.baseline)
+    print(baseline.report(results, previous))
+    print()
+    print(format_extras(results))
+
+    if args.update_baseline:
+        baseline.save(args.baseline, results, config)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if previous is None or previous.get('config') != config:
+        return 0
+    regressions = baseline.compare(results, previous, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: {before:.2f}ms -> {after:.2f}ms ({ratio:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Comparison of the pose inference backends on the measurement fixtures.
+
+For each backend reports per-image latency, throughput over the whole
+fixture set on ``--threads`` threads, and how far its landmarks are from
+the reference backend's (the first one listed) on the same images.
+Deviations are Euclidean distances in normalized frame coordinates over
+all 33 landmarks of the images where both backends found a pose. Runs on
+CPU only. Backends whose package or model is unavailable are reported as
+skipped.
+
+    python -m benchmarks.bench_backends --model-complexity 1
+    python -m benchmarks.bench_backends --backends solution onnx onnx:int8 --output backends.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks import baseline
+from benchmarks.bench_measurement import FIXTURES_DIR, IMAGE_FIXTURES
+
+DEFAULT_BACKENDS = ('solution', 'tasks', 'tflite', 'onnx', 'onnx:int8')
+
+
+def build_backend(spec, model_complexity, num_threads):
+    """Backend for ``name`` or ``name:int8``"""
+    from pose.backends import create_backend
+
+    name, _, option = spec.partition(':')
+    options = {'int8': True} if option == 'int8' else {}
+    return create_backend(name, model_complexity=model_complexity, num_threads=num_threads, **options)
+
+
+def load_frames():
+    from pose.decode import decode_image
+
+    frames = {}
+    for name in IMAGE_FIXTURES:
+        decoded = decode_image(np.frombuffer((FIXTURES_DIR / name).read_bytes(), np.uint8))
+        frames[os.path.splitext(name)[0]] = decoded.image
+    return frames
+
+
+def deviation(landmarks, reference):
+    """Mean and max landmark distance over the images where both found a pose"""
+    distances = [np.hypot(*(landmarks[label][:, :2] - reference[label][:, :2]).T)
+                 for label in reference if reference[label] is not None and landmarks.get(label) is not None]
+    agree = sum((landmarks.get(label) is None) == (reference[label] is None) for label in reference)
+    if not distances:
+        return {'mean': None, 'max': None, 'detection_agreement': agree / len(reference)}
+    distances = np.concatenate(distances)
+    return {'mean': float(distances.mean()), 'max': float(distances.max()),
+            'detection_agreement': agree / len(reference)}
+
+
+def throughput(backend, frames, rounds, threads):
+    """Images per second processing every frame ``rounds`` times on ``threads`` threads"""
+    work = list(frames.values()) * rounds
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # Each thread builds its own graph or session before timing
+        list(executor.map(backend.process, list(frames.values())[:1] * threads))
+        start = time.perf_counter()
+        list(executor.map(backend.process, work))
+        elapsed = time.perf_counter() - start
+    return len(work) / elapsed
+
+
+def run(args):
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    frames = load_frames()
+    results = {}
+    reference = None
+    for spec in args.backends:
+        try:
+            backend = build_backend(spec, args.model_complexity, args.num_threads)
+            backend.preload()
+            landmarks = {label: backend.process(frame) for label, frame in frames.items()}
+        except Exception as e:
+            results[spec] = {'skipped': f'{type(e).__name__}: {e}'}
+            continue
+
+        latency = {label: baseline.time_stage(lambda frame=frame: backend.process(frame), args.iterations, warmup=1)
+                   for label, frame in frames.items()}
+        results[spec] = {
+            'latency': latency,
+            'throughput_per_s': throughput(backend, frames, args.iterations, args.threads),
+            'found': sum(value is not None for value in landmarks.values()),
+        }
+        if reference is None:
+            reference = (spec, landmarks)
+        else:
+            results[spec]['deviation'] = deviation(landmarks, reference[1])
+    return results, reference[0] if reference else None
+
+
+def report(results, reference, labels):
+    lines = [f"{'backend':14s} " + ' '.join(f'{label:>20s}' for label in labels)
+             + f" {'img/s':>8s} {'found':>6s} {'dev mean':>9s} {'dev max':>8s}"]
+    for spec, result in results.items():
+        if 'skipped' in result:
+            lines.append(f'{spec:14s} skipped ({result["skipped"]})')
+            continue
+        latency = ' '.join(f"{result['latency'][label]['median_ms']:18.2f}ms" for label in labels)
+        dev = result.get('deviation', {})
+        mean = '  (ref)' if spec == reference else (f"{dev['mean']:9.4f}" if dev.get('mean') is not None else '        -')
+        peak = '' if spec == reference else (f"{dev['max']:8.4f}" if dev.get('max') is not None else '       -')
+        lines.append(f"{spec:14s} {latency} {result['throughput_per_s']:8.2f} "
+                     f"{result['found']:>3d}/{len(labels):<2d} {mean} {peak}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=list(DEFAULT_BACKENDS),
+                        help='backends to compare, the first being the reference (onnx:int8 for quantized)')
+    parser.add_argument('--model-complexity', type=int, default=2, choices=(0, 1, 2))
+    parser.add_argument('--iterations', type=int, default=10, help='samples per image')
+    parser.add_argument('--threads', type=int, default=1, help='concurrent requests for the throughput run')
+    parser.add_argument('--num-threads', type=int, default=1, help='threads inside each inference session')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results, reference = run(args)
+    labels = [os.path.splitext(name)[0] for name in IMAGE_FIXTURES]
+    print(report(results, reference, labels))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': baseline.environment(), 'model_complexity': args.model_complexity,
+                       'reference': reference, 'backends': results}, f, indent=2, sort_keys=True)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
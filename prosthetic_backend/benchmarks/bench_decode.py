@@ -0,0 +1,89 @@
+"""Benchmark: legacy full decode + rotate vs the reduced, EXIF-aware decode.
+
+Measures wall time and tracemalloc peak (numpy/OpenCV output buffers and
+Python copies) per request for a 12 MP phone-style portrait JPEG.
+
+    python -m benchmarks.bench_decode --repeat 10
+"""
+import argparse
+import io
+import struct
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from pose.decode import decode_image, read_upload_buffer
+
+
+def phone_jpeg(width=4032, height=3024, orientation=6, quality=92):
+    """A landscape-stored JPEG tagged with an EXIF rotation, like phone cameras write"""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    tiff = (b'MM\x00*\x00\x00\x00\x08' + struct.pack('>H', 1)
+            + struct.pack('>HHIHH', 0x0112, 3, 1, orientation, 0) + b'\x00\x00\x00\x00')
+    app1 = b'Exif\x00\x00' + tiff
+    data = buffer.tobytes()
+    return data[:2] + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + data[2:]
+
+
+def spooled(data, max_size=1024 * 1024):
+    """Mimic Starlette's upload spooling"""
+    fileobj = tempfile.SpooledTemporaryFile(max_size=max_size)
+    fileobj.write(data)
+    fileobj.seek(0)
+    return fileobj
+
+
+def legacy_decode(fileobj):
+    contents = fileobj.read()
+    nparr = np.frombuffer(contents, np.uint8)
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    height, width = image.shape[:2]
+    if height > width:
+        image = cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def pipeline_decode(fileobj):
+    decoded = decode_image(read_upload_buffer(fileobj))
+    return cv2.cvtColor(decoded.image, cv2.COLOR_BGR2RGB)
+
+
+def measure(fn, data, repeat):
+    times, peaks = [], []
+    for _ in range(repeat):
+        fileobj = spooled(data)
+        tracemalloc.start()
+        start = time.perf_counter()
+        frame = fn(fileobj)
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        fileobj.close()
+    return {
+        'median_ms': float(np.median(times) * 1000),
+        'peak_mb': max(peaks) / 1e6,
+        'frame_shape': frame.shape,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    data = phone_jpeg()
+    print(f"upload: {len(data) / 1e6:.1f} MB JPEG, 4032x3024 stored, EXIF orientation 6")
+    for name, fn in (('legacy', legacy_decode), ('pipeline', pipeline_decode)):
+        result = measure(fn, data, args.repeat)
+        print(f"{name:10s} {result['median_ms']:8.1f} ms  peak {result['peak_mb']:7.1f} MB  "
+              f"frame {result['frame_shape']}")
+
+
+if __name__ == '__main__':
+    main()
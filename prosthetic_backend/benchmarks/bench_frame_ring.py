@@ -0,0 +1,84 @@
+"""Benchmark: handing decoded frames to a worker process by pickling vs shared memory.
+
+A worker process receives each frame and answers with a (33, 4) float32
+array, as an inference worker would, without running a model, so only
+the transport is timed: the pickled frame through a pipe, or a copy into
+a ``FrameRing`` slot with only (slot, shape, dtype) through the pipe.
+
+    python -m benchmarks.bench_frame_ring --iterations 50
+"""
+import argparse
+import multiprocessing
+import sys
+
+import numpy as np
+
+from benchmarks import baseline
+from pose.frame_ring import FrameRing
+
+# Decoded frame sizes: a reduced decode of a 12 MP photo, 1080p, and a full 12 MP frame
+FRAME_SHAPES = {'1008x756': (756, 1008, 3), '1920x1080': (1080, 1920, 3), '4032x3024': (3024, 4032, 3)}
+
+
+def _echo(connection, ring_name, slots, slot_bytes):
+    ring = FrameRing.attach(ring_name, slots, slot_bytes)
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        index, shape, dtype, frame = task
+        if frame is None:
+            frame = ring.view(index, shape, dtype)
+        # Touch the frame like a model's input resize would
+        landmarks[0, 0] = frame[::64, ::64].mean()
+        frame = None
+        connection.send(landmarks)
+    ring.close()
+
+
+def run(args):
+    slot_bytes = max(int(np.prod(shape)) for shape in FRAME_SHAPES.values())
+    ring = FrameRing(1, slot_bytes)
+    context = multiprocessing.get_context('spawn')
+    connection, child = context.Pipe()
+    worker = context.Process(target=_echo, args=(child, ring.name, 1, slot_bytes), daemon=True)
+    worker.start()
+    child.close()
+
+    def pickled(frame):
+        connection.send((None, frame.shape, frame.dtype.str, frame))
+        connection.recv()
+
+    def shared(frame):
+        index = ring.put(frame)
+        try:
+            connection.send((index, frame.shape, frame.dtype.str, None))
+            connection.recv()
+        finally:
+            ring.release(index)
+
+    results = {}
+    rng = np.random.default_rng(0)
+    try:
+        for label, shape in FRAME_SHAPES.items():
+            frame = rng.integers(0, 255, size=shape, dtype=np.uint8)
+            results[f'pickle/{label}'] = baseline.time_stage(lambda: pickled(frame), args.iterations, warmup=3)
+            results[f'shared_memory/{label}'] = baseline.time_stage(lambda: shared(frame), args.iterations, warmup=3)
+    finally:
+        connection.send(None)
+        worker.join()
+        ring.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args(argv)
+    print(baseline.report(run(args)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
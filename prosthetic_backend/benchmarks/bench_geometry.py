@@ -0,0 +1,137 @@
+"""Micro-benchmark: per-landmark geometry vs the vectorized limb table.
+
+Run from ``prosthetic_backend``::
+
+    python -m benchmarks.bench_geometry --iterations 2000
+"""
+import argparse
+import math
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from pose import geometry
+from pose.geometry import PoseLandmark
+
+
+def synthetic_landmarks(seed=0):
+    """A plausible standing pose with a little noise, as MediaPipe-like objects"""
+    rng = np.random.default_rng(seed)
+    array = rng.uniform(0.2, 0.8, size=(geometry.NUM_LANDMARKS, 4))
+    array[:, 3] = rng.uniform(0.4, 1.0, size=geometry.NUM_LANDMARKS)
+    landmarks = [SimpleNamespace(x=x, y=y, z=z, visibility=v) for x, y, z, v in array.tolist()]
+    return landmarks, array
+
+
+class LegacyGeometry:
+    """The original object-walking implementation, kept for comparison"""
+
+    def calculate_distance(self, point1, point2, frame_height):
+        pixel_distance = math.sqrt((point1.x - point2.x) ** 2 + (point1.y - point2.y) ** 2) * frame_height
+        return (pixel_distance * 170) / frame_height
+
+    def get_measurement_points(self, landmarks, limb_type, frame_width, frame_height):
+        side = "LEFT" if "Left" in limb_type else "RIGHT"
+        if "Knee" in limb_type:
+            names = ("HIP", "KNEE", "ANKLE")
+        else:
+            names = ("KNEE", "ANKLE", "FOOT_INDEX")
+        a, b, c = (landmarks[PoseLandmark[f"{side}_{name}"]] for name in names)
+        points = [{"x": p.x * frame_width, "y": p.y * frame_height} for p in (a, b, c)]
+        distances = [self.calculate_distance(a, b, frame_height), self.calculate_distance(b, c, frame_height)]
+        return points, distances
+
+    def detect_asymmetry(self, landmarks, frame_height):
+        lm = {name: landmarks[PoseLandmark[name]] for name in (
+            "LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE", "RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE")}
+        left_hip_knee = self.calculate_distance(lm["LEFT_HIP"], lm["LEFT_KNEE"], frame_height)
+        left_knee_ankle = self.calculate_distance(lm["LEFT_KNEE"], lm["LEFT_ANKLE"], frame_height)
+        right_hip_knee = self.calculate_distance(lm["RIGHT_HIP"], lm["RIGHT_KNEE"], frame_height)
+        right_knee_ankle = self.calculate_distance(lm["RIGHT_KNEE"], lm["RIGHT_ANKLE"], frame_height)
+        hk = max(left_hip_knee, right_hip_knee)
+        ka = max(left_knee_ankle, right_knee_ankle)
+        return {
+            "hip_knee_asymmetry": abs(left_hip_knee - right_hip_knee) / hk if hk > 0 else 0,
+            "knee_ankle_asymmetry": abs(left_knee_ankle - right_knee_ankle) / ka if ka > 0 else 0,
+            "left_hip_knee": left_hip_knee,
+            "right_hip_knee": right_hip_knee,
+            "left_knee_ankle": left_knee_ankle,
+            "right_knee_ankle": right_knee_ankle,
+        }
+
+    def detect_potential_prosthetic_needs(self, landmarks, frame_width, frame_height):
+        limb_positions = {
+            "Left_Knee": PoseLandmark.LEFT_KNEE,
+            "Right_Knee": PoseLandmark.RIGHT_KNEE,
+            "Left_Ankle": PoseLandmark.LEFT_ANKLE,
+            "Right_Ankle": PoseLandmark.RIGHT_ANKLE,
+        }
+        asymmetry_data = self.detect_asymmetry(landmarks, frame_height)
+        needs = []
+        for limb_name, landmark in limb_positions.items():
+            reasons = []
+            score = 0.0
+            if landmarks[landmark].visibility < 0.65:
+                reasons.append(f"Low visibility ({landmarks[landmark].visibility:.2f})")
+                score += 0.3
+            key = "hip_knee_asymmetry" if "Knee" in limb_name else "knee_ankle_asymmetry"
+            if asymmetry_data[key] > 0.15:
+                score += 0.4
+            points, distances = self.get_measurement_points(landmarks, limb_name, frame_width, frame_height)
+            ratios = (0.35, 0.12) if "Knee" in limb_name else (0.25, 0.08)
+            needs.append({
+                "limb_type": limb_name,
+                "coordinates": {"x": int(landmarks[landmark].x * frame_width),
+                                "y": int(landmarks[landmark].y * frame_height)},
+                "confidence": min(score + 0.3, 1.0),
+                "detection_reasons": reasons,
+                "recommended_size": {"length": distances[0],
+                                     "circumference": distances[0] * ratios[0],
+                                     "width": distances[0] * ratios[1]},
+                "points": points,
+                "distances": distances,
+                "asymmetry_data": asymmetry_data,
+            })
+        return needs
+
+
+def _time(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def run(iterations=2000, width=1920, height=1080):
+    landmarks, _ = synthetic_landmarks()
+    legacy = LegacyGeometry()
+
+    results = {
+        "legacy_objects": _time(
+            lambda: legacy.detect_potential_prosthetic_needs(landmarks, width, height), iterations),
+        "vectorized_with_conversion": _time(
+            lambda: geometry.analyze_limbs(geometry.landmarks_to_array(landmarks), width, height), iterations),
+    }
+    array = geometry.landmarks_to_array(landmarks)
+    results["vectorized_array_only"] = _time(
+        lambda: geometry.analyze_limbs(array, width, height), iterations)
+    results["vectorized_legs_and_arms"] = _time(
+        lambda: geometry.analyze_limbs(array, width, height, limbs=geometry.LEG_LIMBS + geometry.ARM_LIMBS),
+        iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    baseline = results["legacy_objects"]
+    for name, seconds in results.items():
+        print(f"{name:30s} {seconds * 1e6:9.1f} us/call  ({baseline / seconds:4.2f}x vs legacy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Stage-level benchmark suite for the measurement pipeline.
+
+Times decode, the person ROI pre-pass (by whether the whole frame, a
+tile or nothing found the subject), ``estimate_pose``, the landmark
+geometry methods, ``detect_potential_prosthetic_needs``,
+``create_visualization`` and the end-to-end ``/analyze/image`` request through an in-process test client,
+on the committed fixture images and seeded synthetic landmark sets. Runs
+on CPU only.
+
+    # record a baseline on this machine
+    python -m benchmarks.bench_measurement --update-baseline
+    # later: fail (exit 1) if any stage's median regressed by more than 25%
+    python -m benchmarks.bench_measurement --threshold 0.25
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import baseline
+from benchmarks.bench_geometry import synthetic_landmarks
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+FIXTURES_DIR = BENCHMARKS_DIR / 'fixtures'
+DEFAULT_BASELINE = BENCHMARKS_DIR / 'baselines' / 'measurement.json'
+
+IMAGE_FIXTURES = ('standing_portrait.jpg', 'clinic_wide.jpg', 'phone_exif_rotated.jpg', 'empty_room.jpg')
+LANDMARK_SEEDS = (0, 1, 2)
+
+
+def load_measurement(model_complexity):
+    """Import the FastAPI app on CPU with the requested pose model"""
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    os.environ['MEASUREMENT_MODEL_COMPLEXITY'] = str(model_complexity)
+    os.environ.pop('MEASUREMENT_CACHE_DIR', None)
+    import measurement
+    return measurement
+
+
+def image_stages(measurement, client, name):
+    from pose.decode import decode_image
+
+    estimator = measurement.pose_estimator
+    data = (FIXTURES_DIR / name).read_bytes()
+    buffer = np.frombuffer(data, np.uint8)
+    decoded = decode_image(buffer)
+    label = Path(name).stem
+
+    def analyze():
+        measurement.result_cache.clear()
+        response = client.post('/analyze/image', files={'file': (name, data, 'image/jpeg')})
+        assert response.status_code == 200
+
+    # The pre-pass costs one detector pass when the frame finds someone and
+    # up to one per tile when it does not, so its stage is named by outcome
+    detector = measurement.person_detector
+    if detector.locate(decoded.image, search_tiles=False) is not None:
+        outcome = 'frame'
+    else:
+        outcome = 'tiles' if detector.locate(decoded.image) is not None else 'none'
+
+    stages = {
+        f'decode/{label}': lambda: decode_image(buffer),
+        f'roi/{outcome}/{label}': lambda: detector.detect(decoded.image),
+        f'estimate_pose/{label}': lambda: estimator.estimate_pose(decoded.image),
+        f'analyze_image/{label}': analyze,
+    }
+
+    array, _ = estimator.estimate_pose(decoded.image)
+    if array is not None:
+        needs = estimator.detect_potential_prosthetic_needs(array, decoded.width, decoded.height)
+        stages[f'create_visualization/{label}'] = lambda: estimator.create_visualization(
+            decoded.image, array, needs, decoded.width, decoded.height)
+    return stages
+
+
+def geometry_stages(estimator, seed):
+    from pose.geometry import landmarks_to_array
+
+    landmarks, array = synthetic_landmarks(seed)
+    width, height = 1920, 1080
+    _, distances = estimator.get_measurement_points(landmarks, 'Left_Knee', width, height)
+    label = f'landmarks_{seed}'
+    return {
+        f'landmarks_to_array/{label}': lambda: landmarks_to_array(landmarks),
+        f'get_measurement_points/{label}': lambda: estimator.get_measurement_points(
+            landmarks, 'Left_Knee', width, height),
+        f'detect_asymmetry/{label}': lambda: estimator.detect_asymmetry(landmarks, height),
+        f'calculate_measurements/{label}': lambda: estimator.calculate_measurements(
+            landmarks, 'Left_Knee', height, distances),
+        f'detect_potential_prosthetic_needs/{label}': lambda: estimator.detect_potential_prosthetic_needs(
+            landmarks, width, height),
+        f'detect_potential_prosthetic_needs_array/{label}': lambda: estimator.detect_potential_prosthetic_needs(
+            array, width, height),
+    }
+
+
+def run(args):
+    measurement = load_measurement(args.model_complexity)
+    from fastapi.testclient import TestClient
+
+    client = TestClient(measurement.app)
+    results = {}
+
+    for seed in LANDMARK_SEEDS:
+        for name, fn in geometry_stages(measurement.pose_estimator, seed).items():
+            if args.only in name:
+                results[name] = baseline.time_stage(fn, args.iterations * args.geometry_factor, warmup=10)
+
+    for fixture in IMAGE_FIXTURES:
+        for name, fn in image_stages(measurement, client, fixture).items():
+            if args.only in name:
+                results[name] = baseline.time_stage(fn, args.iterations, warmup=1)
+
+    # Repeat upload answered from the result cache
+    name = f'analyze_image_cached/{Path(IMAGE_FIXTURES[0]).stem}'
+    if args.only in name:
+        data = (FIXTURES_DIR / IMAGE_FIXTURES[0]).read_bytes()
+        files = {'file': (IMAGE_FIXTURES[0], data, 'image/jpeg')}
+        # The first upload fills the cache
+        client.post('/analyze/image', files=files)
+        results[name] = baseline.time_stage(
+            lambda: client.post('/analyze/image', files=files), args.iterations, warmup=1)
+
+    config = {
+        'model_complexity': args.model_complexity,
+        **measurement.pose_estimator.backend.describe(),
+        'inference_min_side': measurement.INFERENCE_MIN_SIDE,
+    }
+    return results, config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=10,
+                        help='samples per image stage (geometry stages use more)')
+    parser.add_argument('--geometry-factor', type=int, default=100,
+                        help='multiplier on --iterations for the cheap geometry stages')
+    parser.add_argument('--model-complexity', type=int, default=2, choices=(0, 1, 2))
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('BENCH_REGRESSION_THRESHOLD', 0.25)),
+                        help='allowed median slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--only', default='', help='run only stages whose name contains this')
+    args = parser.parse_args(argv)
+
+    results, config = run(args)
+    previous = baseline.load(args.baseline)
+    print(baseline.report(results, previous))
+
+    if args.update_baseline:
+        baseline.save(args.baseline, results, config)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if previous is None:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+    if previous.get('config') != config:
+        print(f"\nBaseline was recorded with {previous.get('config')}, not {config}; skipping comparison")
+        return 0
+
+    regressions = baseline.compare(results, previous, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: {before:.2f}ms -> {after:.2f}ms ({ratio:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
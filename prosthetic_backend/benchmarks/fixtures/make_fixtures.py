@@ -0,0 +1,96 @@
+"""Regenerate the committed benchmark fixture images.
+
+The figures are drawn, not photographed, so the fixtures carry no patient
+data; MediaPipe still detects a full-body pose in each of them.
+
+    python -m benchmarks.fixtures.make_fixtures
+"""
+import struct
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FIXTURES_DIR = Path(__file__).resolve().parent
+
+SKIN = (140, 170, 210)
+SHIRT = (160, 60, 40)
+PANTS = (60, 50, 40)
+SHOES = (30, 30, 30)
+
+
+def draw_figure(image, center_x, top, figure_height):
+    """Draw a front-facing standing person; ``top`` is the crown of the head"""
+    s = figure_height / 900
+
+    def p(x, y):
+        return int(center_x + x * s), int(top + (y - 60) * s)
+
+    def r(value):
+        return max(1, int(value * s))
+
+    cv2.ellipse(image, p(0, 120), (r(45), r(58)), 0, 0, 360, SKIN, -1)
+    cv2.circle(image, p(-15, 110), r(5), SHOES, -1)
+    cv2.circle(image, p(15, 110), r(5), SHOES, -1)
+    cv2.ellipse(image, p(0, 150), (r(15), r(5)), 0, 0, 180, (60, 60, 150), -1)
+    cv2.rectangle(image, p(-15, 170), p(15, 200), SKIN, -1)
+    torso = np.array([p(-80, 200), p(80, 200), p(65, 470), p(-65, 470)])
+    cv2.fillPoly(image, [torso], SHIRT)
+    for side in (-1, 1):
+        cv2.line(image, p(side * 75, 215), p(side * 110, 350), SHIRT, r(34))
+        cv2.line(image, p(side * 110, 350), p(side * 120, 470), SKIN, r(28))
+        cv2.circle(image, p(side * 122, 490), r(20), SKIN, -1)
+        cv2.line(image, p(side * 38, 470), p(side * 45, 680), PANTS, r(52))
+        cv2.line(image, p(side * 45, 680), p(side * 48, 880), PANTS, r(44))
+        cv2.ellipse(image, p(side * 60, 900), (r(40), r(18)), 0, 0, 360, SHOES, -1)
+    return image
+
+
+def canvas(width, height, seed=0):
+    """A softly textured wall so JPEG sizes resemble real photos"""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(195, 225, size=(height // 32 + 1, width // 32 + 1, 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def with_exif_orientation(jpeg, orientation):
+    tiff = (b'MM\x00*\x00\x00\x00\x08' + struct.pack('>H', 1)
+            + struct.pack('>HHIHH', 0x0112, 3, 1, orientation, 0) + b'\x00\x00\x00\x00')
+    app1 = b'Exif\x00\x00' + tiff
+    return jpeg[:2] + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + jpeg[2:]
+
+
+def encode(image, quality=90):
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def build():
+    fixtures = {}
+
+    # Subject fills a portrait frame
+    image = draw_figure(canvas(1080, 1620, 1), 540, 90, 1420)
+    fixtures['standing_portrait.jpg'] = encode(image)
+
+    # Wide clinic shot with a small subject off to one side
+    image = draw_figure(canvas(4000, 3000, 2), 2900, 1500, 1200)
+    fixtures['clinic_wide.jpg'] = encode(image)
+
+    # Phone photo stored landscape with an EXIF rotation to portrait
+    upright = draw_figure(canvas(3024, 4032, 3), 1512, 300, 3500)
+    stored = cv2.rotate(upright, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    fixtures['phone_exif_rotated.jpg'] = with_exif_orientation(encode(stored, 85), 6)
+
+    # No person at all
+    fixtures['empty_room.jpg'] = encode(canvas(1280, 960, 4))
+    return fixtures
+
+
+def main():
+    for name, data in build().items():
+        (FIXTURES_DIR / name).write_bytes(data)
+        print(f"wrote {name} ({len(data) / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
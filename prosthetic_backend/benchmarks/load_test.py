@@ -0,0 +1,183 @@
+"""Headless mixed-workload load test with comparable reports.
+
+Optionally starts the backend (Flask) and the measurement API (uvicorn) on
+a throwaway database and upload folder, runs the Locust scenarios in
+``tests/load_testing.py`` headless, and writes to the output directory:
+
+- Locust's raw CSVs and HTML report
+- ``summary.json``: requests, failures, median/p95/p99 latency and
+  throughput per endpoint, in the benchmark baseline format
+
+    python -m benchmarks.load_test --start-stack --users 20 --run-time 2m
+    python -m benchmarks.load_test --start-stack --compare reports/load/previous/summary.json
+
+With ``--compare``, exits 1 when an endpoint's p95 regressed by more than
+``--threshold``.
+"""
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks import baseline
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+LOCUSTFILE = PROJECT_DIR / 'tests' / 'load_testing.py'
+DEFAULT_OUTPUT = PROJECT_DIR / 'reports' / 'load'
+
+
+def wait_for(url, process=None, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.5)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+@contextmanager
+def local_stack(backend_port, measurement_port, model_complexity, log_dir):
+    """Run both services on a temporary database and upload folders"""
+    with tempfile.TemporaryDirectory(prefix='load_test_') as workdir, ExitStack() as stack:
+        env = dict(
+            os.environ,
+            DATABASE_URL='sqlite:///' + str(Path(workdir) / 'load_test.db'),
+            UPLOAD_FOLDER=str(Path(workdir) / 'uploads'),
+            MERGED_FOLDER=str(Path(workdir) / 'merged'),
+            MESH_CACHE_FOLDER=str(Path(workdir) / 'mesh_cache'),
+            PROFILE_FOLDER=str(Path(workdir) / 'profiles'),
+            MEASUREMENT_MODEL_COMPLEXITY=str(model_complexity),
+            PYTHONPATH=str(PROJECT_DIR),
+            LOG_LEVEL='WARNING',
+        )
+        commands = {
+            'backend': [sys.executable, '-m', 'flask', '--app', 'run:app', 'run',
+                        '--port', str(backend_port), '--no-reload', '--no-debugger', '--with-threads'],
+            'measurement': [sys.executable, '-m', 'uvicorn', 'measurement:app',
+                            '--port', str(measurement_port), '--log-level', 'warning'],
+        }
+        ports = {'backend': backend_port, 'measurement': measurement_port}
+        processes = {}
+        try:
+            for name, command in commands.items():
+                log = stack.enter_context(open(Path(log_dir) / f'{name}.log', 'w'))
+                # Run from the scratch directory so the merge script stays out of the checkout
+                processes[name] = subprocess.Popen(command, cwd=workdir, env=env,
+                                                   stdout=log, stderr=subprocess.STDOUT)
+            for name, process in processes.items():
+                wait_for(f'http://127.0.0.1:{ports[name]}/', process)
+            yield
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def run_locust(args, output_dir):
+    env = dict(os.environ, BACKEND_HOST=args.backend_host, MEASUREMENT_HOST=args.measurement_host)
+    command = [
+        sys.executable, '-m', 'locust', '-f', str(LOCUSTFILE), '--headless',
+        '--users', str(args.users), '--spawn-rate', str(args.spawn_rate), '--run-time', args.run_time,
+        '--csv', str(output_dir / 'locust'), '--html', str(output_dir / 'report.html'),
+        '--only-summary',
+    ]
+    # Locust exits 1 when any request failed; the summary records failures per endpoint
+    subprocess.run(command, cwd=PROJECT_DIR, env=env, check=False)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def summarize(stats_csv):
+    """Per-endpoint latency percentiles and throughput from Locust's stats CSV"""
+    stages = {}
+    with open(stats_csv, newline='') as f:
+        for row in csv.DictReader(f):
+            name = row['Name'] if row['Name'] == 'Aggregated' else f"{row['Type']} {row['Name']}"
+            stages[name] = {
+                'requests': int(_float(row['Request Count'])),
+                'failures': int(_float(row['Failure Count'])),
+                'median_ms': _float(row['50%']),
+                'p95_ms': _float(row['95%']),
+                'p99_ms': _float(row['99%']),
+                'rps': _float(row['Requests/s']),
+            }
+    return stages
+
+
+def format_summary(stages, previous=None):
+    lines = [f"{'endpoint':52s} {'reqs':>7s} {'fail':>6s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'rps':>7s} {'p95 was':>8s}"]
+    for name, stats in stages.items():
+        before = (previous or {}).get('stages', {}).get(name)
+        was = f"{before['p95_ms']:8.0f}" if before else '       -'
+        lines.append(f"{name:52s} {stats['requests']:7d} {stats['failures']:6d} {stats['median_ms']:8.0f} "
+                     f"{stats['p95_ms']:8.0f} {stats['p99_ms']:8.0f} {stats['rps']:7.2f} {was}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--start-stack', action='store_true', help='start both services locally first')
+    parser.add_argument('--backend-port', type=int, default=5000)
+    parser.add_argument('--measurement-port', type=int, default=8000)
+    parser.add_argument('--backend-host', help='defaults to the local backend port')
+    parser.add_argument('--measurement-host', help='defaults to the local measurement port')
+    parser.add_argument('--model-complexity', type=int, default=2, choices=(0, 1, 2))
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--spawn-rate', type=float, default=5)
+    parser.add_argument('--run-time', default='1m')
+    parser.add_argument('--output', help='report directory (default: reports/load/<timestamp>)')
+    parser.add_argument('--compare', help='summary.json from an earlier run')
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('BENCH_REGRESSION_THRESHOLD', 0.25)))
+    args = parser.parse_args(argv)
+
+    args.backend_host = args.backend_host or f'http://127.0.0.1:{args.backend_port}'
+    args.measurement_host = args.measurement_host or f'http://127.0.0.1:{args.measurement_port}'
+    output_dir = Path(args.output or DEFAULT_OUTPUT / datetime.now().strftime('%Y%m%d-%H%M%S'))
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with ExitStack() as stack:
+        if args.start_stack:
+            stack.enter_context(local_stack(args.backend_port, args.measurement_port,
+                                            args.model_complexity, output_dir))
+        run_locust(args, output_dir)
+
+    stages = summarize(output_dir / 'locust_stats.csv')
+    config = {'users': args.users, 'spawn_rate': args.spawn_rate, 'run_time': args.run_time,
+              'model_complexity': args.model_complexity}
+    baseline.save(output_dir / 'summary.json', stages, config)
+
+    previous = baseline.load(args.compare) if args.compare else None
+    print(format_summary(stages, previous))
+    print(f"\nReports written to {output_dir}")
+    if previous is None:
+        return 0
+    regressions = baseline.compare(stages, previous, args.threshold, metric='p95_ms')
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: p95 {before:.0f}ms -> {after:.0f}ms ({ratio:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,16 +6,81 @@ class Config:
     BASE_DIR = Path(__file__).resolve().parent
     
     # Configure upload folders
-    UPLOAD_FOLDER = BASE_DIR / 'uploads'
-    MERGED_FOLDER = BASE_DIR / 'merged'
+    UPLOAD_FOLDER = Path(os.environ.get('UPLOAD_FOLDER', BASE_DIR / 'uploads'))
+    MERGED_FOLDER = Path(os.environ.get('MERGED_FOLDER', BASE_DIR / 'merged'))
+    
+    # Per-part data derived at upload (spatial indexes)
+    MESH_CACHE_FOLDER = Path(os.environ.get('MESH_CACHE_FOLDER', BASE_DIR / 'mesh_cache'))
+    
+    # Scratch files for Blender runs; storage collection sweeps them
+    TEMP_FOLDER = Path(os.environ.get('TEMP_FOLDER', BASE_DIR / 'temp'))
+    
+    # Where part files and merge results are kept: 'local' or 's3'. With
+    # s3 the folders above cache objects from S3_BUCKET; S3_ENDPOINT_URL
+    # selects an S3-compatible service such as MinIO. Download links
+    # expire after BLOB_URL_EXPIRES seconds.
+    BLOB_STORAGE = os.environ.get('BLOB_STORAGE', 'local')
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    S3_REGION = os.environ.get('S3_REGION')
+    BLOB_URL_EXPIRES = int(os.environ.get('BLOB_URL_EXPIRES', 3600))
+    
+    # Storage collection: seconds between background passes (0 disables),
+    # minimum age of an unreferenced file before it is deleted, files
+    # deleted per batch, and LRU quotas for regenerable outputs
+    STORAGE_GC_INTERVAL = int(os.environ.get('STORAGE_GC_INTERVAL', 3600))
+    STORAGE_GC_GRACE = int(os.environ.get('STORAGE_GC_GRACE', 3600))
+    STORAGE_GC_BATCH = int(os.environ.get('STORAGE_GC_BATCH', 100))
+    MERGED_QUOTA_BYTES = int(os.environ.get('MERGED_QUOTA_MB', 2048)) * 1024 * 1024
+    MESH_CACHE_QUOTA_BYTES = int(os.environ.get('MESH_CACHE_QUOTA_MB', 4096)) * 1024 * 1024
+    
+    # Part matching: model units per centimetre (STL/OBJ parts are in mm),
+    # the most matches returned, and seconds between checks of the
+    # catalog for parts added by other workers
+    MODEL_UNITS_PER_CM = float(os.environ.get('MODEL_UNITS_PER_CM', 10))
+    MATCH_MAX_RESULTS = int(os.environ.get('MATCH_MAX_RESULTS', 50))
+    MATCH_INDEX_CHECK_INTERVAL = float(os.environ.get('MATCH_INDEX_CHECK_INTERVAL', 1.0))
+    
+    # Edge length in pixels of part and assembly thumbnails
+    THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 256))
     
     # File configurations
     ALLOWED_EXTENSIONS = {'stl', 'obj'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
     # Database configuration
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(BASE_DIR / 'app.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + str(BASE_DIR / 'app.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
-    # Flask configuration
-    SECRET_KEY = 'dev'  # Change this in production
\ No newline at end of file
+    # Flask configuration. The key also signs download links for locally
+    # stored files, which are refused while it is left at 'dev'
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev')
+    
+    # Production server (server.py): listen address, pre-forked worker
+    # processes, threads per worker for each service, requests a worker
+    # serves before it is recycled (plus up to the jitter, so workers do not
+    # restart together) and seconds a stopping worker gets to finish
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1))
+    BACKEND_THREADS = int(os.environ.get('BACKEND_THREADS', 8))
+    MEASUREMENT_THREADS = int(os.environ.get('MEASUREMENT_THREADS', 1))
+    # Pose inference processes per worker, fed frames through shared memory
+    # (0 runs inference on the measurement threads)
+    MEASUREMENT_PROCESSES = int(os.environ.get('MEASUREMENT_PROCESSES', 0))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 1000))
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 100))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+    
+    # Request profiling: requests carrying an X-Profile-Token header equal
+    # to PROFILE_TOKEN, and this fraction of all requests, are sampled
+    # every PROFILE_INTERVAL seconds; the newest PROFILE_LIMIT profiles are
+    # kept in PROFILE_FOLDER and served to PROFILE_TOKEN holders under
+    # /api/profiles and /analyze/profiles. Off unless one is set.
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN') or None
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+    PROFILE_FOLDER = Path(os.environ.get('PROFILE_FOLDER', BASE_DIR / 'profiles'))
+    PROFILE_LIMIT = int(os.environ.get('PROFILE_LIMIT', 100))
+    
+    # Logging level for the app and services (DEBUG shows per-step detail)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
\ No newline at end of file
@@ -1,5 +1,10 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import Depends, FastAPI, File, UploadFile, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import cv2
 import mediapipe as mp
 import numpy as np
@@ -9,11 +14,27 @@ import tensorflow as tf
 import time
 from pydantic import BaseModel
 import math
+import logging
+
+from telemetry import metrics, profiling
+from telemetry.metrics import stage
+from pose import geometry
+from pose.admission import LANES, AdmissionController, AdmissionError, AdmissionGate, refusal_body, request_deadline
+from pose.cache import ResultCache
+from pose import roi as person_roi
+from pose.backends import create_backend
+from pose.decode import INFERENCE_MIN_SIDE, decode_image, read_upload_buffer
+from pose.visualization import IMAGE_FORMATS, VisualizationStore, draw_annotations, encode_image
+from pose.workers import ProcessBackend
+from config import Config
 
 # Suppress TensorFlow warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 tf.get_logger().setLevel('ERROR')
 
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # Add CORS middleware
@@ -25,6 +46,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Time the request and report its stages as a Server-Timing header"""
+    start = time.perf_counter()
+    timings = metrics.begin_request("measurement")
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(
+        elapsed, service="measurement", method=request.method,
+        route=route.path if route else "unmatched", status=response.status_code)
+    response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed)
+    return response
+
 class ProstheticMeasurement(BaseModel):
     limb_type: str
     coordinates: Dict[str, float]
@@ -34,175 +69,73 @@ class ProstheticMeasurement(BaseModel):
     reference_points: List[Dict[str, float]]
 
 class ProstheticPoseEstimator:
-    def __init__(self):
-        self.mp_pose = mp.solutions.pose
+    def __init__(self, model_complexity=2, min_detection_confidence=0.3, backend='solution', processes=0,
+                 **backend_options):
         # Adjusted model complexity and detection confidence
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=True,
-            model_complexity=2,
-            min_detection_confidence=0.3  # Lowered from 0.5 for better detection
-        )
-        self.mp_drawing = mp.solutions.drawing_utils
+        self.model_complexity = model_complexity
+        self.min_detection_confidence = min_detection_confidence  # Lowered from 0.5 for better detection
+        options = dict(backend_options, model_complexity=model_complexity,
+                       min_detection_confidence=min_detection_confidence)
+        if processes:
+            # Frames reach the inference processes through shared memory slots
+            self.backend = ProcessBackend(
+                backend, processes,
+                slots=int(os.environ.get('MEASUREMENT_FRAME_SLOTS', 2 * processes)),
+                slot_bytes=int(float(os.environ.get('MEASUREMENT_FRAME_SLOT_MB', 12)) * (1 << 20)),
+                timeout=float(os.environ.get('MEASUREMENT_FRAME_TIMEOUT', 30)),
+                **options)
+        else:
+            self.backend = create_backend(backend, **options)
+
+    def preload(self):
+        """Fetch the landmark model before serving (and before the server forks workers)"""
+        self.backend.preload()
     
     def estimate_pose(self, frame):
+        """Returns (landmarks, frame); landmarks is a (33, 4) array or None"""
         try:
-            # Check if image needs to be rotated based on orientation
-            height, width = frame.shape[:2]
-            if height > width:
-                print("Rotating image to landscape orientation")
-                frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-            
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            print("Processing image with dimensions:", frame_rgb.shape)
-            results = self.pose.process(frame_rgb)
-            return results, frame
+            # Frames arrive upright from pose.decode (EXIF orientation applied)
+            logger.debug("Processing image with dimensions: %s", frame.shape)
+            return self.backend.process(frame), frame
         except Exception as e:
-            print(f"Error in pose estimation: {str(e)}")
+            logger.exception("Error in pose estimation: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error during pose estimation: {str(e)}"
             )
 
     def get_landmarks(self, results):
-        if not results.pose_landmarks:
-            print("No pose landmarks detected in results")
+        if results is None:
+            logger.debug("No pose landmarks detected in results")
             return []
-        print("Successfully extracted landmarks")
-        return results.pose_landmarks.landmark
+        logger.debug("Successfully extracted landmarks")
+        return results
 
     def calculate_distance(self, point1, point2, frame_height):
         """Calculate distance between two points in real-world units (cm)"""
         try:
-            # Reference height of an average adult in cm
-            REFERENCE_HEIGHT = 170
-            pixel_distance = math.sqrt(
-                (point1.x - point2.x) ** 2 + 
-                (point1.y - point2.y) ** 2
-            ) * frame_height
-            # Scale the distance according to the reference height
-            return (pixel_distance * REFERENCE_HEIGHT) / frame_height
+            return math.hypot(point1.x - point2.x, point1.y - point2.y) * geometry.REFERENCE_HEIGHT
         except Exception as e:
-            print(f"Error calculating distance: {str(e)}")
+            logger.error("Error calculating distance: %s", e)
             return 0
 
     def get_measurement_points(self, landmarks, limb_type, frame_width, frame_height):
         """Get measurement points for visualization"""
         try:
-            points = []
-            distances = []
-
-            if "Left" in limb_type:
-                if "Knee" in limb_type:
-                    print("Processing left knee measurements")
-                    hip = landmarks[self.mp_pose.PoseLandmark.LEFT_HIP]
-                    knee = landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE]
-                    ankle = landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE]
-                    
-                    points = [
-                        {"x": hip.x * frame_width, "y": hip.y * frame_height},
-                        {"x": knee.x * frame_width, "y": knee.y * frame_height},
-                        {"x": ankle.x * frame_width, "y": ankle.y * frame_height}
-                    ]
-                    
-                    hip_to_knee = self.calculate_distance(hip, knee, frame_height)
-                    knee_to_ankle = self.calculate_distance(knee, ankle, frame_height)
-                    distances = [hip_to_knee, knee_to_ankle]
-                    
-                elif "Ankle" in limb_type:
-                    print("Processing left ankle measurements")
-                    knee = landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE]
-                    ankle = landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE]
-                    foot = landmarks[self.mp_pose.PoseLandmark.LEFT_FOOT_INDEX]
-                    
-                    points = [
-                        {"x": knee.x * frame_width, "y": knee.y * frame_height},
-                        {"x": ankle.x * frame_width, "y": ankle.y * frame_height},
-                        {"x": foot.x * frame_width, "y": foot.y * frame_height}
-                    ]
-                    
-                    knee_to_ankle = self.calculate_distance(knee, ankle, frame_height)
-                    ankle_to_foot = self.calculate_distance(ankle, foot, frame_height)
-                    distances = [knee_to_ankle, ankle_to_foot]
-
-            else:  # Right side
-                if "Knee" in limb_type:
-                    print("Processing right knee measurements")
-                    hip = landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP]
-                    knee = landmarks[self.mp_pose.PoseLandmark.RIGHT_KNEE]
-                    ankle = landmarks[self.mp_pose.PoseLandmark.RIGHT_ANKLE]
-                    
-                    points = [
-                        {"x": hip.x * frame_width, "y": hip.y * frame_height},
-                        {"x": knee.x * frame_width, "y": knee.y * frame_height},
-                        {"x": ankle.x * frame_width, "y": ankle.y * frame_height}
-                    ]
-                    
-                    hip_to_knee = self.calculate_distance(hip, knee, frame_height)
-                    knee_to_ankle = self.calculate_distance(knee, ankle, frame_height)
-                    distances = [hip_to_knee, knee_to_ankle]
-                    
-                elif "Ankle" in limb_type:
-                    print("Processing right ankle measurements")
-                    knee = landmarks[self.mp_pose.PoseLandmark.RIGHT_KNEE]
-                    ankle = landmarks[self.mp_pose.PoseLandmark.RIGHT_ANKLE]
-                    foot = landmarks[self.mp_pose.PoseLandmark.RIGHT_FOOT_INDEX]
-                    
-                    points = [
-                        {"x": knee.x * frame_width, "y": knee.y * frame_height},
-                        {"x": ankle.x * frame_width, "y": ankle.y * frame_height},
-                        {"x": foot.x * frame_width, "y": foot.y * frame_height}
-                    ]
-                    
-                    knee_to_ankle = self.calculate_distance(knee, ankle, frame_height)
-                    ankle_to_foot = self.calculate_distance(ankle, foot, frame_height)
-                    distances = [knee_to_ankle, ankle_to_foot]
-
-            print(f"Generated {len(points)} measurement points for {limb_type}")
-            return points, distances
+            limb = geometry.LIMBS_BY_NAME[limb_type]
+            need = geometry.analyze_limbs(
+                geometry.landmarks_to_array(landmarks), frame_width, frame_height, limbs=(limb,))[0]
+            return need["points"], need["distances"]
         except Exception as e:
-            print(f"Error getting measurement points: {str(e)}")
+            logger.error("Error getting measurement points: %s", e)
             return [], []
 
     def detect_asymmetry(self, landmarks, frame_height):
         """Detect asymmetry between left and right limbs"""
         try:
-            # Calculate distances for left and right limbs
-            left_hip = landmarks[self.mp_pose.PoseLandmark.LEFT_HIP]
-            left_knee = landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE]
-            left_ankle = landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE]
-            left_foot = landmarks[self.mp_pose.PoseLandmark.LEFT_FOOT_INDEX]
-            
-            right_hip = landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP]
-            right_knee = landmarks[self.mp_pose.PoseLandmark.RIGHT_KNEE]
-            right_ankle = landmarks[self.mp_pose.PoseLandmark.RIGHT_ANKLE]
-            right_foot = landmarks[self.mp_pose.PoseLandmark.RIGHT_FOOT_INDEX]
-            
-            # Calculate key distances
-            left_hip_knee = self.calculate_distance(left_hip, left_knee, frame_height)
-            left_knee_ankle = self.calculate_distance(left_knee, left_ankle, frame_height)
-            
-            right_hip_knee = self.calculate_distance(right_hip, right_knee, frame_height)
-            right_knee_ankle = self.calculate_distance(right_knee, right_ankle, frame_height)
-            
-            # Calculate asymmetry scores (0 = perfectly symmetric, higher = more asymmetric)
-            hip_knee_asymmetry = abs(left_hip_knee - right_hip_knee) / max(left_hip_knee, right_hip_knee) if max(left_hip_knee, right_hip_knee) > 0 else 0
-            knee_ankle_asymmetry = abs(left_knee_ankle - right_knee_ankle) / max(left_knee_ankle, right_knee_ankle) if max(left_knee_ankle, right_knee_ankle) > 0 else 0
-            
-            print(f"Hip-knee asymmetry score: {hip_knee_asymmetry:.4f}")
-            print(f"Knee-ankle asymmetry score: {knee_ankle_asymmetry:.4f}")
-            
-            # Return asymmetry data
-            return {
-                "hip_knee_asymmetry": float(hip_knee_asymmetry),
-                "knee_ankle_asymmetry": float(knee_ankle_asymmetry),
-                "left_hip_knee": float(left_hip_knee),
-                "right_hip_knee": float(right_hip_knee),
-                "left_knee_ankle": float(left_knee_ankle),
-                "right_knee_ankle": float(right_knee_ankle)
-            }
-            
+            return geometry.detect_asymmetry(geometry.landmarks_to_array(landmarks))
         except Exception as e:
-            print(f"Error calculating asymmetry: {str(e)}")
+            logger.error("Error calculating asymmetry: %s", e)
             return {
                 "hip_knee_asymmetry": 0,
                 "knee_ankle_asymmetry": 0,
@@ -212,257 +145,382 @@ class ProstheticPoseEstimator:
                 "right_knee_ankle": 0
             }
 
-    def detect_potential_prosthetic_needs(self, landmarks, frame_width, frame_height):
-        """Detect limbs that might need prosthetic support using multiple criteria"""
-        potential_needs = []
-        
-        if not landmarks:
-            print("No landmarks provided for detection")
-            return potential_needs
-
-        # Define limb positions to analyze
-        limb_positions = {
-            "Left_Knee": self.mp_pose.PoseLandmark.LEFT_KNEE,
-            "Right_Knee": self.mp_pose.PoseLandmark.RIGHT_KNEE,
-            "Left_Ankle": self.mp_pose.PoseLandmark.LEFT_ANKLE,
-            "Right_Ankle": self.mp_pose.PoseLandmark.RIGHT_ANKLE,
-        }
-        
-        # Calculate asymmetry scores between left and right limbs
-        asymmetry_data = self.detect_asymmetry(landmarks, frame_height)
-        
-        # Set detection thresholds
-        ASYMMETRY_THRESHOLD = 0.15  # 15% difference between limbs indicates potential need
-        VISIBILITY_THRESHOLD = 0.65  # Lower visibility might indicate obstruction or assistive device
-        
-        # Analyze each limb
-        for limb_name, landmark in limb_positions.items():
-            print(f"Analyzing {limb_name}: visibility {landmarks[landmark].visibility:.4f}")
-            
-            # Prepare detection criteria results
-            detection_reasons = []
-            confidence_score = 0.0
-            
-            # Check visibility - might indicate a prosthetic already in place
-            if landmarks[landmark].visibility < VISIBILITY_THRESHOLD:
-                detection_reasons.append(f"Low visibility ({landmarks[landmark].visibility:.2f})")
-                confidence_score += 0.3
-            
-            # Check asymmetry between left and right limbs
-            if "Knee" in limb_name:
-                asymmetry = asymmetry_data["hip_knee_asymmetry"]
-                if asymmetry > ASYMMETRY_THRESHOLD:
-                    detection_reasons.append(f"Hip-knee asymmetry detected ({asymmetry:.2f})")
-                    confidence_score += 0.4
-            elif "Ankle" in limb_name:
-                asymmetry = asymmetry_data["knee_ankle_asymmetry"]
-                if asymmetry > ASYMMETRY_THRESHOLD:
-                    detection_reasons.append(f"Knee-ankle asymmetry detected ({asymmetry:.2f})")
-                    confidence_score += 0.4
-            
-            # If any detection criteria met, add this limb to potential needs
-            if detection_reasons or True:  # Always include for testing
-                x_pixel = int(landmarks[landmark].x * frame_width)
-                y_pixel = int(landmarks[landmark].y * frame_height)
-                
-                points, distances = self.get_measurement_points(
-                    landmarks, limb_name, frame_width, frame_height)
-                
-                measurements = self.calculate_measurements(
-                    landmarks, limb_name, frame_height, distances)
-                
-                # Calculate final confidence (cap at 1.0)
-                final_confidence = min(confidence_score + 0.3, 1.0)  # Add base confidence
-                
-                potential_needs.append({
-                    "limb_type": limb_name,
-                    "coordinates": {"x": x_pixel, "y": y_pixel},
-                    "confidence": final_confidence,
-                    "detection_reasons": detection_reasons,
-                    "recommended_size": measurements,
-                    "points": points,
-                    "distances": distances,
-                    "asymmetry_data": asymmetry_data
-                })
-                print(f"Added {limb_name} as potential prosthetic need with confidence {final_confidence:.2f}")
-        
+    def detect_potential_prosthetic_needs(self, landmarks, frame_width, frame_height, limbs=geometry.DEFAULT_LIMBS):
+        """Detect limbs that might need prosthetic support using multiple criteria.
+
+        ``landmarks`` may be MediaPipe landmarks or the (33, 4) array from
+        ``geometry.landmarks_to_array``; all limbs of the table are measured
+        in a single vectorized pass.
+        """
+        if landmarks is None or len(landmarks) == 0:
+            logger.debug("No landmarks provided for detection")
+            return []
+
+        potential_needs = geometry.analyze_limbs(
+            geometry.landmarks_to_array(landmarks), frame_width, frame_height, limbs=limbs)
+        logger.debug("Analyzed %d limbs for potential prosthetic needs", len(potential_needs))
         return potential_needs
 
     def calculate_measurements(self, landmarks, limb_type, frame_height, distances):
         """Calculate recommended prosthetic measurements"""
         try:
-            measurements = {}
-            
-            if "Knee" in limb_type:
-                primary_length = distances[0]
-                measurements = {
-                    "length": float(primary_length),
-                    "circumference": float(primary_length * 0.35),
-                    "width": float(primary_length * 0.12)
-                }
-                
-            elif "Ankle" in limb_type:
-                primary_length = distances[0]
-                measurements = {
-                    "length": float(primary_length),
-                    "circumference": float(primary_length * 0.25),
-                    "width": float(primary_length * 0.08)
-                }
-            
-            print(f"Calculated measurements for {limb_type}: {measurements}")
-            return measurements
+            limb = geometry.LIMBS_BY_NAME[limb_type]
+            primary_length = float(distances[0])
+            return {
+                "length": primary_length,
+                "circumference": primary_length * limb.circumference_ratio,
+                "width": primary_length * limb.width_ratio
+            }
         except Exception as e:
-            print(f"Error calculating measurements: {str(e)}")
+            logger.error("Error calculating measurements: %s", e)
             return {"length": 0, "circumference": 0, "width": 0}
 
-    def create_visualization(self, image, landmarks, potential_needs, width, height):
+    def create_visualization(self, image, landmarks, potential_needs, width, height,
+                             image_format='jpeg', quality=90):
         """Create visualization with landmarks and measurements"""
         try:
-            # Create a copy of the image for visualization
-            vis_image = image.copy()
-            
-            # Draw pose landmarks
-            mp_drawing = mp.solutions.drawing_utils
-            mp_drawing_styles = mp.solutions.drawing_styles
-            
-            # Draw the pose landmarks
-            mp_drawing.draw_landmarks(
-                vis_image,
-                mp.solutions.pose.PoseLandmark(landmarks),
-                mp.solutions.pose.POSE_CONNECTIONS,
-                landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style()
-            )
-            
-            # Draw measurements for each detected need
-            for need in potential_needs:
-                # Draw measurement points
-                for point in need['points']:
-                    cv2.circle(
-                        vis_image, 
-                        (int(point['x']), int(point['y'])), 
-                        radius=5, 
-                        color=(0, 0, 255),  # Red
-                        thickness=-1  # Filled circle
-                    )
-                
-                # Draw lines between points
-                for i in range(len(need['points']) - 1):
-                    pt1 = (int(need['points'][i]['x']), int(need['points'][i]['y']))
-                    pt2 = (int(need['points'][i+1]['x']), int(need['points'][i+1]['y']))
-                    cv2.line(vis_image, pt1, pt2, (0, 255, 0), 2)  # Green line
-                    
-                    # Add measurement text
-                    mid_x = (pt1[0] + pt2[0]) // 2
-                    mid_y = (pt1[1] + pt2[1]) // 2
-                    cv2.putText(
-                        vis_image,
-                        f"{need['distances'][i]:.1f} cm",
-                        (mid_x, mid_y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (255, 255, 255),  # White text
-                        2  # Thickness
-                    )
-                
-                # Indicate the potential prosthetic need with a label
-                coord_x = int(need['coordinates']['x'])
-                coord_y = int(need['coordinates']['y'])
-                confidence = need['confidence']
-                cv2.putText(
-                    vis_image,
-                    f"{need['limb_type']} ({confidence:.2f})",
-                    (coord_x - 10, coord_y - 20),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 0, 255),  # Red text
-                    2  # Thickness
-                )
-                
-            # Convert back to JPEG for returning to client
-            _, buffer = cv2.imencode('.jpg', vis_image)
-            return buffer.tobytes()
-            
+            vis_image = draw_annotations(
+                image.copy(), geometry.landmarks_to_array(landmarks), potential_needs, width, height)
+            content, _ = encode_image(vis_image, image_format, quality)
+            return content
         except Exception as e:
-            print(f"Error creating visualization: {str(e)}")
+            logger.exception("Error creating visualization: %s", e)
             return None
 
-pose_estimator = ProstheticPoseEstimator()
+POSE_BACKEND = os.environ.get('MEASUREMENT_BACKEND', 'solution')
+INFERENCE_PROCESSES = int(os.environ.get('MEASUREMENT_PROCESSES', 0))
+pose_estimator = ProstheticPoseEstimator(
+    model_complexity=int(os.environ.get('MEASUREMENT_MODEL_COMPLEXITY', 2)),
+    backend=POSE_BACKEND,
+    processes=INFERENCE_PROCESSES,
+    **({'int8': os.environ.get('MEASUREMENT_ONNX_INT8', '0') == '1'} if POSE_BACKEND == 'onnx' else {}),
+)
+# Pose inference runs on a crop around the subject found by this pre-pass
+ROI_ENABLED = os.environ.get('MEASUREMENT_ROI', '1') != '0'
+person_detector = person_roi.PersonDetector()
+roi_tracker = person_roi.RoiTracker(
+    max_sessions=int(os.environ.get('MEASUREMENT_ROI_SESSIONS', 1024)),
+    ttl=float(os.environ.get('MEASUREMENT_ROI_TTL', 30)),
+)
+visualization_store = VisualizationStore()
+# Inference runs off the event loop, so one worker can serve other requests meanwhile.
+# With inference processes, a thread per frame slot decodes while the processes are busy
+INFERENCE_THREADS = max(int(os.environ.get('MEASUREMENT_THREADS', 1)),
+                        pose_estimator.backend.slots if INFERENCE_PROCESSES else 0)
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix='inference')
+if INFERENCE_PROCESSES:
+    metrics.REGISTRY.gauge(
+        "measurement_frame_slots_in_use", "Shared memory frame slots holding a frame for inference.",
+        lambda: pose_estimator.backend.slots_in_use)
 
-@app.post("/analyze/image")
-async def analyze_image(file: UploadFile = File(...)):
-    print("Received image analysis request")
-    try:
-        # Read and process the image
-        contents = await file.read()
-        print("Successfully read file contents")
-        
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            print("Failed to decode image")
-            return {
-                "success": False,
-                "message": "Invalid image data. Please try a different image.",
-                "missing_limbs": []
-            }
-        
-        print(f"Successfully decoded image with shape: {image.shape}")
-        height, width = image.shape[:2]
-        
-        # Estimate pose
-        results, processed_image = pose_estimator.estimate_pose(image)
-        if not results.pose_landmarks:
-            print("No pose landmarks detected in image")
-            return {
-                "success": False,
-                "message": "Could not detect body pose clearly in the image. Please ensure the full body is visible.",
-                "missing_limbs": []
-            }
-        
-        # Get landmarks
-        landmarks = pose_estimator.get_landmarks(results)
-        if not landmarks:
-            print("Failed to extract landmarks from results")
-            return {
-                "success": False,
-                "message": "Failed to extract pose landmarks. Please try again with a clearer image.",
-                "missing_limbs": []
-            }
-        
-        # Detect potential prosthetic needs
-        potential_needs = pose_estimator.detect_potential_prosthetic_needs(landmarks, width, height)
-        
-        # Create visualization with annotations
-        visualization = pose_estimator.create_visualization(
-            processed_image, results.pose_landmarks, potential_needs, width, height)
-        
-        # Always return results, even if no potential needs detected
-        if not potential_needs:
-            print("No potential prosthetic needs detected")
-            return {
-                "success": True,
-                "message": "Analysis complete. No specific prosthetic needs detected based on current criteria.",
-                "missing_limbs": [],
-                "image_dimensions": {"width": width, "height": height}
-            }
-        
-        print(f"Analysis complete. Found {len(potential_needs)} potential prosthetic needs")
+# Analyses running at once, and how many requests may wait (and for how
+# long) in the interactive and batch lanes before being refused with 503
+QUEUE_WAIT_SECONDS = metrics.REGISTRY.histogram(
+    "measurement_queue_wait_seconds", "Time analyses waited for an inference slot.", ("lane", "outcome"))
+admission = AdmissionController(
+    concurrency=int(os.environ.get('MEASUREMENT_CONCURRENCY', INFERENCE_THREADS)),
+    queue_depth={
+        "interactive": int(os.environ.get('MEASUREMENT_QUEUE_DEPTH', 8)),
+        "batch": int(os.environ.get('MEASUREMENT_BATCH_QUEUE_DEPTH', 32)),
+    },
+    max_wait={
+        "interactive": float(os.environ.get('MEASUREMENT_QUEUE_TIMEOUT', 10)),
+        "batch": float(os.environ.get('MEASUREMENT_BATCH_QUEUE_TIMEOUT', 120)),
+    },
+    on_wait=lambda seconds, lane, outcome: QUEUE_WAIT_SECONDS.observe(seconds, lane=lane, outcome=outcome),
+)
+app.add_middleware(AdmissionGate, controller=admission, paths=("/analyze/image",))
+for _lane in LANES:
+    metrics.REGISTRY.gauge(
+        f"measurement_queue_depth_{_lane}", f"Analyses waiting in the {_lane} lane.",
+        lambda lane=_lane: admission.queued(lane))
+metrics.REGISTRY.gauge(
+    "measurement_inference_running", "Analyses holding an inference slot.", lambda: admission.running)
+
+# Sampling profiles of requests asking for one, shared with the backend's
+# store and served under /analyze/profiles; no middleware when disabled
+profiler = profiling.RequestProfiler(
+    profiling.ProfileStore(Config.PROFILE_FOLDER, Config.PROFILE_LIMIT),
+    token=Config.PROFILE_TOKEN,
+    sample_rate=Config.PROFILE_SAMPLE_RATE,
+    interval=Config.PROFILE_INTERVAL,
+)
+if profiler.enabled:
+    app.add_middleware(profiling.ProfilingMiddleware, profiler=profiler, service="measurement")
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('MEASUREMENT_CACHE_SIZE', 256)),
+    directory=os.environ.get('MEASUREMENT_CACHE_DIR') or None,
+    max_disk_bytes=int(os.environ.get('MEASUREMENT_CACHE_DIR_MB', 512)) * 1024 * 1024,
+)
+
+# Everything besides the image bytes that changes the analysis result
+ANALYSIS_PARAMS = {
+    "model_complexity": pose_estimator.model_complexity,
+    **pose_estimator.backend.describe(),
+    "min_detection_confidence": pose_estimator.min_detection_confidence,
+    "inference_min_side": INFERENCE_MIN_SIDE,
+    "limbs": [limb.name for limb in geometry.DEFAULT_LIMBS],
+    "roi": ROI_ENABLED,
+    "roi_min_side": person_roi.ROI_MIN_SIDE,
+    "roi_tile_min_scale": person_roi.TILE_MIN_SCALE,
+}
+
+def lookup_result(buffer, prior_roi=None):
+    """(cache key, cached entry or None); hashes the upload and may read disk.
+
+    A session's box from its previous frame changes the crop and so the
+    landmarks; results found with one are only shared for the same box.
+    """
+    params = ANALYSIS_PARAMS if prior_roi is None else {**ANALYSIS_PARAMS, "prior_roi": prior_roi.as_dict()}
+    cache_key = ResultCache.key(buffer, params)
+    return cache_key, result_cache.get(cache_key)
+
+def remember_roi(session, landmarks, dimensions):
+    """Box the session's next frame is cropped to, from this frame's landmarks"""
+    roi = None
+    if landmarks is not None:
+        roi = person_roi.roi_from_landmarks(landmarks, dimensions["width"], dimensions["height"])
+    roi_tracker.put(session, roi)
+
+def render_visualization(image, landmarks, potential_needs, width, height):
+    """Runs on the visualization worker, outside any request"""
+    with stage("visualization", service="measurement"):
+        return draw_annotations(image, landmarks, potential_needs, width, height)
+
+def locate_subject(buffer, decoded, prior_roi=None):
+    """Find the subject's crop box; returns (roi or None, source, decoded).
+
+    A streaming session reuses ``prior_roi``, the box from its previous
+    frame. When the
+    subject is too small at the reduced decode resolution, the upload is
+    decoded again at a finer scale, which the returned image reflects.
+    """
+    roi = prior_roi
+    source = "session" if roi is not None else None
+    if roi is None:
+        roi = person_detector.detect(decoded.image)
+        source = "detector" if roi is not None else None
+    if roi is None:
+        return None, "frame", decoded
+
+    height, width = decoded.image.shape[:2]
+    side = roi.side(width, height)
+    if decoded.scale > 1 and side < person_roi.ROI_MIN_SIDE:
+        # Short side at which the crop reaches ROI_MIN_SIDE at full resolution
+        min_side = math.ceil(person_roi.ROI_MIN_SIDE / (side * decoded.scale) * min(decoded.width, decoded.height))
+        with stage("decode"):
+            finer = decode_image(buffer, min_side=min_side)
+        if finer is not None:
+            decoded = finer
+    return roi, source, decoded
+
+def run_analysis(buffer, session=None, prior_roi=None):
+    """Decode, run pose inference and measure; returns (response, landmarks, image)"""
+    with stage("decode"):
+        decoded = decode_image(buffer)
+
+    if decoded is None:
+        logger.info("Failed to decode image")
+        return {
+            "success": False,
+            "message": "Invalid image data. Please try a different image.",
+            "missing_limbs": []
+        }, None, None
+
+    roi, roi_source = None, "frame"
+    if ROI_ENABLED:
+        with stage("roi"):
+            roi, roi_source, decoded = locate_subject(buffer, decoded, prior_roi)
+
+    image = decoded.image
+    logger.debug("Decoded image with shape %s (1/%d of original)", image.shape, decoded.scale)
+    # Landmarks are normalized, so measurements use the original dimensions
+    width, height = decoded.width, decoded.height
+
+    # Estimate pose on the crop, falling back to the whole frame if the
+    # subject is not found in it
+    with stage("inference"):
+        results, _ = pose_estimator.estimate_pose(person_roi.crop(image, roi) if roi else image)
+        if roi is not None and results is None:
+            logger.debug("No pose in the %s crop, retrying on the full frame", roi_source)
+            roi, roi_source = None, "frame"
+            results, _ = pose_estimator.estimate_pose(image)
+    processed_image = image
+    roi_info = {"source": roi_source, **(roi or person_roi.FULL_FRAME).as_dict()}
+    if session:
+        # Forgotten unless this frame yields landmarks to box
+        roi_tracker.put(session, None)
+    if results is None:
+        logger.info("No pose landmarks detected in image")
+        return {
+            "success": False,
+            "message": "Could not detect body pose clearly in the image. Please ensure the full body is visible.",
+            "missing_limbs": []
+        }, None, processed_image
+
+    # Get landmarks
+    landmarks = pose_estimator.get_landmarks(results)
+    if len(landmarks) == 0:
+        logger.info("Failed to extract landmarks from results")
+        return {
+            "success": False,
+            "message": "Failed to extract pose landmarks. Please try again with a clearer image.",
+            "missing_limbs": []
+        }, None, processed_image
+
+    # Convert landmarks once, in full-frame coordinates, and measure every limb in one pass
+    with stage("geometry"):
+        landmark_array = geometry.landmarks_to_array(landmarks)
+        if roi is not None:
+            landmark_array = person_roi.to_frame(landmark_array, roi, image.shape)
+        if session:
+            remember_roi(session, landmark_array, {"width": width, "height": height})
+        potential_needs = pose_estimator.detect_potential_prosthetic_needs(landmark_array, width, height)
+
+    # Always return results, even if no potential needs detected
+    if not potential_needs:
+        logger.debug("No potential prosthetic needs detected")
         return {
             "success": True,
-            "message": f"Analysis complete. Found {len(potential_needs)} potential prosthetic needs.",
-            "missing_limbs": potential_needs,
-            "image_dimensions": {"width": width, "height": height}
+            "message": "Analysis complete. No specific prosthetic needs detected based on current criteria.",
+            "missing_limbs": [],
+            "image_dimensions": {"width": width, "height": height},
+            "roi": roi_info
+        }, landmark_array, processed_image
+
+    logger.debug("Analysis complete. Found %d potential prosthetic needs", len(potential_needs))
+    return {
+        "success": True,
+        "message": f"Analysis complete. Found {len(potential_needs)} potential prosthetic needs.",
+        "missing_limbs": potential_needs,
+        "image_dimensions": {"width": width, "height": height},
+        "roi": roi_info
+    }, landmark_array, processed_image
+
+@app.post("/analyze/image")
+async def analyze_image(
+    request: Request,
+    file: UploadFile = File(...),
+    visualize: bool = False,
+    session: Optional[str] = None,
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
+):
+    logger.debug("Received image analysis request")
+    try:
+        # Decode straight from the spooled upload; identical uploads with
+        # the same parameters are answered from the result cache
+        buffer = read_upload_buffer(file.file)
+        # Read once, so the cache key and the analysis agree on the box
+        prior_roi = roi_tracker.get(session) if session and ROI_ENABLED else None
+        with stage("cache"):
+            cache_key, cached = await run_in_threadpool(profiling.follow(lookup_result), buffer, prior_roi)
+
+        if cached is not None:
+            logger.debug("Cache hit for %s", cache_key[:12])
+            response, landmark_array, image = cached["response"], cached["landmarks"], None
+            if session and ROI_ENABLED:
+                remember_roi(session, landmark_array, response.get("image_dimensions"))
+        else:
+            # Wait for an inference slot, unless the queue is full, the
+            # deadline passes or the client gives up first
+            received = getattr(request.state, "received", None) or time.monotonic()
+            with stage("queue"):
+                await admission.acquire(
+                    priority, request_deadline(request.headers, received), request.is_disconnected)
+            started = time.monotonic()
+            try:
+                # The copied context carries this request's stage timings
+                context = contextvars.copy_context()
+                response, landmark_array, image = await asyncio.get_running_loop().run_in_executor(
+                    inference_executor, context.run, profiling.follow(run_analysis), buffer, session, prior_roi)
+            finally:
+                admission.release(time.monotonic() - started)
+            await run_in_threadpool(profiling.follow(result_cache.put), cache_key, response, landmark_array)
+
+        response = dict(response)
+        response["metadata"] = {
+            "cache": "hit" if cached is not None else "miss",
+            "cache_key": cache_key,
         }
-        
+
+        # Visualization is opt-in and rendered off the request path; the
+        # frame is handed over to the worker, so it is drawn without a copy
+        if visualize and landmark_array is not None:
+            if image is None:
+                with stage("decode"):
+                    image = (await run_in_threadpool(profiling.follow(decode_image), buffer)).image
+            dimensions = response["image_dimensions"]
+            visualization_id = visualization_store.submit(
+                render_visualization, image, landmark_array, response["missing_limbs"],
+                dimensions["width"], dimensions["height"])
+            response["visualization_id"] = visualization_id
+            response["visualization_url"] = f"/analyze/visualization/{visualization_id}"
+
+        return response
+
+    except AdmissionError as e:
+        logger.info("Analysis refused (%s): %s", e.reason, e)
+        return JSONResponse(status_code=503, content=refusal_body(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
-        print(f"Error during image analysis: {str(e)}")
+        logger.exception("Error during image analysis: %s", e)
         return {
             "success": False,
             "message": f"An error occurred during image analysis: {str(e)}",
             "missing_limbs": []
         }
 
+@app.get("/analyze/visualization/{result_id}")
+async def get_visualization(
+    result_id: str,
+    format: str = Query("jpeg"),
+    quality: int = Query(90, ge=1, le=100),
+):
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{format}'. Use one of: {', '.join(IMAGE_FORMATS)}"
+        )
+    try:
+        with stage("encode"):
+            content, media_type = await run_in_threadpool(
+                profiling.follow(visualization_store.encode), result_id, format, quality)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Visualization not found or expired")
+    except Exception as e:
+        logger.exception("Error rendering visualization %s: %s", result_id, e)
+        raise HTTPException(status_code=500, detail=f"Error rendering visualization: {str(e)}")
+    return Response(content=content, media_type=media_type)
+
+def profile_access(request: Request):
+    """Refuse profile endpoints without the profiling token"""
+    if not profiler.authorized(request.headers):
+        raise HTTPException(status_code=403, detail=f"A valid {profiling.TOKEN_HEADER} header is required")
+
+@app.get("/analyze/profiles", dependencies=[Depends(profile_access)])
+async def list_profiles():
+    return {"profiles": profiler.store.list()}
+
+@app.get("/analyze/profiles/{profile_id}", dependencies=[Depends(profile_access)])
+async def download_profile(profile_id: str):
+    found = profiler.store.get(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=found[1], media_type=profiling.FOLDED_CONTENT_TYPE,
+                    headers={"Content-Disposition": f"attachment; filename={profile_id}.folded"})
+
+@app.get("/analyze/profiles/{profile_id}/flamegraph", dependencies=[Depends(profile_access)])
+async def profile_flamegraph(profile_id: str):
+    found = profiler.store.get(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    metadata, folded = found
+    return Response(content=profiling.render_flamegraph(folded, profiling.flamegraph_title(metadata)),
+                    media_type=profiling.SVG_CONTENT_TYPE)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {
@@ -473,6 +531,13 @@ async def root():
             "Asymmetry analysis",
             "Prosthetic need identification",
             "Measurement calculation",
-            "Visualization points"
+            "Visualization points",
+            "Deferred visualization rendering",
+            "Result caching",
+            "Person ROI cropping",
+            "Pluggable inference backends",
+            "Shared-memory inference processes",
+            "Admission control with priority lanes",
+            "On-demand request profiling"
         ]
     }
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""Admission control in front of pose inference.
+
+At most ``concurrency`` analyses run at once; the rest wait in one of
+two bounded queues, ``interactive`` and ``batch``. A freed slot goes to
+the oldest interactive request first, so batch work only runs when no
+interactive request is waiting. A request is refused with 503 and a
+``Retry-After`` estimate instead of queueing when:
+
+- its lane's queue is full (checked by ``AdmissionGate`` before the
+  upload is read, and again when the request asks for a slot);
+- it is still waiting at its deadline, which is the lane's maximum wait
+  or the client's ``X-Request-Timeout`` (seconds), whichever is sooner;
+- its client disconnected while it waited.
+
+Everything runs on the event loop, so no locking is needed.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+
+LANES = ('interactive', 'batch')
+# How often a waiting request checks that its client is still there
+POLL_INTERVAL = 0.5
+# Weight of the newest sample in the running service time estimate
+_SMOOTHING = 0.2
+
+
+class AdmissionError(Exception):
+    """A request that will not be served; ``reason`` is saturated, deadline or disconnected"""
+
+    def __init__(self, reason, message, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, concurrency, queue_depth, max_wait, on_wait=None):
+        """``queue_depth`` and ``max_wait`` (seconds) map each lane to its limit.
+
+        ``on_wait(seconds, lane, outcome)`` is called as each request
+        leaves the queue, admitted or not.
+        """
+        self.concurrency = concurrency
+        self.queue_depth = dict(queue_depth)
+        self.max_wait = dict(max_wait)
+        self.on_wait = on_wait
+        self.running = 0
+        self.service_time = None
+        self._waiters = {lane: deque() for lane in LANES}
+
+    def queued(self, lane=None):
+        if lane is None:
+            return sum(len(waiters) for waiters in self._waiters.values())
+        return len(self._waiters[lane])
+
+    def saturated(self, lane):
+        """Whether a new request in ``lane`` would be refused right now"""
+        return self.running >= self.concurrency and self.queued(lane) >= self.queue_depth[lane]
+
+    def retry_after(self):
+        """Whole seconds until the current backlog is likely to have drained"""
+        backlog = self.running + self.queued()
+        return max(1, math.ceil(backlog / self.concurrency * (self.service_time or 1.0)))
+
+    def refuse(self, reason, message, lane, started):
+        """The error refusing a request that arrived at ``started``, recording its wait"""
+        self._observe(time.monotonic() - started, lane, reason)
+        return AdmissionError(reason, message, self.retry_after())
+
+    def _observe(self, seconds, lane, outcome):
+        if self.on_wait is not None:
+            self.on_wait(seconds, lane, outcome)
+
+    async def acquire(self, lane, deadline=None, disconnected=None):
+        """Wait for an inference slot.
+
+        ``deadline`` is a ``time.monotonic()`` time and ``disconnected`` an
+        async callable reporting whether the client has gone. Raises
+        ``AdmissionError`` when the request is refused or dropped.
+        """
+        started = time.monotonic()
+        if self.running < self.concurrency:
+            # A free slot means nobody is waiting
+            self.running += 1
+            self._observe(0.0, lane, 'admitted')
+            return
+        if self.queued(lane) >= self.queue_depth[lane]:
+            raise self.refuse('saturated', f"The {lane} queue is full", lane, started)
+
+        limit = started + self.max_wait[lane]
+        if deadline is not None:
+            limit = min(limit, deadline)
+        granted = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(granted)
+        try:
+            while not granted.done():
+                remaining = limit - time.monotonic()
+                if remaining <= 0:
+                    raise self.refuse('deadline', "Timed out waiting for an inference slot", lane, started)
+                try:
+                    await asyncio.wait_for(asyncio.shield(granted), min(remaining, POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    if disconnected is not None and await disconnected():
+                        raise self.refuse('disconnected', "Client disconnected while queued", lane, started)
+        except BaseException:
+            if granted.done() and not granted.cancelled():
+                # The slot was handed over just as the request gave up
+                self._hand_over()
+            else:
+                granted.cancel()
+                self._waiters[lane].remove(granted)
+            raise
+
+        # Clients may have given up while their slot was coming free
+        if disconnected is not None and await disconnected():
+            self._hand_over()
+            raise self.refuse('disconnected', "Client disconnected while queued", lane, started)
+        self._observe(time.monotonic() - started, lane, 'admitted')
+
+    def release(self, service_time=None):
+        """Give a slot back; ``service_time`` (seconds) refines ``retry_after``"""
+        if service_time is not None:
+            self.service_time = service_time if self.service_time is None else (
+                (1 - _SMOOTHING) * self.service_time + _SMOOTHING * service_time)
+        self._hand_over()
+
+    def _hand_over(self):
+        """Pass a slot to the next waiter, interactive first, or free it"""
+        for lane in LANES:
+            waiters = self._waiters[lane]
+            while waiters:
+                granted = waiters.popleft()
+                if not granted.done():
+                    granted.set_result(None)
+                    return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def slot(self, lane, deadline=None, disconnected=None):
+        await self.acquire(lane, deadline, disconnected)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+def request_deadline(headers, received):
+    """Monotonic deadline from an ``X-Request-Timeout`` header, or None"""
+    try:
+        timeout = float(headers.get('x-request-timeout', ''))
+    except ValueError:
+        return None
+    return received + timeout if timeout > 0 else None
+
+
+def refusal_body(error):
+    return {"success": False, "message": str(error), "missing_limbs": [], "reason": error.reason}
+
+
+class AdmissionGate:
+    """ASGI middleware refusing requests to ``paths`` while their lane is full.
+
+    It answers before the upload is read, so a burst does not have to be
+    received (and spooled) only to be refused. The lane comes from the
+    ``priority`` query parameter.
+    """
+
+    def __init__(self, app, controller, paths):
+        self.app = app
+        self.controller = controller
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('path') not in self.paths:
+            return await self.app(scope, receive, send)
+        # Deadlines count from arrival, before the upload is read
+        scope.setdefault('state', {})['received'] = time.monotonic()
+        lane = _query_param(scope, 'priority') or LANES[0]
+        if lane not in LANES or not self.controller.saturated(lane):
+            return await self.app(scope, receive, send)
+
+        error = self.controller.refuse('saturated', f"The {lane} queue is full", lane, time.monotonic())
+        body = json.dumps(refusal_body(error)).encode()
+        await send({'type': 'http.response.start', 'status': 503, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'retry-after', str(error.retry_after).encode()),
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def _query_param(scope, name):
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(name)
+    return values[0] if values else None
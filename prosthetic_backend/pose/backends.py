@@ -0,0 +1,291 @@
+"""Pose inference backends.
+
+Every backend takes a BGR frame and returns a (33, 4) array of landmark
+x, y (normalized to the frame), z and visibility, or None when nobody
+is found. ``MEASUREMENT_BACKEND`` selects one:
+
+``solution``
+    The legacy ``mp.solutions.pose`` graph (the original implementation).
+``tasks``
+    MediaPipe Tasks ``PoseLandmarker`` on the CPU (XNNPACK) delegate, with
+    the lite, full or heavy ``.task`` bundle.
+``tflite``
+    The BlazePose landmark model run directly by the TensorFlow Lite
+    interpreter on a crop around the person detector's box.
+``onnx``
+    The same crop and landmark model on ONNX Runtime's CPU provider. The
+    model is converted from the TensorFlow Lite one on first use and may
+    be quantized to int8 weights (``MEASUREMENT_ONNX_INT8=1``).
+
+The model complexity (0, 1, 2) picks the lite, full or heavy model for
+every backend. Models that are not bundled with MediaPipe are fetched
+into ``MEASUREMENT_MODEL_DIR`` (or MediaPipe's own module folder for the
+legacy graph) on first use; ``preload`` does it up front.
+"""
+import logging
+import os
+import threading
+import urllib.request
+
+import cv2
+import numpy as np
+
+from pose import roi as person_roi
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = ('lite', 'full', 'heavy')
+MODEL_DIR = os.environ.get('MEASUREMENT_MODEL_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'prosthetic_pose')
+TASK_MODEL_URL = ('https://storage.googleapis.com/mediapipe-models/pose_landmarker/'
+                  'pose_landmarker_{variant}/float16/latest/pose_landmarker_{variant}.task')
+
+# Input side of the BlazePose landmark model
+LANDMARK_INPUT = 256
+# The model predicts 33 landmarks and 6 auxiliary points used for tracking
+_MODEL_POINTS = 39
+_LANDMARKS = 33
+# Below this pose presence the crop is taken to hold nobody
+MIN_PRESENCE = 0.5
+
+
+def _sigmoid(values):
+    return 1 / (1 + np.exp(-np.clip(values, -100, 100)))
+
+
+def _download(url, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.part'
+    logger.info("Downloading %s", url)
+    urllib.request.urlretrieve(url, partial)
+    os.replace(partial, path)
+
+
+def landmark_model_path(variant):
+    """Path to MediaPipe's BlazePose landmark model, fetching lite and heavy if needed"""
+    import mediapipe as mp
+    path = os.path.join(os.path.dirname(mp.__file__), 'modules', 'pose_landmark', f'pose_landmark_{variant}.tflite')
+    if not os.path.exists(path):
+        mp.solutions.pose._download_oss_pose_landmark_model(VARIANTS.index(variant))
+    return path
+
+
+class PoseBackend:
+    """One inference graph or session per thread, created on first use"""
+    name = None
+
+    def __init__(self, model_complexity=2, min_detection_confidence=0.3, num_threads=1):
+        self.model_complexity = model_complexity
+        self.variant = VARIANTS[model_complexity]
+        self.min_detection_confidence = min_detection_confidence
+        self.num_threads = num_threads
+        # Graphs and sessions are not thread-safe, and their threads would
+        # not survive a fork of the server
+        self._local = threading.local()
+
+    @property
+    def handle(self):
+        handle = getattr(self._local, 'handle', None)
+        if handle is None:
+            handle = self._local.handle = self.create()
+        return handle
+
+    def create(self):
+        raise NotImplementedError
+
+    def preload(self):
+        """Fetch or build the model files before serving"""
+
+    def describe(self):
+        """Settings that change the landmarks, for result cache keys"""
+        return {'backend': self.name, 'variant': self.variant}
+
+    def process(self, frame):
+        raise NotImplementedError
+
+
+class SolutionBackend(PoseBackend):
+    """The legacy ``mp.solutions.pose`` graph"""
+    name = 'solution'
+
+    def create(self):
+        import mediapipe as mp
+        return mp.solutions.pose.Pose(
+            static_image_mode=True,
+            model_complexity=self.model_complexity,
+            min_detection_confidence=self.min_detection_confidence
+        )
+
+    def preload(self):
+        # Pose() downloads the heavy/lite models on first use; do it up front
+        landmark_model_path(self.variant)
+
+    def process(self, frame):
+        results = self.handle.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if not results.pose_landmarks:
+            return None
+        return np.array([(point.x, point.y, point.z, point.visibility)
+                         for point in results.pose_landmarks.landmark], dtype=np.float64)
+
+
+class TasksBackend(PoseBackend):
+    """MediaPipe Tasks ``PoseLandmarker`` in image mode on the CPU delegate"""
+    name = 'tasks'
+
+    def model_path(self):
+        return os.path.join(MODEL_DIR, f'pose_landmarker_{self.variant}.task')
+
+    def preload(self):
+        if not os.path.exists(self.model_path()):
+            _download(TASK_MODEL_URL.format(variant=self.variant), self.model_path())
+
+    def create(self):
+        from mediapipe.tasks.python import BaseOptions, vision
+        self.preload()
+        options = vision.PoseLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=self.model_path(), delegate=BaseOptions.Delegate.CPU),
+            running_mode=vision.RunningMode.IMAGE,
+            num_poses=1,
+            min_pose_detection_confidence=self.min_detection_confidence,
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+
+    def process(self, frame):
+        import mediapipe as mp
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        result = self.handle.detect(image)
+        if not result.pose_landmarks:
+            return None
+        return np.array([(point.x, point.y, point.z, point.visibility or 0.0)
+                         for point in result.pose_landmarks[0]], dtype=np.float64)
+
+
+class CropBackend(PoseBackend):
+    """Person detector, then the landmark model on a square crop around the body.
+
+    The crop is the detector's padded body square, resized to the model's
+    256 px input and zero-filled where it leaves the frame. Unlike the
+    MediaPipe graphs, the crop is not rotated to align the body (clinic
+    photos are upright) and landmarks are not refined from the heatmap.
+    Subclasses run the model: ``run`` takes the (1, 256, 256, 3) float
+    input in [0, 1] and returns the model's output arrays.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.detector = person_roi.PersonDetector(min_score=self.min_detection_confidence,
+                                                  num_threads=self.num_threads)
+
+    def run(self, tensor):
+        raise NotImplementedError
+
+    def process(self, frame):
+        # Like the MediaPipe graphs, only the whole frame is searched; the
+        # measurement API's ROI pre-pass already looks for small subjects
+        located = self.detector.locate(frame, search_tiles=False)
+        if located is None:
+            return None
+        (cx, cy), half_side = located
+        height, width = frame.shape[:2]
+
+        # Crop pixel (u, v) maps to frame pixel scale * (u, v) + offset
+        scale = 2 * half_side / LANDMARK_INPUT
+        transform = np.array([[scale, 0.0, cx - half_side], [0.0, scale, cy - half_side]])
+        crop = cv2.warpAffine(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), transform, (LANDMARK_INPUT, LANDMARK_INPUT),
+                              flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_CONSTANT)
+        tensor = (crop.astype(np.float32) / 255)[None]
+
+        outputs = self.run(tensor)
+        # Outputs are told apart by size: landmarks, then pose presence
+        raw = next(output for output in outputs if output.size == _MODEL_POINTS * 5).reshape(_MODEL_POINTS, 5)
+        presence = next(output for output in outputs if output.size == 1)
+        if float(presence.ravel()[0]) < MIN_PRESENCE:
+            return None
+
+        raw = raw[:_LANDMARKS].astype(np.float64)
+        landmarks = np.empty((_LANDMARKS, 4))
+        landmarks[:, 0] = (raw[:, 0] * scale + cx - half_side) / width
+        landmarks[:, 1] = (raw[:, 1] * scale + cy - half_side) / height
+        # z is in crop pixels like x; normalized to the frame width as MediaPipe does
+        landmarks[:, 2] = raw[:, 2] * scale / width
+        landmarks[:, 3] = _sigmoid(raw[:, 3])
+        return landmarks
+
+
+class TFLiteBackend(CropBackend):
+    """The BlazePose landmark model on the TensorFlow Lite interpreter"""
+    name = 'tflite'
+
+    def preload(self):
+        landmark_model_path(self.variant)
+
+    def create(self):
+        import tensorflow as tf
+        interpreter = tf.lite.Interpreter(model_path=landmark_model_path(self.variant), num_threads=self.num_threads)
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def run(self, tensor):
+        interpreter = self.handle
+        interpreter.set_tensor(interpreter.get_input_details()[0]['index'], tensor)
+        interpreter.invoke()
+        return [interpreter.get_tensor(output['index']) for output in interpreter.get_output_details()]
+
+
+class OnnxBackend(CropBackend):
+    """The BlazePose landmark model on ONNX Runtime's CPU execution provider"""
+    name = 'onnx'
+
+    def __init__(self, *args, int8=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.int8 = int8
+
+    def describe(self):
+        return {**super().describe(), 'int8': self.int8}
+
+    def model_path(self):
+        suffix = '.int8' if self.int8 else ''
+        return os.path.join(MODEL_DIR, f'pose_landmark_{self.variant}{suffix}.onnx')
+
+    def preload(self):
+        path = self.model_path()
+        if os.path.exists(path):
+            return
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        float_path = os.path.join(MODEL_DIR, f'pose_landmark_{self.variant}.onnx')
+        if not os.path.exists(float_path):
+            import tf2onnx
+            logger.info("Converting the %s landmark model to ONNX", self.variant)
+            tf2onnx.convert.from_tflite(landmark_model_path(self.variant), opset=13,
+                                        output_path=float_path + '.part')
+            os.replace(float_path + '.part', float_path)
+        if self.int8:
+            # Dynamic quantization: int8 weights, activations quantized at run time
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info("Quantizing the %s landmark model to int8", self.variant)
+            quantize_dynamic(float_path, path + '.part', weight_type=QuantType.QInt8)
+            os.replace(path + '.part', path)
+
+    def create(self):
+        import onnxruntime
+        self.preload()
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        return onnxruntime.InferenceSession(self.model_path(), options, providers=['CPUExecutionProvider'])
+
+    def run(self, tensor):
+        session = self.handle
+        return session.run(None, {session.get_inputs()[0].name: tensor})
+
+
+BACKENDS = {backend.name: backend for backend in (SolutionBackend, TasksBackend, TFLiteBackend, OnnxBackend)}
+
+
+def create_backend(name, **options):
+    """Backend ``name`` from ``BACKENDS`` with constructor ``options``"""
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown pose backend '{name}'. Use one of: {', '.join(BACKENDS)}")
+    return backend(**options)
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Pose analysis results keyed by a hash of the image bytes and parameters.
+
+    A bounded in-memory LRU sits in front of an optional on-disk tier
+    (one JSON file per key) that survives restarts. The disk tier holds
+    at most ``max_disk_bytes``: reads refresh a file's modification time
+    and, once the directory grows past the bound, the least recently
+    used files are deleted until it is back under 90% of it. Entries hold
+    the response payload and the (33, 4) landmark array, if any.
+    """
+
+    def __init__(self, max_entries=256, directory=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_bytes = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    @staticmethod
+    def key(buffer, params):
+        """sha256 over the raw upload bytes followed by the sorted parameters"""
+        digest = hashlib.sha256(memoryview(buffer).cast('B'))
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached entry or None; disk hits are promoted to memory"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, entry)
+        return entry
+
+    def put(self, key, response, landmarks=None):
+        entry = {'response': response, 'landmarks': landmarks}
+        with self._lock:
+            self._store(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+            # The modification time orders files for eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        landmarks = stored.get('landmarks')
+        return {
+            'response': stored['response'],
+            'landmarks': np.array(landmarks, dtype=np.float64) if landmarks is not None else None,
+        }
+
+    def _write(self, key, entry):
+        if self.directory is None:
+            return
+        landmarks = entry['landmarks']
+        payload = {
+            'response': entry['response'],
+            'landmarks': landmarks.tolist() if landmarks is not None else None,
+        }
+        path = self._path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(payload, f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write cache entry %s: %s", key, e)
+            return
+        with self._disk_lock:
+            self.disk_bytes += size
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _disk_files(self):
+        """(path, size, mtime) of every entry on disk"""
+        files = []
+        for path in self.directory.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict_disk(self):
+        """Delete least recently used files until the tier is under 90% of its bound.
+
+        Other processes may share the directory, so usage is recounted
+        from the files rather than trusted.
+        """
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        evicted = 0
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not evict cache entry %s: %s", path.name, e)
+                continue
+            total -= size
+            evicted += 1
+        self.disk_bytes = total
+        logger.debug("Evicted %d cache entries, %d bytes remain on disk", evicted, total)
@@ -0,0 +1,163 @@
+import io
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+# Decoding at or above this short side keeps enough detail for the pose
+# graph, which resizes its input to 256 px anyway.
+INFERENCE_MIN_SIDE = int(os.environ.get('MEASUREMENT_INFERENCE_MIN_SIDE', 720))
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# EXIF orientations 5-8 swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# JPEG start-of-frame markers (excluding DHT, JPG and DAC)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+@dataclass
+class ImageHeader:
+    width: int
+    height: int
+    orientation: int = 1
+
+    @property
+    def oriented_size(self):
+        """(width, height) after applying the EXIF orientation"""
+        if self.orientation in _TRANSPOSED_ORIENTATIONS:
+            return self.height, self.width
+        return self.width, self.height
+
+
+@dataclass
+class DecodedImage:
+    image: np.ndarray
+    width: int          # oriented width of the original upload
+    height: int         # oriented height of the original upload
+    scale: int          # decode reduction factor (1 = full resolution)
+    orientation: int
+
+
+def read_upload_buffer(fileobj):
+    """Expose an uploaded file as a uint8 array without copying it.
+
+    Starlette spools uploads into a ``SpooledTemporaryFile``: small ones
+    stay in a BytesIO whose bytes are shared directly, larger ones roll
+    over to disk and are memory-mapped. Neither keeps the upload from
+    being closed while the array is still referenced.
+    """
+    raw = getattr(fileobj, '_file', fileobj)
+    if isinstance(raw, io.BytesIO):
+        # getvalue() hands over the BytesIO's own bytes object; getbuffer()
+        # would export it, and closing the BytesIO then fails
+        return np.frombuffer(raw.getvalue(), dtype=np.uint8)
+    try:
+        mapping = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        # Not backed by a real file (or empty); fall back to one read
+        fileobj.seek(0)
+        return np.frombuffer(fileobj.read(), dtype=np.uint8)
+    return np.frombuffer(mapping, dtype=np.uint8)
+
+
+def probe_image(buffer):
+    """Read size and EXIF orientation from a JPEG or PNG header.
+
+    Returns None for other formats or malformed headers.
+    """
+    data = memoryview(buffer).cast('B')
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        width, height = struct.unpack('>II', data[16:24])
+        return ImageHeader(width, height)
+    if data[:2] == b'\xff\xd8':
+        return _probe_jpeg(data)
+    return None
+
+
+def _probe_jpeg(data):
+    orientation = 1
+    pos = 2
+    size = len(data)
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        segment = data[pos + 4:pos + 2 + length]
+        if marker == 0xE1 and segment[:6] == b'Exif\x00\x00':
+            orientation = _exif_orientation(segment[6:]) or orientation
+        elif marker in _SOF_MARKERS and len(segment) >= 5:
+            height, width = struct.unpack('>HH', segment[1:5])
+            return ImageHeader(width, height, orientation)
+        elif marker == 0xDA:  # start of scan without a frame header
+            return None
+        pos += 2 + length
+    return None
+
+
+def _exif_orientation(tiff):
+    """Orientation tag (0x0112) from IFD0 of a TIFF block, if present"""
+    try:
+        endian = {b'II': '<', b'MM': '>'}[bytes(tiff[:2])]
+        ifd = struct.unpack(endian + 'I', tiff[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff[ifd:ifd + 2])[0]
+        for i in range(count):
+            entry = ifd + 2 + 12 * i
+            tag, _, _, value = struct.unpack(endian + 'HHIH', tiff[entry:entry + 10])
+            if tag == 0x0112:
+                return value if 1 <= value <= 8 else None
+    except (KeyError, struct.error, ValueError):
+        return None
+    return None
+
+
+def reduction_factor(width, height, min_side=INFERENCE_MIN_SIDE):
+    """Largest decode reduction that keeps the short side at ``min_side``"""
+    short_side = min(width, height)
+    for factor, _ in _REDUCED_FLAGS:
+        if short_side // factor >= min_side:
+            return factor
+    return 1
+
+
+def decode_image(buffer, min_side=INFERENCE_MIN_SIDE):
+    """Decode an upload at the smallest resolution inference needs.
+
+    JPEGs are scaled inside libjpeg (DCT scaling) so the full-size frame is
+    never materialised. The decoder applies the EXIF orientation itself, so
+    the frame comes back upright in a single pass. Returns None when the
+    data cannot be decoded.
+    """
+    header = probe_image(buffer)
+    flags = cv2.IMREAD_COLOR
+    factor = 1
+    if header is not None and min_side:
+        factor = reduction_factor(header.width, header.height, min_side)
+        flags = dict(_REDUCED_FLAGS).get(factor, cv2.IMREAD_COLOR)
+
+    image = cv2.imdecode(buffer, flags)
+    if image is None:
+        return None
+
+    if header is not None:
+        width, height = header.oriented_size
+        orientation = header.orientation
+    else:
+        height, width = image.shape[:2]
+        orientation = 1
+    return DecodedImage(image=image, width=width, height=height, scale=factor, orientation=orientation)
@@ -0,0 +1,79 @@
+"""Ring of preallocated frame slots in shared memory.
+
+Decoded frames are handed to inference worker processes through a slot
+instead of being pickled through a pipe: the owner copies the frame into
+a free slot and sends only the slot index, shape and dtype, and the
+worker reads the frame in place. Slots are taken from a free list and
+returned once the worker has answered; when all are in use, ``acquire``
+waits, which holds back new frames until inference catches up.
+"""
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class RingFull(Exception):
+    """No frame slot became free in time"""
+
+
+class FrameRing:
+    """``slots`` frame buffers of ``slot_bytes`` each in one shared memory block.
+
+    The process that creates the ring owns it: it hands out slots and
+    unlinks the memory on ``close``. Workers ``attach`` by name and only
+    read the slots they are told about.
+    """
+
+    def __init__(self, slots, slot_bytes, name=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=slots * slot_bytes)
+        self._free = queue.Queue()
+        if self.owner:
+            for index in range(slots):
+                self._free.put(index)
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        return cls(slots, slot_bytes, name=name)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def in_use(self):
+        """Slots currently handed out"""
+        return self.slots - self._free.qsize()
+
+    def fits(self, shape, dtype=np.uint8):
+        return int(np.prod(shape)) * np.dtype(dtype).itemsize <= self.slot_bytes
+
+    def view(self, index, shape, dtype=np.uint8):
+        """Array over slot ``index``, sharing its memory"""
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=index * self.slot_bytes)
+
+    def acquire(self, timeout=None):
+        """Index of a free slot, waiting up to ``timeout`` seconds for one"""
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise RingFull(f"All {self.slots} frame slots are in use")
+
+    def release(self, index):
+        self._free.put(index)
+
+    def put(self, frame, timeout=None):
+        """Copy ``frame`` into a free slot; returns the slot index"""
+        if not self.fits(frame.shape, frame.dtype):
+            raise ValueError(f"Frame of {frame.nbytes} bytes does not fit a {self.slot_bytes} byte slot")
+        index = self.acquire(timeout)
+        np.copyto(self.view(index, frame.shape, frame.dtype), frame)
+        return index
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,227 @@
+from dataclasses import dataclass
+from enum import IntEnum
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
+
+import numpy as np
+
+# Reference height of an average adult in cm
+REFERENCE_HEIGHT = 170
+NUM_LANDMARKS = 33
+
+_LANDMARK_FIELDS = attrgetter('x', 'y', 'z', 'visibility')
+
+# Set detection thresholds
+ASYMMETRY_THRESHOLD = 0.15  # 15% difference between limbs indicates potential need
+VISIBILITY_THRESHOLD = 0.65  # Lower visibility might indicate obstruction or assistive device
+
+
+class PoseLandmark(IntEnum):
+    """Landmark indices of the 33-point MediaPipe pose topology"""
+    NOSE = 0
+    LEFT_SHOULDER = 11
+    RIGHT_SHOULDER = 12
+    LEFT_ELBOW = 13
+    RIGHT_ELBOW = 14
+    LEFT_WRIST = 15
+    RIGHT_WRIST = 16
+    LEFT_PINKY = 17
+    RIGHT_PINKY = 18
+    LEFT_INDEX = 19
+    RIGHT_INDEX = 20
+    LEFT_THUMB = 21
+    RIGHT_THUMB = 22
+    LEFT_HIP = 23
+    RIGHT_HIP = 24
+    LEFT_KNEE = 25
+    RIGHT_KNEE = 26
+    LEFT_ANKLE = 27
+    RIGHT_ANKLE = 28
+    LEFT_HEEL = 29
+    RIGHT_HEEL = 30
+    LEFT_FOOT_INDEX = 31
+    RIGHT_FOOT_INDEX = 32
+
+
+@dataclass(frozen=True, eq=False)
+class SegmentPair:
+    """A limb segment measured on both sides of the body for asymmetry"""
+    name: str
+    left: tuple
+    right: tuple
+
+    @property
+    def label(self):
+        return self.name.replace('_', '-').capitalize()
+
+
+@dataclass(frozen=True, eq=False)
+class LimbSpec:
+    """A limb that can be assessed for a prosthetic.
+
+    ``chain`` lists three landmarks from proximal to distal; the first
+    segment of the chain drives the recommended size.
+    """
+    name: str
+    anchor: int
+    chain: tuple
+    asymmetry: str
+    circumference_ratio: float
+    width_ratio: float
+
+
+L = PoseLandmark
+
+SEGMENT_PAIRS = {
+    'hip_knee': SegmentPair('hip_knee', (L.LEFT_HIP, L.LEFT_KNEE), (L.RIGHT_HIP, L.RIGHT_KNEE)),
+    'knee_ankle': SegmentPair('knee_ankle', (L.LEFT_KNEE, L.LEFT_ANKLE), (L.RIGHT_KNEE, L.RIGHT_ANKLE)),
+    'shoulder_elbow': SegmentPair('shoulder_elbow', (L.LEFT_SHOULDER, L.LEFT_ELBOW), (L.RIGHT_SHOULDER, L.RIGHT_ELBOW)),
+    'elbow_wrist': SegmentPair('elbow_wrist', (L.LEFT_ELBOW, L.LEFT_WRIST), (L.RIGHT_ELBOW, L.RIGHT_WRIST)),
+}
+
+LEG_LIMBS = (
+    LimbSpec('Left_Knee', L.LEFT_KNEE, (L.LEFT_HIP, L.LEFT_KNEE, L.LEFT_ANKLE), 'hip_knee', 0.35, 0.12),
+    LimbSpec('Right_Knee', L.RIGHT_KNEE, (L.RIGHT_HIP, L.RIGHT_KNEE, L.RIGHT_ANKLE), 'hip_knee', 0.35, 0.12),
+    LimbSpec('Left_Ankle', L.LEFT_ANKLE, (L.LEFT_KNEE, L.LEFT_ANKLE, L.LEFT_FOOT_INDEX), 'knee_ankle', 0.25, 0.08),
+    LimbSpec('Right_Ankle', L.RIGHT_ANKLE, (L.RIGHT_KNEE, L.RIGHT_ANKLE, L.RIGHT_FOOT_INDEX), 'knee_ankle', 0.25, 0.08),
+)
+
+ARM_LIMBS = (
+    LimbSpec('Left_Elbow', L.LEFT_ELBOW, (L.LEFT_SHOULDER, L.LEFT_ELBOW, L.LEFT_WRIST), 'shoulder_elbow', 0.30, 0.10),
+    LimbSpec('Right_Elbow', L.RIGHT_ELBOW, (L.RIGHT_SHOULDER, L.RIGHT_ELBOW, L.RIGHT_WRIST), 'shoulder_elbow', 0.30, 0.10),
+    LimbSpec('Left_Wrist', L.LEFT_WRIST, (L.LEFT_ELBOW, L.LEFT_WRIST, L.LEFT_INDEX), 'elbow_wrist', 0.22, 0.07),
+    LimbSpec('Right_Wrist', L.RIGHT_WRIST, (L.RIGHT_ELBOW, L.RIGHT_WRIST, L.RIGHT_INDEX), 'elbow_wrist', 0.22, 0.07),
+)
+
+DEFAULT_LIMBS = LEG_LIMBS
+LIMBS_BY_NAME = {limb.name: limb for limb in LEG_LIMBS + ARM_LIMBS}
+
+del L
+
+
+@dataclass(frozen=True)
+class _CompiledTable:
+    limbs: tuple
+    pairs: tuple
+    starts: np.ndarray        # segment start landmarks: limb chains, then left/right pairs
+    ends: np.ndarray          # segment end landmarks, aligned with ``starts``
+    gather: np.ndarray        # anchor followed by chain landmarks for every limb
+    pair_index: tuple         # per limb, index into ``pairs``
+
+
+@lru_cache(maxsize=None)
+def _compile(limbs):
+    """Turn a limb table into flat index arrays once per distinct table"""
+    pair_names = tuple(dict.fromkeys(limb.asymmetry for limb in limbs))
+    pairs = tuple(SEGMENT_PAIRS[name] for name in pair_names)
+
+    starts, ends = [], []
+    for limb in limbs:
+        starts += limb.chain[:2]
+        ends += limb.chain[1:]
+    for pair in pairs:
+        starts += (pair.left[0], pair.right[0])
+        ends += (pair.left[1], pair.right[1])
+
+    return _CompiledTable(
+        limbs=limbs,
+        pairs=pairs,
+        starts=np.array(starts, dtype=np.intp),
+        ends=np.array(ends, dtype=np.intp),
+        gather=np.array([(limb.anchor,) + tuple(limb.chain) for limb in limbs], dtype=np.intp).ravel(),
+        pair_index=tuple(pair_names.index(limb.asymmetry) for limb in limbs),
+    )
+
+
+def landmarks_to_array(landmarks):
+    """Convert MediaPipe landmarks to a (33, 4) array of x, y, z, visibility"""
+    if isinstance(landmarks, np.ndarray):
+        return landmarks
+    if hasattr(landmarks, 'landmark'):
+        landmarks = landmarks.landmark
+    values = chain.from_iterable(map(_LANDMARK_FIELDS, landmarks))
+    return np.fromiter(values, dtype=np.float64, count=4 * len(landmarks)).reshape(-1, 4)
+
+
+def segment_lengths(array, starts, ends):
+    """Scaled length (cm) of every segment between ``starts`` and ``ends``"""
+    delta = array[starts, :2] - array[ends, :2]
+    return np.sqrt(np.einsum('...i,...i->...', delta, delta)) * REFERENCE_HEIGHT
+
+
+def _asymmetry(left, right):
+    longest = max(left, right)
+    return abs(left - right) / longest if longest > 0 else 0.0
+
+
+def _pair_results(table, lengths):
+    """Split the pair section of ``lengths`` into scores and the report dict"""
+    offset = 2 * len(table.limbs)
+    sides = lengths[offset:]
+    scores = [_asymmetry(sides[2 * i], sides[2 * i + 1]) for i in range(len(table.pairs))]
+
+    report = {}
+    for pair, score in zip(table.pairs, scores):
+        report[f"{pair.name}_asymmetry"] = score
+    for i, pair in enumerate(table.pairs):
+        report[f"left_{pair.name}"] = sides[2 * i]
+        report[f"right_{pair.name}"] = sides[2 * i + 1]
+    return scores, report
+
+
+def detect_asymmetry(array, limbs=DEFAULT_LIMBS):
+    """Left/right segment lengths and asymmetry scores for a limb table"""
+    table = _compile(tuple(limbs))
+    lengths = segment_lengths(landmarks_to_array(array), table.starts, table.ends).tolist()
+    return _pair_results(table, lengths)[1]
+
+
+def analyze_limbs(array, frame_width, frame_height, limbs=DEFAULT_LIMBS):
+    """Measure every limb of the table in one vectorized pass.
+
+    Returns one entry per limb in table order with the same shape the
+    ``/analyze/image`` endpoint reports under ``missing_limbs``.
+    """
+    table = _compile(tuple(limbs))
+    array = landmarks_to_array(array)
+
+    # One gather for every segment length, one for every limb landmark
+    lengths = segment_lengths(array, table.starts, table.ends).tolist()
+    gathered = array[table.gather].tolist()
+
+    scores, asymmetry_data = _pair_results(table, lengths)
+
+    needs = []
+    for i, limb in enumerate(table.limbs):
+        anchor, *joints = gathered[4 * i:4 * i + 4]
+        vis = anchor[3]
+        score = scores[table.pair_index[i]]
+        distances = lengths[2 * i:2 * i + 2]
+
+        detection_reasons = []
+        confidence_score = 0.0
+        if vis < VISIBILITY_THRESHOLD:
+            detection_reasons.append(f"Low visibility ({vis:.2f})")
+            confidence_score += 0.3
+        if score > ASYMMETRY_THRESHOLD:
+            pair = table.pairs[table.pair_index[i]]
+            detection_reasons.append(f"{pair.label} asymmetry detected ({score:.2f})")
+            confidence_score += 0.4
+
+        primary = distances[0]
+        needs.append({
+            "limb_type": limb.name,
+            "coordinates": {"x": int(anchor[0] * frame_width), "y": int(anchor[1] * frame_height)},
+            "confidence": min(confidence_score + 0.3, 1.0),
+            "detection_reasons": detection_reasons,
+            "recommended_size": {
+                "length": primary,
+                "circumference": primary * limb.circumference_ratio,
+                "width": primary * limb.width_ratio,
+            },
+            "points": [{"x": lm[0] * frame_width, "y": lm[1] * frame_height} for lm in joints],
+            "distances": distances,
+            "asymmetry_data": asymmetry_data,
+        })
+    return needs
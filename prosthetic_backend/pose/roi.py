@@ -0,0 +1,279 @@
+"""Person region of interest for pose inference.
+
+A cheap pre-pass finds the subject so the pose graph gets a padded crop
+around them instead of the whole photo: a small patient in a wide clinic
+shot then fills the landmark model's input, and a subject too small at
+the reduced decode resolution is re-decoded finer. Landmarks found in
+the crop are mapped back to full-frame coordinates.
+
+The detector is BlazePose's own person detector (the first stage of the
+pose graph, bundled with MediaPipe) run on a letterboxed 224 px frame.
+It predicts the hip centre and a point on the circle enclosing the body,
+which give a square body box. Streaming sessions skip it: the box around
+one frame's landmarks is used for the next.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Crops are enlarged by this factor around the body box (the pose graph
+# pads its own landmark ROI by the same amount)
+PADDING = 1.25
+# Crops smaller than this many pixels across are decoded again at a finer
+# scale; the landmark model's input is 256 px
+ROI_MIN_SIDE = int(os.environ.get('MEASUREMENT_ROI_MIN_SIDE', 256))
+MIN_SCORE = 0.5
+# Landmarks this visible bound the box a session reuses for its next frame
+MIN_VISIBILITY = 0.5
+
+DETECTOR_INPUT = 224
+# Tiles searched when the whole frame yields nobody, as a fraction of its longer side
+TILE_FRACTION = 0.5
+# Tiles are only searched when each is at least this many times the
+# detector input across; in smaller frames they add passes, not detail
+TILE_MIN_SCALE = float(os.environ.get('MEASUREMENT_ROI_TILE_MIN_SCALE', 2.0))
+# SSD anchor layout of the BlazePose detector: feature map strides and
+# anchors per cell (layers sharing a stride are merged)
+_ANCHOR_LAYERS = ((8, 2), (16, 2), (32, 6))
+_KEYPOINTS = 4
+
+
+def _model_path():
+    import mediapipe
+    return os.path.join(os.path.dirname(mediapipe.__file__), 'modules', 'pose_detection', 'pose_detection.tflite')
+
+
+@dataclass(frozen=True)
+class Roi:
+    """Crop box in coordinates normalized to the full frame"""
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+    @property
+    def width(self):
+        return self.x1 - self.x0
+
+    @property
+    def height(self):
+        return self.y1 - self.y0
+
+    def pixels(self, width, height):
+        """(left, top, right, bottom) in pixels of a ``width`` x ``height`` frame"""
+        return (int(round(self.x0 * width)), int(round(self.y0 * height)),
+                int(round(self.x1 * width)), int(round(self.y1 * height)))
+
+    def side(self, width, height):
+        """Longer side of the box, in pixels of a ``width`` x ``height`` frame"""
+        return max(self.width * width, self.height * height)
+
+    def as_dict(self):
+        return {'x': self.x0, 'y': self.y0, 'width': self.width, 'height': self.height}
+
+
+FULL_FRAME = Roi(0.0, 0.0, 1.0, 1.0)
+
+
+def square_roi(cx, cy, half_side, width, height):
+    """Square box of ``half_side`` pixels around (cx, cy), clipped to the frame"""
+    x0, x1 = max(cx - half_side, 0.0), min(cx + half_side, float(width))
+    y0, y1 = max(cy - half_side, 0.0), min(cy + half_side, float(height))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return Roi(x0 / width, y0 / height, x1 / width, y1 / height)
+
+
+def roi_from_landmarks(landmarks, width, height, min_visibility=MIN_VISIBILITY):
+    """Padded square around the visible landmarks of a (33, 4) array, or None"""
+    visible = landmarks[landmarks[:, 3] >= min_visibility]
+    if len(visible) < 2:
+        return None
+    xs, ys = visible[:, 0] * width, visible[:, 1] * height
+    half_side = max(xs.max() - xs.min(), ys.max() - ys.min()) / 2 * PADDING
+    return square_roi((xs.min() + xs.max()) / 2, (ys.min() + ys.max()) / 2, half_side, width, height)
+
+
+def crop(image, roi):
+    """The part of ``image`` inside ``roi`` (a view, not a copy)"""
+    height, width = image.shape[:2]
+    left, top, right, bottom = roi.pixels(width, height)
+    return image[top:bottom, left:right]
+
+
+def to_frame(landmarks, roi, image_shape):
+    """Map a (33, 4) landmark array from a crop back to the full frame.
+
+    ``image_shape`` is the shape of the frame the crop was cut from; the
+    crop's pixel bounds, not the unrounded box, give the mapping.
+    """
+    height, width = image_shape[:2]
+    left, top, right, bottom = roi.pixels(width, height)
+    scale_x, scale_y = (right - left) / width, (bottom - top) / height
+    mapped = np.array(landmarks, dtype=np.float64, copy=True)
+    mapped[:, 0] = left / width + mapped[:, 0] * scale_x
+    mapped[:, 1] = top / height + mapped[:, 1] * scale_y
+    # z shares the scale of x
+    mapped[:, 2] *= scale_x
+    return mapped
+
+
+def tiles(image, fraction=TILE_FRACTION):
+    """(left, top, view) of overlapping square tiles covering a frame.
+
+    Tiles are ``fraction`` of the longer side across, so there are few of
+    them: six for a 4:3 frame.
+    """
+    height, width = image.shape[:2]
+    side = min(int(max(width, height) * fraction), width, height)
+    for top in _tile_starts(height, side):
+        for left in _tile_starts(width, side):
+            yield left, top, image[top:top + side, left:left + side]
+
+
+def tiles_add_detail(image, fraction=TILE_FRACTION, min_scale=TILE_MIN_SCALE):
+    """Whether tiles of ``image`` are large relative to the detector input"""
+    height, width = image.shape[:2]
+    return min(max(width, height) * fraction, width, height) >= min_scale * DETECTOR_INPUT
+
+
+def _tile_starts(length, side):
+    count = max(1, math.ceil((length - side) / (side / 2)) + 1)
+    return [round(i * (length - side) / max(count - 1, 1)) for i in range(count)]
+
+
+@lru_cache(maxsize=1)
+def anchors():
+    """(N, 2) anchor centres of the detector, normalized to its input"""
+    centres = []
+    for stride, per_cell in _ANCHOR_LAYERS:
+        size = -(-DETECTOR_INPUT // stride)
+        ys, xs = np.meshgrid((np.arange(size) + 0.5) / size, (np.arange(size) + 0.5) / size, indexing='ij')
+        centres.append(np.repeat(np.stack([xs.ravel(), ys.ravel()], axis=1), per_cell, axis=0))
+    return np.concatenate(centres)
+
+
+def decode_detections(raw_boxes, raw_scores):
+    """Scores and keypoints of the detector's raw outputs.
+
+    Returns (scores (N,), keypoints (N, 4, 2)) with keypoints normalized to
+    the detector input. Anchors have a fixed unit size, so offsets only
+    need scaling by the input size.
+    """
+    raw_boxes = np.asarray(raw_boxes, dtype=np.float64).reshape(-1, 4 + 2 * _KEYPOINTS)
+    scores = 1 / (1 + np.exp(-np.clip(np.asarray(raw_scores, dtype=np.float64).ravel(), -100, 100)))
+    keypoints = raw_boxes[:, 4:].reshape(-1, _KEYPOINTS, 2) / DETECTOR_INPUT + anchors()[:, None, :]
+    return scores, keypoints
+
+
+class PersonDetector:
+    """Finds the most confident person in a frame"""
+
+    def __init__(self, model_path=None, min_score=MIN_SCORE, num_threads=1):
+        self.model_path = model_path or _model_path()
+        self.min_score = min_score
+        self.num_threads = num_threads
+        # One interpreter per inference thread; they are not thread-safe
+        self._local = threading.local()
+
+    @property
+    def interpreter(self):
+        interpreter = getattr(self._local, 'interpreter', None)
+        if interpreter is None:
+            import tensorflow as tf
+            interpreter = tf.lite.Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+            interpreter.allocate_tensors()
+            self._local.interpreter = interpreter
+        return interpreter
+
+    def detect(self, image):
+        """Padded body box of the most confident person in a BGR frame, or None.
+
+        The whole frame is searched first. A subject too small to be found
+        at the detector's resolution is searched for again in overlapping
+        square tiles, each seen at twice the scale, when the frame is large
+        enough for that to add detail.
+        """
+        located = self.locate(image)
+        if located is None:
+            return None
+        height, width = image.shape[:2]
+        centre, half_side = located
+        return square_roi(centre[0], centre[1], half_side, width, height)
+
+    def locate(self, image, search_tiles=True):
+        """(centre, half side) in pixels of the padded body square, unclipped, or None"""
+        best = self._detect(image)
+        if best is None and search_tiles and tiles_add_detail(image):
+            for left, top, tile in tiles(image):
+                found = self._detect(tile)
+                if found is not None and (best is None or found[0] > best[0]):
+                    best = (found[0], found[1] + [left, top], found[2])
+        if best is None:
+            return None
+        _, centre, radius = best
+        return centre, radius * PADDING
+
+    def _detect(self, image):
+        """(score, hip centre, body radius) in pixels for the best detection, or None"""
+        height, width = image.shape[:2]
+        scale = DETECTOR_INPUT / max(width, height)
+        resized = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        # Letterbox, centred, with black (-1 after normalization) borders
+        pad_x, pad_y = (DETECTOR_INPUT - resized.shape[1]) // 2, (DETECTOR_INPUT - resized.shape[0]) // 2
+        tensor = np.full((1, DETECTOR_INPUT, DETECTOR_INPUT, 3), -1.0, dtype=np.float32)
+        tensor[0, pad_y:pad_y + resized.shape[0], pad_x:pad_x + resized.shape[1]] = (
+            cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32) / 127.5 - 1)
+
+        interpreter = self.interpreter
+        interpreter.set_tensor(interpreter.get_input_details()[0]['index'], tensor)
+        interpreter.invoke()
+        outputs = sorted(interpreter.get_output_details(), key=lambda output: output['shape'][-1])
+        raw_scores, raw_boxes = (interpreter.get_tensor(output['index']) for output in outputs)
+        scores, keypoints = decode_detections(raw_boxes, raw_scores)
+        best = int(np.argmax(scores))
+        if scores[best] < self.min_score:
+            return None
+
+        # Keypoint 0 is the hip centre, keypoint 1 lies on the circle around the body
+        points = (keypoints[best, :2] * DETECTOR_INPUT - [pad_x, pad_y]) / scale
+        return float(scores[best]), points[0], float(np.linalg.norm(points[1] - points[0]))
+
+
+class RoiTracker:
+    """Last body box of each streaming session, so later frames skip detection"""
+
+    def __init__(self, max_sessions=1024, ttl=30.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._rois = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session):
+        with self._lock:
+            entry = self._rois.get(session)
+            if entry is None:
+                return None
+            roi, stamp = entry
+            if time.monotonic() - stamp > self.ttl:
+                del self._rois[session]
+                return None
+            return roi
+
+    def put(self, session, roi):
+        with self._lock:
+            if roi is None:
+                self._rois.pop(session, None)
+                return
+            self._rois[session] = (roi, time.monotonic())
+            self._rois.move_to_end(session)
+            while len(self._rois) > self.max_sessions:
+                self._rois.popitem(last=False)
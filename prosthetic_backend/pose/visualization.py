@@ -0,0 +1,144 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .geometry import PoseLandmark
+
+L = PoseLandmark
+
+# Same topology as mediapipe.solutions.pose.POSE_CONNECTIONS
+POSE_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 7), (0, 4), (4, 5), (5, 6), (6, 8), (9, 10),
+    (L.LEFT_SHOULDER, L.RIGHT_SHOULDER), (L.LEFT_SHOULDER, L.LEFT_ELBOW),
+    (L.LEFT_ELBOW, L.LEFT_WRIST), (L.LEFT_WRIST, L.LEFT_PINKY), (L.LEFT_WRIST, L.LEFT_INDEX),
+    (L.LEFT_WRIST, L.LEFT_THUMB), (L.LEFT_PINKY, L.LEFT_INDEX),
+    (L.RIGHT_SHOULDER, L.RIGHT_ELBOW), (L.RIGHT_ELBOW, L.RIGHT_WRIST),
+    (L.RIGHT_WRIST, L.RIGHT_PINKY), (L.RIGHT_WRIST, L.RIGHT_INDEX),
+    (L.RIGHT_WRIST, L.RIGHT_THUMB), (L.RIGHT_PINKY, L.RIGHT_INDEX),
+    (L.LEFT_SHOULDER, L.LEFT_HIP), (L.RIGHT_SHOULDER, L.RIGHT_HIP), (L.LEFT_HIP, L.RIGHT_HIP),
+    (L.LEFT_HIP, L.LEFT_KNEE), (L.LEFT_KNEE, L.LEFT_ANKLE), (L.LEFT_ANKLE, L.LEFT_HEEL),
+    (L.LEFT_HEEL, L.LEFT_FOOT_INDEX), (L.LEFT_ANKLE, L.LEFT_FOOT_INDEX),
+    (L.RIGHT_HIP, L.RIGHT_KNEE), (L.RIGHT_KNEE, L.RIGHT_ANKLE), (L.RIGHT_ANKLE, L.RIGHT_HEEL),
+    (L.RIGHT_HEEL, L.RIGHT_FOOT_INDEX), (L.RIGHT_ANKLE, L.RIGHT_FOOT_INDEX),
+)
+
+del L
+
+# Landmarks below this visibility are not drawn, as in mediapipe's drawing utils
+_VISIBILITY_THRESHOLD = 0.5
+
+IMAGE_FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY, 'image/jpeg'),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY, 'image/webp'),
+}
+
+
+def draw_annotations(image, landmarks, potential_needs, width, height):
+    """Draw the skeleton and measurements onto ``image`` in place.
+
+    ``landmarks`` is the (33, 4) normalized array; measurement points are
+    reported in ``width`` x ``height`` pixels and are rescaled when the
+    image was decoded at a different resolution.
+    """
+    image_height, image_width = image.shape[:2]
+    sx = image_width / width if width else 1.0
+    sy = image_height / height if height else 1.0
+
+    # Draw the pose landmarks
+    pixels = np.rint(landmarks[:, :2] * (image_width, image_height)).astype(int).tolist()
+    visible = (landmarks[:, 3] >= _VISIBILITY_THRESHOLD).tolist()
+    for start, end in POSE_CONNECTIONS:
+        if visible[start] and visible[end]:
+            cv2.line(image, tuple(pixels[start]), tuple(pixels[end]), (224, 224, 224), 2)
+    for point, is_visible in zip(pixels, visible):
+        if is_visible:
+            cv2.circle(image, tuple(point), 3, (0, 138, 255), -1)
+
+    # Draw measurements for each detected need
+    for need in potential_needs:
+        points = [(int(p['x'] * sx), int(p['y'] * sy)) for p in need['points']]
+        for point in points:
+            cv2.circle(image, point, radius=5, color=(0, 0, 255), thickness=-1)  # Red
+
+        for i in range(len(points) - 1):
+            pt1, pt2 = points[i], points[i + 1]
+            cv2.line(image, pt1, pt2, (0, 255, 0), 2)  # Green line
+            mid_x = (pt1[0] + pt2[0]) // 2
+            mid_y = (pt1[1] + pt2[1]) // 2
+            cv2.putText(image, f"{need['distances'][i]:.1f} cm", (mid_x, mid_y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+        # Indicate the potential prosthetic need with a label
+        coord_x = int(need['coordinates']['x'] * sx)
+        coord_y = int(need['coordinates']['y'] * sy)
+        cv2.putText(image, f"{need['limb_type']} ({need['confidence']:.2f})",
+                    (coord_x - 10, coord_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    return image
+
+
+def encode_image(image, image_format='jpeg', quality=90):
+    """Encode an image; returns (bytes, media type)"""
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    extension, quality_flag, media_type = IMAGE_FORMATS[image_format]
+    ok, buffer = cv2.imencode(extension, image, [quality_flag, int(quality)])
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format}")
+    return buffer.tobytes(), media_type
+
+
+class VisualizationStore:
+    """Renders visualizations on a background worker and keeps them by id.
+
+    Rendered frames are held for ``ttl`` seconds, at most ``max_entries``
+    at a time; encodings are cached per (format, quality).
+    """
+
+    def __init__(self, max_entries=16, ttl=300, workers=1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='visualization')
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, render, *args):
+        """Schedule ``render(*args)`` and return the result id"""
+        result_id = uuid.uuid4().hex
+        future = self._executor.submit(render, *args)
+        with self._lock:
+            self._entries[result_id] = {'future': future, 'created': time.monotonic(), 'encoded': {}}
+            self._evict()
+        return result_id
+
+    def get(self, result_id):
+        """Return the entry for ``result_id``; raises KeyError when unknown or expired"""
+        with self._lock:
+            self._evict()
+            return self._entries[result_id]
+
+    def encode(self, result_id, image_format='jpeg', quality=90, timeout=30):
+        """Wait for the rendered frame and encode it; blocks the caller"""
+        entry = self.get(result_id)
+        key = (image_format, quality)
+        if key not in entry['encoded']:
+            image = entry['future'].result(timeout=timeout)
+            entry['encoded'][key] = encode_image(image, image_format, quality)
+        return entry['encoded'][key]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            oldest_id, oldest = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_entries or now - oldest['created'] > self.ttl:
+                oldest['future'].cancel()
+                del self._entries[oldest_id]
+            else:
+                break
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
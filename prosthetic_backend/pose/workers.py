@@ -0,0 +1,177 @@
+"""Pose inference in worker processes.
+
+``ProcessBackend`` has the interface of the backends in ``pose.backends``
+but runs one of them in ``processes`` worker processes, so inference is
+not bound by the API process's GIL. Frames travel through a
+``FrameRing`` in shared memory: the caller copies the frame into a slot
+and sends the worker only (slot, shape, dtype) over a pipe, and the
+worker answers with the (33, 4) float32 landmark array, under a
+kilobyte. Frames too large for a slot are pickled through the pipe
+instead.
+
+Workers are started on first use, so a server that forks after
+importing the measurement app starts them in each forked process, and
+are spawned rather than forked because the API process runs threads. A
+worker that dies is replaced and its request fails.
+"""
+import atexit
+import logging
+import multiprocessing
+import queue
+import threading
+
+import numpy as np
+
+from pose import backends
+from pose.frame_ring import FrameRing
+
+logger = logging.getLogger(__name__)
+
+
+def _serve(connection, ring_name, slots, slot_bytes, backend_name, options):
+    """Worker process: run the backend on the frames it is sent"""
+    ring = FrameRing.attach(ring_name, slots, slot_bytes)
+    backend = backends.create_backend(backend_name, **options)
+    try:
+        while True:
+            try:
+                task = connection.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            index, shape, dtype, frame = task
+            try:
+                if frame is None:
+                    frame = ring.view(index, shape, dtype)
+                landmarks = backend.process(frame)
+                connection.send((None if landmarks is None else landmarks.astype(np.float32), None))
+            except Exception as e:
+                connection.send((None, f"{type(e).__name__}: {e}"))
+            finally:
+                # Views over the ring must go before it can be closed
+                frame = None
+    finally:
+        ring.close()
+
+
+class _Worker:
+    def __init__(self, context, ring, backend_name, options):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child, ring.name, ring.slots, ring.slot_bytes, backend_name, options),
+            name='pose-inference', daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self, timeout):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+        self.connection.close()
+
+
+class ProcessBackend:
+    """A pose backend run in worker processes, fed through shared memory"""
+
+    def __init__(self, backend='solution', processes=1, slots=None, slot_bytes=12 << 20,
+                 timeout=30.0, **options):
+        # Built here only to describe and preload the models; the workers build their own
+        self.inner = backends.create_backend(backend, **options)
+        self.name = self.inner.name
+        self.backend_name = backend
+        self.options = options
+        self.processes = processes
+        # Frames may be copied into the ring while every worker is busy
+        self.slots = slots or 2 * processes
+        self.slot_bytes = slot_bytes
+        self.timeout = timeout
+        self.ring = None
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def describe(self):
+        return self.inner.describe()
+
+    def preload(self):
+        self.inner.preload()
+
+    def start(self):
+        with self._lock:
+            if self.ring is not None:
+                return self
+            context = multiprocessing.get_context('spawn')
+            self._context = context
+            self.ring = FrameRing(self.slots, self.slot_bytes)
+            for _ in range(self.processes):
+                worker = _Worker(context, self.ring, self.backend_name, self.options)
+                self._workers.append(worker)
+                self._idle.put(worker)
+            atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            if self.ring is None:
+                return
+            for worker in self._workers:
+                worker.stop(timeout)
+            self._workers = []
+            self._idle = queue.Queue()
+            self.ring.close()
+            self.ring = None
+            atexit.unregister(self.stop)
+
+    @property
+    def slots_in_use(self):
+        return self.ring.in_use if self.ring is not None else 0
+
+    def process(self, frame):
+        """Landmarks for a BGR frame, as a (33, 4) array, or None.
+
+        Waits up to ``timeout`` seconds for a free slot (``RingFull``
+        otherwise) and then for an idle worker.
+        """
+        self.start()
+        frame = np.ascontiguousarray(frame)
+        index = None
+        if self.ring.fits(frame.shape, frame.dtype):
+            index = self.ring.put(frame, timeout=self.timeout)
+            task = (index, frame.shape, frame.dtype.str, None)
+        else:
+            task = (None, frame.shape, frame.dtype.str, frame)
+        try:
+            try:
+                worker = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No inference worker became free within {self.timeout}s")
+            try:
+                worker.connection.send(task)
+                if not worker.connection.poll(self.timeout):
+                    self._replace(worker)
+                    raise TimeoutError(f"Inference worker did not answer within {self.timeout}s")
+                landmarks, error = worker.connection.recv()
+            except (EOFError, OSError) as e:
+                self._replace(worker)
+                raise RuntimeError(f"Inference worker exited: {e}")
+            self._idle.put(worker)
+        finally:
+            if index is not None:
+                self.ring.release(index)
+        if error:
+            raise RuntimeError(error)
+        return None if landmarks is None else landmarks.astype(np.float64)
+
+    def _replace(self, worker):
+        logger.warning("Replacing inference worker %s (exit code %s)", worker.process.pid, worker.process.exitcode)
+        worker.stop(0)
+        with self._lock:
+            self._workers.remove(worker)
+            replacement = _Worker(self._context, self.ring, self.backend_name, self.options)
+            self._workers.append(replacement)
+        self._idle.put(replacement)
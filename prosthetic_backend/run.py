@@ -1,14 +1,25 @@
+import logging
 from datetime import datetime
 
 from app import create_app
 from app.models.database import Assembly, AssemblyPart, db
+from app.services.storage_service import StorageManager
 from flask import jsonify, request
 from flask_cors import CORS
 
+from config import Config
+
+logging.basicConfig(level=Config.LOG_LEVEL)
+
 app = create_app()
 CORS(app)  # Add this line to enable CORS
 
+# Periodically remove orphaned files and keep caches within their quotas;
+# under server.py a single worker runs it
+storage_manager = StorageManager(app)
+
 if __name__ == '__main__':
+    storage_manager.start()
     app.run(debug=True)
 
 @app.route('/api/assemblies/<int:assembly_id>', methods=['DELETE'])
@@ -0,0 +1,276 @@
+"""Production server for the backend and the measurement API on one port.
+
+    python server.py --workers 4 --backend-threads 8 --measurement-threads 1
+
+The master process imports both apps (and with them Flask, SQLAlchemy,
+TensorFlow, MediaPipe and OpenCV) and fetches the pose model before it
+forks, so workers share those pages copy-on-write instead of loading
+their own. Each worker runs uvicorn on the inherited listening socket
+with a gateway that sends ``/analyze`` requests to the FastAPI
+measurement app and everything else to the Flask backend, which runs on
+a pool of ``--backend-threads`` threads. Pose inference runs on
+``--measurement-threads`` threads per worker, each with its own graph,
+or with ``--measurement-processes`` in that many inference processes
+per worker, started after the fork.
+
+Workers are recycled after ``--max-requests`` requests (plus up to
+``--max-requests-jitter``): they stop accepting, finish in-flight
+requests and are replaced. SIGHUP replaces every worker one at a time;
+SIGTERM or SIGINT shuts down, giving workers ``--graceful-timeout``
+seconds to finish. Metrics are collected per worker process.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+import warnings
+
+import uvicorn
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Paths served by the measurement API; everything else goes to the backend
+MEASUREMENT_PREFIXES = ('/analyze',)
+
+# Workers that die sooner than this after starting are restarted with a delay
+_MIN_WORKER_LIFETIME = 1.0
+
+
+def wsgi_to_asgi(app, threads):
+    """Serve a WSGI app over ASGI on a pool of ``threads`` threads.
+
+    Returns (asgi app, limit) where ``limit`` is the thread count the
+    gateway applies to anyio's shared pool when no dedicated pool exists.
+    """
+    try:
+        from a2wsgi import WSGIMiddleware
+        return WSGIMiddleware(app, workers=threads), None
+    except ImportError:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            from starlette.middleware.wsgi import WSGIMiddleware
+        return WSGIMiddleware(app), threads
+
+
+class Gateway:
+    """ASGI app dispatching by path to the measurement API or the backend"""
+
+    def __init__(self, backend, measurement, thread_limit=None):
+        self.backend = backend
+        self.measurement = measurement
+        self.thread_limit = thread_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        path = scope.get('path', '')
+        if any(path == prefix or path.startswith(prefix + '/') for prefix in MEASUREMENT_PREFIXES):
+            return await self.measurement(scope, receive, send)
+        return await self.backend(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.thread_limit:
+                    import anyio.to_thread
+                    anyio.to_thread.current_default_thread_limiter().total_tokens = self.thread_limit
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def build_gateway(backend_threads):
+    """Import and warm up both apps, ready to be shared by forked workers"""
+    import measurement
+    import run
+
+    try:
+        measurement.pose_estimator.preload()
+    except Exception as e:
+        logger.warning("Could not preload the pose model, workers will fetch it: %s", e)
+    backend, thread_limit = wsgi_to_asgi(run.app, backend_threads)
+    return Gateway(backend, measurement.app, thread_limit)
+
+
+def bind_socket(address):
+    """A listening TCP socket for ``host:port``"""
+    host, _, port = address.rpartition(':')
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host.strip('[]') or '0.0.0.0', int(port)))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Arbiter:
+    """Pre-fork master keeping ``workers`` uvicorn processes serving ``app`` on ``sock``"""
+
+    def __init__(self, app, sock, workers, max_requests=None, max_requests_jitter=0,
+                 graceful_timeout=30, post_fork=None):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests or None
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.post_fork = post_fork
+        self.children = {}
+        self._signals = []
+        self._retiring = []
+        self._draining = None
+        self._stopping = False
+
+    def run(self):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, self._on_signal)
+        # Everything loaded so far is left alone by the collector, so its
+        # pages are not dirtied in the workers and stay shared
+        gc.collect()
+        gc.freeze()
+        for slot in range(self.workers):
+            self.spawn(slot)
+        logger.info("Serving on %s with %d workers", self.sock.getsockname(), self.workers)
+
+        while not self._stopping:
+            self._handle_signals()
+            self._reap()
+            self._retire_next()
+            time.sleep(0.1)
+        self._shutdown()
+
+    def spawn(self, slot):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = (slot, time.monotonic())
+            return pid
+
+        code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(sig, signal.SIG_DFL)
+            if self.post_fork:
+                self.post_fork(slot)
+            config = uvicorn.Config(
+                self.app, lifespan='on', log_config=None,
+                limit_max_requests=self.max_requests,
+                limit_max_requests_jitter=self.max_requests_jitter,
+                timeout_graceful_shutdown=self.graceful_timeout)
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException as e:
+            logger.exception("Worker %d failed: %s", os.getpid(), e)
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _on_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def _handle_signals(self):
+        while self._signals:
+            signum = self._signals.pop(0)
+            if signum == signal.SIGHUP:
+                logger.info("Replacing all workers")
+                self._retiring = list(self.children)
+            else:
+                self._stopping = True
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            slot, started = self.children.pop(pid, (None, None))
+            if slot is None:
+                continue
+            logger.info("Worker %d exited with status %d", pid, os.waitstatus_to_exitcode(status))
+            if pid == self._draining:
+                # Its replacement was started before it was told to stop
+                self._draining = None
+                continue
+            if self._stopping:
+                continue
+            if os.waitstatus_to_exitcode(status) != 0 and time.monotonic() - started < _MIN_WORKER_LIFETIME:
+                time.sleep(_MIN_WORKER_LIFETIME)
+            self.spawn(slot)
+
+    def _retire_next(self):
+        """Replace retiring workers one at a time, starting each replacement first"""
+        while self._retiring and self._draining is None and not self._stopping:
+            pid = self._retiring.pop(0)
+            if pid not in self.children:
+                continue
+            self._draining = pid
+            self.spawn(self.children[pid][0])
+            self._kill(pid, signal.SIGTERM)
+
+    def _shutdown(self):
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            logger.warning("Killing worker %d after the graceful timeout", pid)
+            self._kill(pid, signal.SIGKILL)
+        while self.children:
+            self._reap()
+            time.sleep(0.1)
+
+    def _kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def post_fork(slot):
+    """Per-worker setup after the fork"""
+    import run
+    from app.models.database import db
+
+    # Pooled connections opened by the master must not be shared between processes
+    with run.app.app_context():
+        db.engine.dispose(close=False)
+    # One worker runs the periodic storage collection
+    if slot == 0:
+        run.storage_manager.start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=Config.SERVER_BIND, help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS)
+    parser.add_argument('--backend-threads', type=int, default=Config.BACKEND_THREADS)
+    parser.add_argument('--measurement-threads', type=int, default=Config.MEASUREMENT_THREADS)
+    parser.add_argument('--measurement-processes', type=int, default=Config.MEASUREMENT_PROCESSES,
+                        help='inference processes per worker (0 runs inference on the threads)')
+    parser.add_argument('--max-requests', type=int, default=Config.SERVER_MAX_REQUESTS,
+                        help='recycle a worker after this many requests (0 never recycles)')
+    parser.add_argument('--max-requests-jitter', type=int, default=Config.SERVER_MAX_REQUESTS_JITTER)
+    parser.add_argument('--graceful-timeout', type=int, default=Config.SERVER_GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=Config.LOG_LEVEL)
+    # Read by measurement.py when build_gateway imports it
+    os.environ['MEASUREMENT_THREADS'] = str(args.measurement_threads)
+    os.environ['MEASUREMENT_PROCESSES'] = str(args.measurement_processes)
+    app = build_gateway(args.backend_threads)
+    Arbiter(app, bind_socket(args.bind), args.workers,
+            max_requests=args.max_requests, max_requests_jitter=args.max_requests_jitter,
+            graceful_timeout=args.graceful_timeout, post_fork=post_fork).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Stage timers, Prometheus histograms and Server-Timing headers.
+
+Framework agnostic, with no imports beyond the standard library, so the
+measurement service can use it without loading the Flask app: the Flask
+app wires it up through ``app.utils.metrics.init_metrics`` and the
+measurement service through its own middleware. Timings recorded with
+``stage()`` land in the ``stage_duration_seconds`` histogram and, while a
+request is active, in that request's Server-Timing header.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """A labelled histogram rendered in the Prometheus text format"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """{labels: (cumulative bucket counts, sum, count)}"""
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        result = {}
+        for key, counts, total, count in items:
+            cumulative, running = [], 0
+            for n in counts:
+                running += n
+                cumulative.append(running)
+            result[key] = (cumulative, total, count)
+        return result
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (cumulative, total, count) in sorted(self.snapshot().items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            for bound, value in zip(self.buckets + (float('inf'),), cumulative):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = ','.join(labels + ['le="%s"' % le])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {value}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ''
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return '\n'.join(lines)
+
+
+class Gauge:
+    """A gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        return '\n'.join([
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.callback()}",
+        ])
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback):
+        return self.register(Gauge(name, documentation, callback))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'stage_duration_seconds', 'Time spent in each processing stage.', ('service', 'stage'))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency.', ('service', 'method', 'route', 'status'))
+
+# Per-request list of (stage, seconds); a list is shared rather than
+# replaced so stages timed in worker threads or child tasks still report
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+_service = contextvars.ContextVar('metrics_service', default='backend')
+
+
+def begin_request(service):
+    """Start collecting stage timings for the current request"""
+    timings = []
+    _request_timings.set(timings)
+    _service.set(service)
+    return timings
+
+
+@contextmanager
+def stage(name, service=None):
+    """Time a block as a named stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, service)
+
+
+def record(name, seconds, service=None):
+    STAGE_SECONDS.observe(seconds, service=service or _service.get(), stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def server_timing(timings, total=None):
+    """Format timings as a Server-Timing header value (milliseconds)"""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,381 @@
+"""On-demand sampling profiles of single requests, rendered as flamegraphs.
+
+A request is profiled when it carries ``X-Profile-Token`` matching the
+configured token, or when it is picked at the configured sample rate.
+While it runs, one background thread samples the stacks of the threads
+working for it every ``interval`` seconds: a Flask request's own thread
+and any thread running work wrapped with ``follow`` on its behalf. The
+profile then lands in a ``ProfileStore`` as folded stacks (the format
+of flamegraph.pl and speedscope) and is listed, downloaded and rendered
+as an SVG flamegraph by the admin endpoints, which take the same token.
+
+Standard library only, like ``telemetry.metrics``: the Flask app wires
+it up through ``app.utils.profiling.init_profiling`` and the measurement
+service through ``ProfilingMiddleware``. With no token and a zero sample
+rate neither installs any hook, so requests pay nothing. Under ASGI the
+event loop thread runs every request at once, so only work handed to
+other threads through ``follow`` is sampled. Profiles are per process;
+work done in inference worker processes shows as the wait for them.
+"""
+import asyncio
+import colorsys
+import contextvars
+import functools
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+TOKEN_HEADER = 'X-Profile-Token'
+ID_HEADER = 'X-Profile-Id'
+
+FOLDED_CONTENT_TYPE = 'text/plain; charset=utf-8'
+SVG_CONTENT_TYPE = 'image/svg+xml'
+
+_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# The profile of the request being handled, if it is profiled
+_current = contextvars.ContextVar('profile', default=None)
+
+
+class Profile:
+    """Stack samples collected for one request"""
+
+    def __init__(self, service, method, path, trigger, interval):
+        self.id = uuid.uuid4().hex
+        self.service = service
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.interval = interval
+        self.started = time.time()
+        self.duration = None
+        self.status = None
+        self.stacks = Counter()
+        self._threads = Counter()
+        self._lock = threading.Lock()
+
+    def attach(self, ident=None):
+        with self._lock:
+            self._threads[ident or threading.get_ident()] += 1
+
+    def detach(self, ident=None):
+        with self._lock:
+            self._threads[ident or threading.get_ident()] -= 1
+            self._threads += Counter()
+
+    def sample(self, frames):
+        with self._lock:
+            idents = list(self._threads)
+        for ident in idents:
+            frame = frames.get(ident)
+            if frame is not None:
+                self.stacks[_stack(frame)] += 1
+
+    def folded(self):
+        """Samples as ``root;...;leaf count`` lines"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'service': self.service,
+            'method': self.method,
+            'path': self.path,
+            'trigger': self.trigger,
+            'status': self.status,
+            'started': self.started,
+            'duration': self.duration,
+            'interval': self.interval,
+            'samples': sum(self.stacks.values()),
+        }
+
+
+# Labels by code object, so each is formatted once
+_labels = {}
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        # Shortest path relative to an import root
+        for root in sorted((p for p in sys.path if p), key=len, reverse=True):
+            if filename.startswith(root + os.sep):
+                filename = filename[len(root) + 1:]
+                break
+        label = _labels[code] = f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+def _stack(frame):
+    """Labels of a frame and its callers, outermost first"""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+class _Sampler:
+    """One thread sampling every active profile, running only while there is one"""
+
+    def __init__(self):
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+
+    def remove(self, profile):
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+            frames = sys._current_frames()
+            for profile in profiles:
+                profile.sample(frames)
+            del frames
+            time.sleep(min(profile.interval for profile in profiles))
+
+
+_SAMPLER = _Sampler()
+
+
+class ProfileStore:
+    """Profiles on disk as ``<id>.json`` metadata and ``<id>.folded`` stacks, newest ``limit`` kept"""
+
+    def __init__(self, directory, limit=100):
+        self.directory = Path(directory)
+        self.limit = limit
+
+    def save(self, profile):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile.id}.folded").write_text(profile.folded())
+        # Metadata last: a profile is listed once it is complete
+        (self.directory / f"{profile.id}.json").write_text(json.dumps(profile.describe()))
+        self.prune()
+
+    def list(self):
+        """Metadata of the stored profiles, newest first"""
+        profiles = []
+        for path in self.directory.glob('*.json'):
+            try:
+                profiles.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda p: p['started'], reverse=True)
+
+    def get(self, profile_id):
+        """(metadata, folded stacks) of a profile, or None"""
+        if not _ID_PATTERN.fullmatch(profile_id):
+            return None
+        try:
+            metadata = json.loads((self.directory / f"{profile_id}.json").read_text())
+            return metadata, (self.directory / f"{profile_id}.folded").read_text()
+        except (OSError, ValueError):
+            return None
+
+    def prune(self):
+        for metadata in self.list()[self.limit:]:
+            for suffix in ('.json', '.folded'):
+                (self.directory / f"{metadata['id']}{suffix}").unlink(missing_ok=True)
+
+
+class RequestProfiler:
+    """Decides which requests are profiled and profiles them into ``store``"""
+
+    def __init__(self, store, token=None, sample_rate=0.0, interval=0.005):
+        self.store = store
+        self.token = token or None
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    @property
+    def enabled(self):
+        return self.token is not None or self.sample_rate > 0
+
+    def authorized(self, headers):
+        supplied = headers.get(TOKEN_HEADER)
+        return self.token is not None and supplied is not None and hmac.compare_digest(
+            supplied.encode(), self.token.encode())
+
+    def trigger(self, headers):
+        """Why a request with ``headers`` is profiled ('header' or 'sampled'), or None"""
+        if headers.get(TOKEN_HEADER) is not None and self.authorized(headers):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def start(self, service, method, path, trigger, attach=True):
+        """Begin profiling a request, sampling the calling thread if ``attach``"""
+        profile = Profile(service, method, path, trigger, self.interval)
+        if attach:
+            profile.attach()
+        _current.set(profile)
+        _SAMPLER.add(profile)
+        return profile
+
+    def stop(self, profile, status, duration):
+        """Stop sampling for a request; the profile is then ready to save"""
+        _SAMPLER.remove(profile)
+        _current.set(None)
+        profile.status = status
+        profile.duration = duration
+
+    def finish(self, profile, status, duration):
+        self.stop(profile, status, duration)
+        self.store.save(profile)
+
+
+def follow(func):
+    """``func`` sampled with the current request's profile in whatever thread runs it.
+
+    Returns ``func`` itself when the request is not profiled.
+    """
+    profile = _current.get()
+    if profile is None:
+        return func
+
+    @functools.wraps(func)
+    def followed(*args, **kwargs):
+        profile.attach()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.detach()
+
+    return followed
+
+
+def render_flamegraph(folded, title='Flamegraph', width=1200, row_height=16):
+    """An SVG flamegraph of folded stacks, callers below callees"""
+    root = {'children': {}, 'count': 0}
+    for line in folded.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if not stack or not count.isdigit():
+            continue
+        count = int(count)
+        root['count'] += count
+        node = root
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(frame, {'children': {}, 'count': 0})
+            node['count'] += count
+
+    def depth(node):
+        return 1 + max((depth(child) for child in node['children'].values()), default=0)
+
+    total = root['count'] or 1
+    top = 2 * row_height
+    height = top + depth(root) * row_height + 4
+    rects = []
+
+    def draw(name, node, x, level):
+        w = node['count'] / total * width
+        if w < 0.1:
+            return
+        y = height - (level + 1) * row_height - 2
+        hue = 0.02 + (zlib.crc32(name.encode()) % 1000) / 1000 * 0.12
+        r, gr, b = (int(c * 255) for c in colorsys.hls_to_rgb(hue, 0.6, 0.85))
+        tooltip = f"{name} ({node['count']} samples, {node['count'] / total:.1%})"
+        text = ''
+        # Roughly 7 px per character of 12 px text
+        if w > 25:
+            chars = int((w - 6) / 7)
+            shown = name if len(name) <= chars else name[:max(chars - 2, 0)] + '..'
+            text = f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{escape(shown)}</text>'
+        rects.append(
+            f'<g><title>{escape(tooltip)}</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" '
+            f'fill="rgb({r},{gr},{b})" rx="2"/>{text}</g>')
+        for child_name, child in sorted(node['children'].items()):
+            draw(child_name, child, x, level + 1)
+            x += child['count'] / total * width
+
+    draw('all', root, 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="12">'
+        f'<text x="{width / 2}" y="{row_height}" text-anchor="middle" font-size="14">{escape(title)}</text>'
+        + ''.join(rects) + '</svg>')
+
+
+def flamegraph_title(metadata):
+    return (f"{metadata['method']} {metadata['path']} - {metadata['status']} in "
+            f"{(metadata['duration'] or 0) * 1000:.0f} ms, {metadata['samples']} samples")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling selected requests, for the measurement service.
+
+    The loop thread is shared with every other request, so it is not
+    sampled; the profile holds the work the request runs through ``follow``.
+    """
+
+    def __init__(self, app, profiler, service='measurement'):
+        self.app = app
+        self.profiler = profiler
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        headers = _AsgiHeaders(scope)
+        trigger = self.profiler.trigger(headers)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        profile = self.profiler.start(self.service, scope['method'], scope['path'], trigger, attach=False)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message = dict(message, headers=list(message.get('headers', [])) + [
+                    (ID_HEADER.lower().encode(), profile.id.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.profiler.stop(profile, status, time.perf_counter() - start)
+            # Saving prunes the store, which reads every profile's metadata
+            await asyncio.get_running_loop().run_in_executor(None, self.profiler.store.save, profile)
+
+
+class _AsgiHeaders:
+    """Case-insensitive ``get`` over an ASGI scope's headers"""
+
+    def __init__(self, scope):
+        self._headers = scope.get('headers', [])
+
+    def get(self, name, default=None):
+        name = name.lower().encode()
+        for key, value in self._headers:
+            if key == name:
+                return value.decode('latin-1')
+        return default
@@ -1,3 +1,6 @@
+import io
+
+import numpy as np
 import pytest
 from app import create_app
 from app.models.database import db
@@ -15,3 +18,95 @@ def client():
         yield client
         with app.app_context():
             db.drop_all()
+
+
+@pytest.fixture(autouse=True)
+def secret_key(monkeypatch):
+    """A key other than the 'dev' default, which download links are refused with"""
+    monkeypatch.setattr('config.Config.SECRET_KEY', 'test-secret')
+
+
+@pytest.fixture(autouse=True)
+def storage_dirs(tmp_path, monkeypatch):
+    """Point the storage folders, profiles and database into tmp_path, which is returned.
+
+    Applies to every test, so uploads and the files derived from them
+    never land in the checkout.
+    """
+    monkeypatch.setattr('config.Config.UPLOAD_FOLDER', tmp_path / 'uploads')
+    monkeypatch.setattr('config.Config.MERGED_FOLDER', tmp_path / 'merged')
+    monkeypatch.setattr('config.Config.MESH_CACHE_FOLDER', tmp_path / 'mesh_cache')
+    monkeypatch.setattr('config.Config.TEMP_FOLDER', tmp_path / 'temp')
+    monkeypatch.setattr('config.Config.PROFILE_FOLDER', tmp_path / 'profiles')
+    monkeypatch.setattr('config.Config.SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    return tmp_path
+
+
+@pytest.fixture
+def upload_part(client, storage_dirs):
+    """Upload a trimesh mesh (as STL) or raw file bytes as a part; returns the created part"""
+    def upload(mesh, name='Part', filename=None):
+        content = mesh if isinstance(mesh, bytes) else mesh.export(file_type='stl')
+        response = client.post('/api/parts', data={'file': (io.BytesIO(content), filename or f'{name}.stl'),
+                                                   'name': name}, content_type='multipart/form-data')
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return upload
+
+
+class StubPoseBackend:
+    """Stands in for a pose backend: every frame shows the same standing pose"""
+
+    name = 'stub'
+
+    def __init__(self):
+        from pose import geometry
+
+        self.calls = 0
+        self.landmarks = np.zeros((geometry.NUM_LANDMARKS, 4))
+        self.landmarks[:, 3] = 1.0
+        for side, x in (("LEFT", 0.45), ("RIGHT", 0.55)):
+            for joint, y in (("SHOULDER", 0.25), ("HIP", 0.5), ("KNEE", 0.7), ("ANKLE", 0.9)):
+                self.landmarks[geometry.PoseLandmark[f"{side}_{joint}"], :2] = (x, y)
+
+    def describe(self):
+        return {'backend': 'stub', 'variant': 'test'}
+
+    def process(self, frame):
+        self.calls += 1
+        return self.landmarks.copy()
+
+
+@pytest.fixture
+def measurement_app(monkeypatch):
+    """The measurement module with a stub pose backend and fresh caches"""
+    import measurement
+    from pose.cache import ResultCache
+    from pose.visualization import VisualizationStore
+
+    monkeypatch.setattr(measurement.pose_estimator, 'backend', StubPoseBackend())
+    monkeypatch.setattr(measurement, 'ROI_ENABLED', False)
+    monkeypatch.setattr(measurement, 'result_cache', ResultCache(max_entries=16))
+    monkeypatch.setattr(measurement, 'visualization_store', VisualizationStore())
+    return measurement
+
+
+@pytest.fixture
+def measurement_client(measurement_app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(measurement_app.app) as client:
+        yield client
+
+
+@pytest.fixture
+def jpeg_upload():
+    """A small JPEG upload, distinct per test so cached results do not leak between tests"""
+    import uuid
+
+    import cv2
+
+    image = np.full((240, 160, 3), 128, dtype=np.uint8)
+    _, encoded = cv2.imencode('.jpg', image)
+    # Bytes after the end-of-image marker change the upload, not the pixels
+    return encoded.tobytes() + uuid.uuid4().bytes
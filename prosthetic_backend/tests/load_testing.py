@@ -1,12 +1,113 @@
-from locust import HttpUser, task, between
+"""Mixed-workload Locust scenarios for the backend and the measurement API.
 
-class UploadLoadTest(HttpUser):
-    wait_time = between(1, 2)  # Simulates user delay
+Users are weighted to resemble clinic traffic: mostly browsing, some
+uploads of real (generated) STL meshes, occasional bulk assembly builds
+and merges, plus measurement requests with the benchmark fixture images.
+Hosts come from BACKEND_HOST and MEASUREMENT_HOST rather than ``--host``,
+which Locust would apply to both user classes.
 
-    @task
-    def upload_file(self):
-        """Simulates multiple users uploading files at once."""
-        files = {"file": ("test.stl", b"x" * 1024 * 100)}  # 100KB file
-        data = {"name": "Load Test Part", "type": "stl"}
-        self.client.post("/parts", files=files, data=data)
+Run headless through ``python -m benchmarks.load_test`` to start the stack
+and collect percentile reports, or directly:
 
+    BACKEND_HOST=http://127.0.0.1:5000 locust -f tests/load_testing.py --headless -u 20 -r 5 -t 1m
+"""
+import os
+import random
+import sys
+from pathlib import Path
+
+from locust import HttpUser, between, task
+
+# Add the project root directory to Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_backend import stl_mesh
+from benchmarks.bench_measurement import FIXTURES_DIR, IMAGE_FIXTURES
+
+BACKEND_HOST = os.environ.get('BACKEND_HOST', 'http://127.0.0.1:5000')
+MEASUREMENT_HOST = os.environ.get('MEASUREMENT_HOST', 'http://127.0.0.1:8000')
+
+# A spread of part sizes (320 to 20480 faces); small parts are most common
+MESHES = [stl_mesh(subdivisions) for subdivisions in (2, 3, 4, 5)]
+MESH_WEIGHTS = (8, 6, 3, 1)
+
+IMAGES = [(name, (FIXTURES_DIR / name).read_bytes()) for name in IMAGE_FIXTURES]
+
+
+class BackendUser(HttpUser):
+    """A technician browsing the catalogue and building assemblies"""
+    host = BACKEND_HOST
+    weight = 4
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        self.part_ids = []
+        self.assembly_ids = []
+        self.browse_parts()
+
+    @task(10)
+    def browse_parts(self):
+        with self.client.get('/api/parts', catch_response=True) as response:
+            if response.ok:
+                self.part_ids = [part['id'] for part in response.json()]
+
+    @task(6)
+    def browse_assemblies(self):
+        response = self.client.get('/api/assemblies')
+        if not response.ok:
+            return
+        assemblies = response.json()
+        if assemblies:
+            assembly = random.choice(assemblies)
+            self.client.get(f"/api/assemblies/{assembly['id']}", name='/api/assemblies/[id]')
+
+    @task(3)
+    def upload_part(self):
+        data = random.choices(MESHES, weights=MESH_WEIGHTS)[0]
+        response = self.client.post('/api/parts', files={'file': ('load_test.stl', data)},
+                                    data={'name': 'Load Test Part', 'type': 'stl'})
+        if response.status_code == 201:
+            self.part_ids.append(response.json()['id'])
+
+    @task(2)
+    def build_assembly(self):
+        if not self.part_ids:
+            return
+        response = self.client.post('/api/assemblies', json={'name': 'Load Test Assembly'})
+        if response.status_code != 201:
+            return
+        assembly_id = response.json()['id']
+        self.assembly_ids.append(assembly_id)
+        for i in range(random.randint(5, 20)):
+            self.client.post(f'/api/assemblies/{assembly_id}/parts', name='/api/assemblies/[id]/parts', json={
+                'part_id': random.choice(self.part_ids),
+                'position': {'x': 30.0 * i, 'y': 0, 'z': 0},
+                'rotation': {'x': 0, 'y': 0, 'z': 0},
+                'scale': {'x': 1, 'y': 1, 'z': 1},
+            })
+
+    @task(1)
+    def merge_assembly(self):
+        if self.assembly_ids:
+            assembly_id = random.choice(self.assembly_ids)
+            self.client.post(f'/api/assemblies/{assembly_id}/merge', name='/api/assemblies/[id]/merge')
+
+
+class MeasurementUser(HttpUser):
+    """A clinician submitting photos to the measurement API"""
+    host = MEASUREMENT_HOST
+    weight = 1
+    wait_time = between(2, 5)
+
+    @task(4)
+    def analyze(self):
+        name, data = random.choice(IMAGES)
+        self.client.post('/analyze/image', files={'file': (name, data, 'image/jpeg')})
+
+    @task(1)
+    def analyze_with_visualization(self):
+        name, data = random.choice(IMAGES)
+        response = self.client.post('/analyze/image?visualize=true', name='/analyze/image?visualize=true',
+                                    files={'file': (name, data, 'image/jpeg')})
+        if response.ok and response.json().get('visualization_url'):
+            self.client.get(response.json()['visualization_url'], name='/analyze/visualization/[id]')
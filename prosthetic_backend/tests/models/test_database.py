@@ -42,3 +42,44 @@ def test_create_assembly_part(client):
         assert retrieved_assembly_part is not None
         assert retrieved_assembly_part.assembly_id == assembly.id
         assert retrieved_assembly_part.part_id == part.id
+
+def test_changes_are_numbered(client):
+    """Test each commit stamps the rows it writes with a new revision and records deletes."""
+    from app.models.database import Tombstone, current_revision
+
+    with client.application.app_context():
+        part = Part(name="Test Part", type="mechanical", file_path="/path/to/test.obj")
+        assembly = Assembly(name="Test Assembly")
+        db.session.add_all([part, assembly])
+        db.session.commit()
+        assert part.revision == assembly.revision == current_revision(db.session) == 1
+
+        part.name = "Renamed"
+        db.session.commit()
+        assert (part.revision, assembly.revision) == (2, 1)
+
+        # Unchanged rows keep their revision
+        part.name = "Renamed"
+        db.session.commit()
+        assert part.revision == current_revision(db.session) == 2
+
+        db.session.delete(assembly)
+        db.session.commit()
+        tombstone = Tombstone.query.one()
+        assert (tombstone.entity, tombstone.entity_id, tombstone.revision) == ("assemblies", assembly.id, 3)
+
+def test_upgrade_schema_adds_new_columns(client):
+    """Test tables created before a column existed gain it."""
+    from sqlalchemy import inspect, text
+    from app.models.database import upgrade_schema
+
+    with client.application.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP TABLE assembly_part"))
+            connection.execute(text("CREATE TABLE assembly_part (id INTEGER PRIMARY KEY, assembly_id INTEGER NOT NULL, "
+                                    "part_id INTEGER NOT NULL, position JSON, rotation JSON, scale JSON)"))
+        upgrade_schema()
+
+        inspector = inspect(db.engine)
+        assert "revision" in {column["name"] for column in inspector.get_columns("assembly_part")}
+        assert any(index["column_names"] == ["revision"] for index in inspector.get_indexes("assembly_part"))
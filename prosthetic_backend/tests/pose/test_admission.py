@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from pose.admission import AdmissionController, AdmissionError, AdmissionGate, request_deadline
+
+
+def make_controller(concurrency=1, depth=2, max_wait=5.0, waits=None):
+    on_wait = None if waits is None else (lambda seconds, lane, outcome: waits.append((lane, outcome)))
+    return AdmissionController(
+        concurrency, {'interactive': depth, 'batch': depth}, {'interactive': max_wait, 'batch': max_wait}, on_wait)
+
+
+def test_interactive_requests_jump_ahead_of_batch():
+    async def scenario():
+        controller = make_controller()
+        order = []
+
+        async def analysis(name, lane):
+            async with controller.slot(lane):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await controller.acquire('interactive')
+        waiting = [asyncio.create_task(analysis('batch', 'batch'))]
+        await asyncio.sleep(0)
+        waiting.append(asyncio.create_task(analysis('interactive', 'interactive')))
+        await asyncio.sleep(0)
+        assert controller.queued() == 2
+        controller.release(0.1)
+        await asyncio.gather(*waiting)
+        assert controller.running == 0
+        return order
+
+    assert asyncio.run(scenario()) == ['interactive', 'batch']
+
+
+def test_full_lane_is_refused_with_retry_estimate():
+    async def scenario():
+        waits = []
+        controller = make_controller(depth=1, waits=waits)
+        controller.service_time = 2.0
+        await controller.acquire('interactive')
+        queued = asyncio.create_task(controller.acquire('interactive'))
+        await asyncio.sleep(0)
+        assert controller.saturated('interactive') and not controller.saturated('batch')
+        with pytest.raises(AdmissionError) as refused:
+            await controller.acquire('interactive')
+        controller.release()
+        await queued
+        controller.release()
+        assert controller.running == 0
+        return refused.value, waits
+
+    error, waits = asyncio.run(scenario())
+    assert error.reason == 'saturated'
+    # One running and one queued, at two seconds each, on one slot
+    assert error.retry_after == 4
+    assert waits == [('interactive', 'admitted'), ('interactive', 'saturated'), ('interactive', 'admitted')]
+
+
+def test_waiters_are_dropped_at_deadline_or_disconnect():
+    async def disconnected():
+        return True
+
+    async def scenario():
+        controller = make_controller()
+        await controller.acquire('interactive')
+        with pytest.raises(AdmissionError) as deadline:
+            await controller.acquire('batch', deadline=time.monotonic() + 0.05)
+        with pytest.raises(AdmissionError) as gone:
+            await controller.acquire('batch', disconnected=disconnected)
+        assert controller.queued() == 0
+        controller.release()
+        assert controller.running == 0
+        return deadline.value.reason, gone.value.reason
+
+    assert asyncio.run(scenario()) == ('deadline', 'disconnected')
+
+
+def test_request_deadline_header():
+    assert request_deadline({'x-request-timeout': '2.5'}, 10.0) == 12.5
+    assert request_deadline({'x-request-timeout': 'soon'}, 10.0) is None
+    assert request_deadline({}, 10.0) is None
+
+
+def test_gate_refuses_saturated_lane_before_the_endpoint():
+    controller = make_controller(depth=0)
+    calls = []
+
+    async def analyze(request):
+        calls.append(request.query_params.get('priority'))
+        return JSONResponse({'success': True})
+
+    app = AdmissionGate(Starlette(routes=[Route('/analyze/image', analyze, methods=['POST'])]),
+                        controller=controller, paths=('/analyze/image',))
+    client = TestClient(app)
+    assert client.post('/analyze/image').status_code == 200
+
+    controller.running = 1
+    refused = client.post('/analyze/image?priority=batch', content=b'x' * 1024)
+    assert refused.status_code == 503
+    assert refused.headers['retry-after'] == '1'
+    assert refused.json()['reason'] == 'saturated'
+    assert calls == [None]
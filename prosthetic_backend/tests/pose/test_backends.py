@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pose import backends
+from pose.decode import decode_image
+
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / "benchmarks" / "fixtures"
+
+
+def _frame(name):
+    return decode_image(np.frombuffer((FIXTURES_DIR / name).read_bytes(), np.uint8)).image
+
+
+class _FixedOutputs(backends.CropBackend):
+    name = 'fixed'
+
+    def __init__(self, raw, presence):
+        super().__init__(model_complexity=1)
+        self.raw, self.presence = raw, presence
+        self.tensors = []
+
+    def run(self, tensor):
+        self.tensors.append(tensor)
+        return [np.zeros((1, 256, 256, 1)), self.raw.reshape(1, -1), np.array([[self.presence]])]
+
+
+def test_create_backend_rejects_unknown_names():
+    assert isinstance(backends.create_backend('tflite', model_complexity=1), backends.TFLiteBackend)
+    with pytest.raises(ValueError, match="Unknown pose backend"):
+        backends.create_backend('tensorrt')
+
+
+def test_crop_backend_maps_model_output_to_frame(monkeypatch):
+    """Test landmarks in crop pixels are mapped through the detector's square."""
+    raw = np.zeros((39, 5))
+    raw[0] = [0, 0, 25.6, 0, 0]
+    raw[1] = [128, 128, 0, 10, 0]
+    raw[2] = [256, 256, 0, -10, 0]
+    backend = _FixedOutputs(raw, presence=0.9)
+    # Body square of half side 100 px around (150, 100) in a 400 x 200 frame
+    monkeypatch.setattr(backend.detector, 'locate', lambda frame, search_tiles=True: (np.array([150.0, 100.0]), 100.0))
+
+    landmarks = backend.process(np.zeros((200, 400, 3), dtype=np.uint8))
+    assert landmarks.shape == (33, 4)
+    np.testing.assert_allclose(landmarks[:3, :2], [[50 / 400, 0.0], [150 / 400, 0.5], [250 / 400, 1.0]])
+    np.testing.assert_allclose(landmarks[0, 2], 20 / 400)
+    assert landmarks[1, 3] > 0.99 and landmarks[2, 3] < 0.01
+    assert backend.tensors[0].shape == (1, 256, 256, 3)
+
+    backend.presence = 0.1
+    assert backend.process(np.zeros((200, 400, 3), dtype=np.uint8)) is None
+
+
+def test_tflite_backend_agrees_with_solution():
+    """Test the crop backend finds the same pose as the legacy graph on a fixture."""
+    frame = _frame("standing_portrait.jpg")
+    reference = backends.create_backend('solution', model_complexity=1).process(frame)
+    landmarks = backends.create_backend('tflite', model_complexity=1).process(frame)
+    assert reference is not None and landmarks is not None
+    assert np.hypot(*(landmarks[:, :2] - reference[:, :2]).T).mean() < 0.03
+
+    assert backends.create_backend('tflite', model_complexity=1).process(_frame("empty_room.jpg")) is None
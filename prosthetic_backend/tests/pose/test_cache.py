@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from pose.cache import ResultCache
+
+
+def test_key_depends_on_bytes_and_params():
+    """Test that the key covers the image bytes and the analysis parameters."""
+    image = np.frombuffer(b"image bytes", np.uint8)
+    key = ResultCache.key(image, {"a": 1, "b": 2})
+    assert key == ResultCache.key(b"image bytes", {"b": 2, "a": 1})
+    assert key != ResultCache.key(b"image bytes!", {"a": 1, "b": 2})
+    assert key != ResultCache.key(image, {"a": 1, "b": 3})
+
+
+def test_memory_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", {"success": True})
+    cache.put("b", {"success": True})
+    assert cache.get("a") is not None  # "a" becomes most recently used
+    cache.put("c", {"success": True})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Test that entries written to disk are served by a fresh cache."""
+    landmarks = np.arange(33 * 4, dtype=np.float64).reshape(33, 4)
+    ResultCache(directory=tmp_path).put("abcdef", {"success": True, "missing_limbs": []}, landmarks)
+
+    restarted = ResultCache(directory=tmp_path)
+    entry = restarted.get("abcdef")
+    assert entry["response"] == {"success": True, "missing_limbs": []}
+    np.testing.assert_array_equal(entry["landmarks"], landmarks)
+    assert len(restarted) == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    """Test that the disk tier stays under its bound, keeping recently read entries."""
+    response = {"success": True, "message": "x" * 1000}
+    cache = ResultCache(max_entries=1, directory=tmp_path, max_disk_bytes=3500)
+    for index, key in enumerate(["aa1", "bb2", "cc3"]):
+        cache.put(key, response)
+        os.utime(cache._path(key), (index, index))
+    assert cache.get("aa1") is not None  # Read back from disk, so now most recently used
+
+    cache.put("dd4", response)
+    assert cache.disk_bytes <= 3500 * 0.9
+    assert sorted(path.stem for path in tmp_path.glob("*/*.json")) == ["aa1", "dd4"]
+    assert ResultCache(directory=tmp_path).disk_bytes == cache.disk_bytes
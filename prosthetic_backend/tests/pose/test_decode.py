@@ -0,0 +1,66 @@
+import struct
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+
+from pose import decode
+
+
+def _jpeg(width, height, orientation=None):
+    ok, buffer = cv2.imencode('.jpg', np.zeros((height, width, 3), dtype=np.uint8))
+    data = buffer.tobytes()
+    if orientation is None:
+        return data
+    tiff = (b'II*\x00\x08\x00\x00\x00' + struct.pack('<H', 1)
+            + struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0) + b'\x00\x00\x00\x00')
+    app1 = b'Exif\x00\x00' + tiff
+    return data[:2] + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + data[2:]
+
+
+def test_probe_jpeg_with_orientation():
+    """Test reading size and EXIF orientation from a JPEG header."""
+    header = decode.probe_image(np.frombuffer(_jpeg(64, 32, orientation=6), np.uint8))
+    assert (header.width, header.height, header.orientation) == (64, 32, 6)
+    assert header.oriented_size == (32, 64)
+
+
+def test_probe_png():
+    ok, buffer = cv2.imencode('.png', np.zeros((10, 20, 3), dtype=np.uint8))
+    header = decode.probe_image(buffer)
+    assert (header.width, header.height, header.orientation) == (20, 10, 1)
+
+
+def test_probe_unknown_format():
+    assert decode.probe_image(np.frombuffer(b'not an image', np.uint8)) is None
+
+
+@pytest.mark.parametrize("size, factor", [((4032, 3024), 4), ((1920, 1080), 1), ((3000, 1500), 2)])
+def test_reduction_factor(size, factor):
+    assert decode.reduction_factor(*size, min_side=720) == factor
+
+
+def test_decode_image_reduced_and_upright():
+    """Test that a rotated JPEG decodes upright at reduced resolution."""
+    decoded = decode.decode_image(np.frombuffer(_jpeg(1600, 800, orientation=6), np.uint8), min_side=200)
+    assert decoded.scale == 4
+    assert (decoded.width, decoded.height) == (800, 1600)
+    assert decoded.image.shape[:2] == (400, 200)
+
+
+def test_decode_image_invalid_data():
+    assert decode.decode_image(np.frombuffer(b'garbage data', np.uint8)) is None
+
+
+@pytest.mark.parametrize("max_size", [1024 * 1024, 16])
+def test_read_upload_buffer_from_spooled_file(max_size):
+    """Test in-memory and rolled-over spooled uploads."""
+    data = _jpeg(32, 32)
+    with tempfile.SpooledTemporaryFile(max_size=max_size) as fileobj:
+        fileobj.write(data)
+        fileobj.seek(0)
+        buffer = decode.read_upload_buffer(fileobj)
+        assert buffer.tobytes() == data
+    # Closing the upload does not wait for the array to be released
+    assert buffer.tobytes() == data
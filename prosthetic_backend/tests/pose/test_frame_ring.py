@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pose import backends
+from pose.decode import decode_image
+from pose.frame_ring import FrameRing, RingFull
+from pose.workers import ProcessBackend
+
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / "benchmarks" / "fixtures"
+
+
+def test_frames_are_shared_with_attached_rings():
+    ring = FrameRing(2, 64)
+    attached = FrameRing.attach(ring.name, 2, 64)
+    try:
+        frame = np.arange(48, dtype=np.uint8).reshape(4, 4, 3)
+        index = ring.put(frame)
+        view = attached.view(index, frame.shape, frame.dtype.str)
+        np.testing.assert_array_equal(view, frame)
+        assert ring.in_use == 1
+        ring.release(index)
+        assert ring.in_use == 0
+        del view
+    finally:
+        attached.close()
+        ring.close()
+
+
+def test_full_ring_applies_backpressure():
+    ring = FrameRing(2, 16)
+    try:
+        slots = {ring.acquire(), ring.acquire()}
+        assert slots == {0, 1}
+        with pytest.raises(RingFull):
+            ring.acquire(timeout=0.01)
+        ring.release(1)
+        assert ring.acquire(timeout=0.01) == 1
+
+        assert not ring.fits((4, 4, 3))
+        with pytest.raises(ValueError):
+            ring.put(np.zeros((4, 4, 3), dtype=np.uint8))
+    finally:
+        ring.close()
+
+
+@pytest.mark.parametrize("slot_bytes", [12 << 20, 1024])
+def test_process_backend_matches_in_process_inference(slot_bytes):
+    """Test frames sent through a slot, or pickled when too large, give the same landmarks."""
+    frame = decode_image(np.frombuffer((FIXTURES_DIR / "standing_portrait.jpg").read_bytes(), np.uint8)).image
+    expected = backends.create_backend('tflite', model_complexity=1).process(frame)
+    backend = ProcessBackend('tflite', processes=1, slot_bytes=slot_bytes, model_complexity=1)
+    try:
+        landmarks = backend.process(frame)
+        assert backend.slots_in_use == 0
+    finally:
+        backend.stop()
+    assert landmarks.shape == (33, 4)
+    np.testing.assert_allclose(landmarks, expected, atol=1e-6)
+    assert backend.describe() == {'backend': 'tflite', 'variant': 'full'}
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from pose import geometry
+from pose.geometry import PoseLandmark
+
+
+@pytest.fixture
+def standing_pose():
+    """A symmetric standing pose with every landmark fully visible."""
+    array = np.zeros((geometry.NUM_LANDMARKS, 4))
+    array[:, 3] = 1.0
+    for side, x in (("LEFT", 0.45), ("RIGHT", 0.55)):
+        array[PoseLandmark[f"{side}_SHOULDER"], :2] = (x, 0.25)
+        array[PoseLandmark[f"{side}_ELBOW"], :2] = (x, 0.35)
+        array[PoseLandmark[f"{side}_WRIST"], :2] = (x, 0.45)
+        array[PoseLandmark[f"{side}_INDEX"], :2] = (x, 0.48)
+        array[PoseLandmark[f"{side}_HIP"], :2] = (x, 0.5)
+        array[PoseLandmark[f"{side}_KNEE"], :2] = (x, 0.7)
+        array[PoseLandmark[f"{side}_ANKLE"], :2] = (x, 0.9)
+        array[PoseLandmark[f"{side}_FOOT_INDEX"], :2] = (x + 0.03, 0.94)
+    return array
+
+
+def test_landmarks_to_array_from_objects(standing_pose):
+    """Test converting landmark objects to the (33, 4) array."""
+    landmarks = [SimpleNamespace(x=x, y=y, z=z, visibility=v) for x, y, z, v in standing_pose]
+    array = geometry.landmarks_to_array(landmarks)
+    assert array.shape == (33, 4)
+    np.testing.assert_allclose(array, standing_pose)
+
+
+def test_analyze_limbs_symmetric_pose(standing_pose):
+    """Test measurements for a symmetric, fully visible pose."""
+    needs = geometry.analyze_limbs(standing_pose, 1000, 2000)
+
+    assert [need["limb_type"] for need in needs] == ["Left_Knee", "Right_Knee", "Left_Ankle", "Right_Ankle"]
+    left_knee = needs[0]
+    assert left_knee["coordinates"] == {"x": 450, "y": 1400}
+    assert left_knee["distances"] == pytest.approx([0.2 * 170, 0.2 * 170])
+    assert left_knee["recommended_size"] == pytest.approx({"length": 34.0, "circumference": 11.9, "width": 4.08})
+    assert left_knee["points"][0] == pytest.approx({"x": 450.0, "y": 1000.0})
+    assert left_knee["confidence"] == pytest.approx(0.3)
+    assert left_knee["detection_reasons"] == []
+    assert left_knee["asymmetry_data"]["hip_knee_asymmetry"] == 0
+
+
+def test_analyze_limbs_flags_asymmetry_and_visibility(standing_pose):
+    """Test that a shortened, occluded shin raises confidence."""
+    standing_pose[PoseLandmark.RIGHT_ANKLE, :2] = (0.55, 0.8)
+    standing_pose[PoseLandmark.RIGHT_ANKLE, 3] = 0.2
+
+    needs = {need["limb_type"]: need for need in geometry.analyze_limbs(standing_pose, 1000, 1000)}
+
+    right_ankle = needs["Right_Ankle"]
+    assert right_ankle["confidence"] == pytest.approx(1.0)
+    assert right_ankle["detection_reasons"] == [
+        "Low visibility (0.20)",
+        "Knee-ankle asymmetry detected (0.50)",
+    ]
+    assert needs["Left_Ankle"]["confidence"] == pytest.approx(0.7)
+    assert needs["Left_Knee"]["detection_reasons"] == []
+
+
+def test_detect_asymmetry_keys(standing_pose):
+    """Test the asymmetry report for the default leg table."""
+    report = geometry.detect_asymmetry(standing_pose)
+    assert set(report) == {
+        "hip_knee_asymmetry", "knee_ankle_asymmetry",
+        "left_hip_knee", "right_hip_knee", "left_knee_ankle", "right_knee_ankle",
+    }
+
+
+def test_arm_table(standing_pose):
+    """Test that arms are measured by extending the limb table."""
+    needs = geometry.analyze_limbs(standing_pose, 1000, 1000, limbs=geometry.ARM_LIMBS)
+    assert [need["limb_type"] for need in needs] == ["Left_Elbow", "Right_Elbow", "Left_Wrist", "Right_Wrist"]
+    assert "shoulder_elbow_asymmetry" in needs[0]["asymmetry_data"]
+    assert needs[2]["distances"] == pytest.approx([0.1 * 170, 0.03 * 170])
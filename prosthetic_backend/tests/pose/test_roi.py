@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import numpy as np
+
+from pose import roi
+from pose.decode import decode_image
+
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / "benchmarks" / "fixtures"
+
+
+def test_to_frame_maps_crop_landmarks_back():
+    """Test landmarks found in a crop land at the same pixels of the full frame."""
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    box = roi.Roi(0.25, 0.5, 0.75, 1.0)
+    assert roi.crop(image, box).shape == (50, 100, 3)
+
+    landmarks = np.array([[0.0, 0.0, 0.1, 0.9], [0.5, 0.5, -0.2, 0.8], [1.0, 1.0, 0.0, 0.1]])
+    mapped = roi.to_frame(landmarks, box, image.shape)
+    np.testing.assert_allclose(mapped[:, :2], [[0.25, 0.5], [0.5, 0.75], [0.75, 1.0]])
+    # Depth keeps the scale of x; visibility is untouched
+    np.testing.assert_allclose(mapped[:, 2], [0.05, -0.1, 0.0])
+    np.testing.assert_array_equal(mapped[:, 3], landmarks[:, 3])
+
+
+def test_roi_from_landmarks_pads_visible_points():
+    landmarks = np.array([[0.4, 0.2, 0, 0.9], [0.6, 0.6, 0, 0.9], [0.0, 0.0, 0, 0.1]])
+    box = roi.roi_from_landmarks(landmarks, 1000, 500)
+    # 200 x 200 px of visible landmarks around (500, 200), padded to 250 px square
+    np.testing.assert_allclose([box.x0, box.y0, box.x1, box.y1], [0.375, 0.15, 0.625, 0.65])
+    assert roi.roi_from_landmarks(landmarks[2:], 1000, 500) is None
+
+
+def test_square_roi_is_clipped_to_frame():
+    box = roi.square_roi(10, 50, 40, 200, 100)
+    assert (box.x0, box.y0, box.x1, box.y1) == (0.0, 0.1, 0.25, 0.9)
+    assert roi.square_roi(-100, 50, 40, 200, 100) is None
+
+
+def test_tiles_cover_frame():
+    image = np.zeros((750, 1000, 3), dtype=np.uint8)
+    covered = np.zeros(image.shape[:2], dtype=bool)
+    for left, top, tile in roi.tiles(image):
+        assert tile.shape[:2] == (500, 500)
+        covered[top:top + 500, left:left + 500] = True
+    assert covered.all()
+
+
+def test_tiles_are_only_searched_in_large_frames():
+    assert roi.tiles_add_detail(np.zeros((750, 1000, 3), dtype=np.uint8))
+    # 320 px tiles would add six detector passes for little more than the frame shows
+    assert not roi.tiles_add_detail(np.zeros((480, 640, 3), dtype=np.uint8))
+    assert roi.tiles_add_detail(np.zeros((480, 640, 3), dtype=np.uint8), min_scale=1.0)
+
+
+def test_tracker_forgets_expired_and_old_sessions():
+    tracker = roi.RoiTracker(max_sessions=2, ttl=60)
+    for session in ("a", "b", "c"):
+        tracker.put(session, roi.FULL_FRAME)
+    assert tracker.get("a") is None
+    assert tracker.get("c") == roi.FULL_FRAME
+    tracker.put("c", None)
+    assert tracker.get("c") is None
+
+    tracker = roi.RoiTracker(ttl=0)
+    tracker.put("a", roi.FULL_FRAME)
+    assert tracker.get("a") is None
+
+
+def test_detector_finds_subject():
+    """Test the detector boxes the small subject of a wide clinic photo and nobody in an empty room."""
+    assert len(roi.anchors()) == 2254
+    detector = roi.PersonDetector()
+
+    image = decode_image(np.fromfile(FIXTURES_DIR / "clinic_wide.jpg", np.uint8)).image
+    box = detector.detect(image)
+    # The figure stands at x = 0.725, from y = 0.5 to 0.9
+    assert box.x0 < 0.65 < 0.8 < box.x1
+    assert box.y0 < 0.5 and box.y1 > 0.9
+    assert box.width < 0.5
+
+    empty = decode_image(np.fromfile(FIXTURES_DIR / "empty_room.jpg", np.uint8)).image
+    assert detector.detect(empty) is None
+
+
+def test_detector_searches_tiles_for_small_subjects():
+    from benchmarks.fixtures.make_fixtures import canvas, draw_figure
+
+    image = draw_figure(canvas(1000, 750, 5), 300, 450, 150)
+    box = roi.PersonDetector().detect(image)
+    assert box is not None
+    assert box.x0 < 0.3 < box.x1 and box.y0 < 0.7 < box.y1
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from pose import geometry
+from pose.visualization import VisualizationStore, draw_annotations, encode_image
+
+
+@pytest.fixture
+def frame():
+    return np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def landmarks():
+    array = np.full((geometry.NUM_LANDMARKS, 4), 0.5)
+    array[:, 0] = np.linspace(0.1, 0.9, geometry.NUM_LANDMARKS)
+    array[:, 3] = 1.0
+    return array
+
+
+def test_draw_annotations_rescales_points(frame, landmarks):
+    """Test that needs measured at full resolution are drawn on a reduced frame."""
+    needs = geometry.analyze_limbs(landmarks, 320, 240)
+    image = draw_annotations(frame, landmarks, needs, 320, 240)
+    assert image is frame
+    assert image.any()
+
+
+@pytest.mark.parametrize("image_format, magic", [("jpeg", b"\xff\xd8"), ("webp", b"RIFF")])
+def test_encode_image(frame, image_format, magic):
+    """Test encoding in each supported format."""
+    content, media_type = encode_image(frame, image_format, 80)
+    assert content.startswith(magic)
+    assert media_type == f"image/{image_format}"
+
+
+def test_encode_image_rejects_unknown_format(frame):
+    with pytest.raises(ValueError):
+        encode_image(frame, "gif")
+
+
+def test_store_renders_in_background(frame):
+    """Test rendering, encoding caching and unknown ids."""
+    store = VisualizationStore(max_entries=2)
+    result_id = store.submit(lambda image: image + 1, frame)
+
+    first = store.encode(result_id, "jpeg", 75)
+    assert store.encode(result_id, "jpeg", 75) is first
+    with pytest.raises(KeyError):
+        store.get("missing")
+    store.shutdown()
+
+
+def test_store_evicts_oldest(frame):
+    store = VisualizationStore(max_entries=1)
+    first = store.submit(lambda image: image, frame)
+    store.submit(lambda image: image, frame)
+    with pytest.raises(KeyError):
+        store.get(first)
+    store.shutdown()
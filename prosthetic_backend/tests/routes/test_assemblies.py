@@ -1,5 +1,9 @@
+import io
 import json
 
+import numpy as np
+import trimesh
+
 def test_create_assembly(client):
     """Test creating an assembly"""
     response = client.post('/api/assemblies', json={'name': 'Test Assembly'})
@@ -18,3 +22,71 @@ def test_get_assemblies(client):
     response = client.get('/api/assemblies')
     assert response.status_code == 200
     assert isinstance(response.get_json(), list)
+
+def test_assembly_interference(client, storage_dirs, upload_part):
+    """Test that overlapping parts are reported and separated ones are not"""
+    part_id = upload_part(trimesh.creation.icosphere(subdivisions=3, radius=10), 'Sphere')['id']
+    assert list((storage_dirs / 'mesh_cache').glob('*.bvh.npz'))
+
+    assembly_id = client.post('/api/assemblies', json={'name': 'Overlap'}).get_json()['id']
+    placed = []
+    for x in (0, 18, 60):
+        response = client.post(f'/api/assemblies/{assembly_id}/parts', json={
+            'part_id': part_id,
+            'position': {'x': x, 'y': 0, 'z': 0},
+            'rotation': {'x': 0, 'y': 0, 'z': 0},
+            'scale': {'x': 1, 'y': 1, 'z': 1},
+        })
+        placed.append(response.get_json()['assembly_part_id'])
+
+    response = client.get(f'/api/assemblies/{assembly_id}/interference')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['parts_checked'] == 3
+    assert data['candidate_pairs'] == 1
+    assert len(data['interferences']) == 1
+    interference = data['interferences'][0]
+    assert [part['assembly_part_id'] for part in interference['parts']] == placed[:2]
+    assert interference['contacts'] > 0
+    assert 1.5 < interference['penetration_depth'] < 2.5
+
+def test_assembly_interference_unknown_assembly(client):
+    response = client.get('/api/assemblies/9999/interference')
+    assert response.status_code == 404
+
+def test_stream_merge_assembly(client, storage_dirs, upload_part):
+    """Test the streamed merge is a complete binary STL of the placed parts"""
+    part_id = upload_part(trimesh.creation.box(extents=(2, 4, 6)), 'Box')['id']
+    assembly_id = client.post('/api/assemblies', json={'name': 'Stream'}).get_json()['id']
+    for x, scale in ((0, 1), (10, -1)):
+        client.post(f'/api/assemblies/{assembly_id}/parts', json={
+            'part_id': part_id,
+            'position': {'x': x, 'y': 0, 'z': 0},
+            'rotation': {'x': 0, 'y': 0, 'z': np.pi / 2},
+            'scale': {'x': scale, 'y': 1, 'z': 1},
+        })
+
+    assert client.get(f'/api/assemblies/{assembly_id}/download').status_code == 404
+    assert client.get(f'/api/assemblies/{assembly_id}/thumbnail').status_code == 404
+    response = client.post(f'/api/assemblies/{assembly_id}/merge?stream=1')
+    assert response.status_code == 200
+    assert int(response.headers['Content-Length']) == len(response.data) == 84 + 50 * 24
+
+    merged = trimesh.load(io.BytesIO(response.data), file_type='stl')
+    assert len(merged.faces) == 24
+    # Rotated a quarter turn about z, the 4-wide side lies along x
+    np.testing.assert_allclose(merged.bounds, [[-2, -1, -3], [12, 1, 3]], atol=1e-5)
+    # The mirrored copy keeps outward-facing normals
+    assert merged.is_winding_consistent and merged.volume > 0
+
+    data = client.get(f'/api/assemblies/{assembly_id}').get_json()
+    assert data['status'] == 'complete'
+    assert [path.read_bytes() for path in (storage_dirs / 'merged').glob('*.stl')] == [response.data]
+
+    url = client.get(f'/api/assemblies/{assembly_id}/download').get_json()['url']
+    assert client.get(url).data == response.data
+
+    # Streamed merges render their thumbnail on first request
+    thumbnail = client.get(data['thumbnail_url'])
+    assert thumbnail.status_code == 200 and thumbnail.mimetype == 'image/webp'
+    assert thumbnail.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from telemetry.profiling import (
+    FOLDED_CONTENT_TYPE, ID_HEADER, SVG_CONTENT_TYPE, TOKEN_HEADER, ProfileStore, ProfilingMiddleware, RequestProfiler,
+)
+
+
+def analyze(client, upload, **params):
+    return client.post('/analyze/image', params=params, files={'file': ('photo.jpg', upload, 'image/jpeg')})
+
+
+def test_visualization_is_served_by_id(measurement_client, jpeg_upload):
+    """Test that an analysis with visualize=true links to its rendered frame."""
+    response = analyze(measurement_client, jpeg_upload, visualize='true')
+    assert response.status_code == 200
+    body = response.json()
+    assert body['success']
+
+    image = measurement_client.get(body['visualization_url'])
+    assert image.status_code == 200
+    assert image.headers['content-type'] == 'image/jpeg'
+    assert image.content[:2] == b'\xff\xd8'
+    webp = measurement_client.get(body['visualization_url'], params={'format': 'webp'})
+    assert webp.content[:4] == b'RIFF'
+
+
+def test_unknown_visualization_is_not_found(measurement_client):
+    assert measurement_client.get('/analyze/visualization/missing').status_code == 404
+    assert measurement_client.get('/analyze/visualization/missing', params={'format': 'gif'}).status_code == 400
+
+
+@pytest.fixture
+def session_app(measurement_app, monkeypatch):
+    """The measurement app cropping to session boxes, with a detector that finds nobody"""
+    from types import SimpleNamespace
+
+    from pose.roi import RoiTracker
+
+    monkeypatch.setattr(measurement_app, 'ROI_ENABLED', True)
+    monkeypatch.setattr(measurement_app, 'person_detector', SimpleNamespace(detect=lambda image: None))
+    monkeypatch.setattr(measurement_app, 'roi_tracker', RoiTracker())
+    return measurement_app
+
+
+def test_cache_hit_refreshes_the_session_box(session_app, measurement_client, jpeg_upload):
+    """Test a session answered from the cache still gets a box for its next frame."""
+    assert analyze(measurement_client, jpeg_upload).json()['metadata']['cache'] == 'miss'
+    hit = analyze(measurement_client, jpeg_upload, session='viewer').json()
+    assert hit['metadata']['cache'] == 'hit'
+    assert session_app.roi_tracker.get('viewer') is not None
+
+
+def test_sessions_with_different_boxes_are_not_served_each_others_results(
+        session_app, measurement_client, jpeg_upload):
+    """Test the same frame is analysed again for a session whose previous box differs."""
+    from pose.roi import Roi
+
+    backend = session_app.pose_estimator.backend
+    session_app.roi_tracker.put('left', Roi(0.0, 0.0, 0.5, 1.0))
+    session_app.roi_tracker.put('right', Roi(0.5, 0.0, 1.0, 1.0))
+
+    first = analyze(measurement_client, jpeg_upload, session='left').json()
+    second = analyze(measurement_client, jpeg_upload, session='right').json()
+    assert (first['metadata']['cache'], second['metadata']['cache']) == ('miss', 'miss')
+    assert first['metadata']['cache_key'] != second['metadata']['cache_key']
+    assert (first['roi']['source'], first['roi']['x']) == ('session', 0.0)
+    assert (second['roi']['source'], second['roi']['x']) == ('session', 0.5)
+    assert backend.calls == 2
+
+
+def test_repeated_upload_is_served_from_cache(measurement_app, measurement_client, jpeg_upload):
+    """Test metadata.cache reports the miss, then the hit that skips inference."""
+    backend = measurement_app.pose_estimator.backend
+    first = analyze(measurement_client, jpeg_upload).json()
+    assert first['metadata']['cache'] == 'miss'
+    assert backend.calls == 1
+
+    second = analyze(measurement_client, jpeg_upload, visualize='true').json()
+    assert second['metadata'] == first['metadata'] | {'cache': 'hit'}
+    assert second['missing_limbs'] == first['missing_limbs']
+    assert backend.calls == 1
+    # The frame is decoded again to draw the cached landmarks on
+    assert measurement_client.get(second['visualization_url']).status_code == 200
+
+
+def occupy_slots(monkeypatch, admission, **queue_depth):
+    """Every inference slot busy, with the given lanes' queue depths"""
+    monkeypatch.setattr(admission, 'running', admission.concurrency)
+    for lane, depth in queue_depth.items():
+        monkeypatch.setitem(admission.queue_depth, lane, depth)
+
+
+def test_full_lane_is_refused_with_retry_after(measurement_app, measurement_client, jpeg_upload, monkeypatch):
+    occupy_slots(monkeypatch, measurement_app.admission, interactive=0)
+    refused = analyze(measurement_client, jpeg_upload)
+    assert refused.status_code == 503
+    assert int(refused.headers['retry-after']) >= 1
+    assert refused.json()['reason'] == 'saturated'
+    # Other lanes still queue; this one gives up at its deadline
+    expired = measurement_client.post('/analyze/image', params={'priority': 'batch'},
+                                      headers={'X-Request-Timeout': '0.05'},
+                                      files={'file': ('photo.jpg', jpeg_upload, 'image/jpeg')})
+    assert expired.status_code == 503
+    assert expired.json()['reason'] == 'deadline'
+    assert 'retry-after' in expired.headers
+    assert measurement_app.pose_estimator.backend.calls == 0
+
+
+def test_gate_refuses_before_reading_the_upload(measurement_app, monkeypatch):
+    """Test the measurement app answers a full lane without receiving the request body."""
+    occupy_slots(monkeypatch, measurement_app.admission, batch=0)
+    received, sent = [], []
+
+    async def receive():
+        received.append(True)
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+        'path': '/analyze/image', 'raw_path': b'/analyze/image', 'root_path': '',
+        'query_string': b'priority=batch', 'client': ('testclient', 50000), 'server': ('testserver', 80),
+        'headers': [(b'content-type', b'multipart/form-data; boundary=upload'), (b'content-length', b'1048576')],
+    }
+    asyncio.run(measurement_app.app(scope, receive, send))
+    assert sent[0]['status'] == 503
+    assert int(dict(sent[0]['headers'])[b'retry-after']) >= 1
+    assert not received
+
+
+def test_unknown_priority_is_rejected(measurement_app, measurement_client, jpeg_upload):
+    assert analyze(measurement_client, jpeg_upload, priority='urgent').status_code == 422
+    assert analyze(measurement_client, jpeg_upload, priority='batch').status_code == 200
+    assert measurement_app.pose_estimator.backend.calls == 1
+
+
+def test_queue_gauges_are_exported(measurement_app, measurement_client, monkeypatch):
+    occupy_slots(monkeypatch, measurement_app.admission)
+    lines = measurement_client.get('/metrics').text.splitlines()
+    assert 'measurement_queue_depth_interactive 0' in lines
+    assert 'measurement_queue_depth_batch 0' in lines
+    assert f'measurement_inference_running {measurement_app.admission.concurrency}' in lines
+
+
+@pytest.fixture
+def profiled_client(measurement_app, tmp_path, monkeypatch):
+    """The measurement app profiling requests that carry the token 'secret'"""
+    profiler = RequestProfiler(ProfileStore(tmp_path), token='secret', interval=0.001)
+    monkeypatch.setattr(measurement_app, 'profiler', profiler)
+    with TestClient(ProfilingMiddleware(measurement_app.app, profiler)) as client:
+        yield client
+
+
+def test_profiles_are_listed_and_rendered(profiled_client, jpeg_upload):
+    auth = {TOKEN_HEADER: 'secret'}
+    assert ID_HEADER not in analyze(profiled_client, jpeg_upload).headers
+    assert profiled_client.get('/analyze/profiles').status_code == 403
+    assert profiled_client.get('/analyze/profiles', headers={TOKEN_HEADER: 'wrong'}).status_code == 403
+
+    response = profiled_client.post('/analyze/image', headers=auth,
+                                    files={'file': ('photo.jpg', jpeg_upload, 'image/jpeg')})
+    assert response.status_code == 200
+    profile_id = response.headers[ID_HEADER]
+
+    listed = profiled_client.get('/analyze/profiles', headers=auth).json()['profiles']
+    assert [(p['id'], p['service'], p['path'], p['status'], p['trigger']) for p in listed] == [
+        (profile_id, 'measurement', '/analyze/image', 200, 'header')]
+    folded = profiled_client.get(f'/analyze/profiles/{profile_id}', headers=auth)
+    assert folded.status_code == 200
+    assert folded.headers['content-type'] == FOLDED_CONTENT_TYPE
+    flamegraph = profiled_client.get(f'/analyze/profiles/{profile_id}/flamegraph', headers=auth)
+    assert flamegraph.headers['content-type'] == SVG_CONTENT_TYPE
+    assert flamegraph.text.startswith('<svg')
+    assert profiled_client.get('/analyze/profiles/' + '0' * 32, headers=auth).status_code == 404
+    assert profiled_client.get(f'/analyze/profiles/{profile_id}/flamegraph').status_code == 403
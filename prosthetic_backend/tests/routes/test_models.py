@@ -1,5 +1,9 @@
 import io
-import os 
+import os
+
+import trimesh
+
+
 def test_upload_part(client):
     """Test uploading a valid part"""
     file_path = os.path.join(os.path.dirname(__file__), "..", "resources", "test.obj")
@@ -30,3 +34,167 @@ def test_get_parts(client):
     response = client.get('/api/parts')
     assert response.status_code == 200
     assert isinstance(response.get_json(), list)
+
+def test_get_scaled_part(client, upload_part):
+    """Test downloading a part scaled for a patient's age"""
+    part_id = upload_part(trimesh.creation.box(extents=(10, 10, 10)), 'Hand')['id']
+
+    response = client.get(f'/api/parts/{part_id}/scaled?age=8')
+    assert response.status_code == 200
+    assert response.headers['X-Scale-Factors'] == '0.6300,0.7700,0.7000'
+    assert response.headers['X-Cache'] == 'miss'
+    scaled = trimesh.load(io.BytesIO(response.data), file_type='stl')
+    assert list(scaled.extents.round(3)) == [6.3, 7.7, 7.0]
+
+    response = client.get(f'/api/parts/{part_id}/scaled?age=8&limb=foot')
+    assert response.headers['X-Scale-Factors'] == '0.7700,0.4900,0.7000'
+    assert client.get(f'/api/parts/{part_id}/scaled?age=8').headers['X-Cache'] == 'hit'
+
+def test_get_scaled_part_invalid(client):
+    assert client.get('/api/parts/1/scaled').status_code == 400
+    assert client.get('/api/parts/1/scaled?age=ten').status_code == 400
+    assert client.get('/api/parts/9999/scaled?age=10').status_code == 404
+
+def test_get_part_glb(client, storage_dirs, upload_part):
+    """Test parts are served as cached GLB"""
+    sphere = trimesh.creation.icosphere(subdivisions=4, radius=10).export(file_type='stl')
+    part_id = upload_part(sphere, 'Sphere')['id']
+
+    response = client.get(f'/api/parts/{part_id}/glb')
+    assert response.status_code == 200
+    assert response.mimetype == 'model/gltf-binary'
+    assert response.headers['X-Cache'] == 'miss'
+    assert response.data[:4] == b'glTF'
+    assert len(response.data) * 3 < len(sphere)
+    assert list((storage_dirs / 'uploads').glob('*.glb'))
+    assert client.get(f'/api/parts/{part_id}/glb').headers['X-Cache'] == 'hit'
+
+    client.delete(f'/api/parts/{part_id}')
+    assert not list((storage_dirs / 'uploads').glob('*.glb'))
+    assert client.get(f'/api/parts/{part_id}/glb').status_code == 404
+
+def test_upload_records_compaction(client, storage_dirs, upload_part):
+    """Test uploads are welded and the counts recorded in the metadata"""
+    part = upload_part(trimesh.creation.icosphere(subdivisions=3), 'Sphere')
+    metadata = part['model_metadata']
+    assert metadata['vertices'] == 642
+    assert metadata['compaction']['vertices_before'] == 3 * 1280
+    assert metadata['compaction']['vertices_after'] == 642
+    assert 'shape_descriptor' not in metadata
+    listed = next(p for p in client.get('/api/parts').get_json() if p['id'] == part['id'])
+    assert listed['model_metadata'] == metadata
+    assert len(list((storage_dirs / 'mesh_cache').glob('*.mesh.npz'))) == 1
+
+    client.delete(f"/api/parts/{part['id']}")
+    assert not list((storage_dirs / 'mesh_cache').glob('*.mesh.npz'))
+
+def test_download_part(client, upload_part):
+    """Test download links serve the part and stop working once tampered with"""
+    with open('tests/resources/test.obj', 'rb') as f:
+        content = f.read()
+    part_id = upload_part(content, 'Test', filename='test.obj')['id']
+
+    response = client.get(f'/api/parts/{part_id}/download')
+    assert response.status_code == 200
+    url = response.get_json()['url']
+    assert response.get_json()['expires_in'] > 0
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == content
+    assert 'attachment' in response.headers['Content-Disposition']
+
+    assert client.get(url[:-2] + 'xx').status_code == 403
+    response = client.get(f'/api/parts/{part_id}/download?redirect=1')
+    assert response.status_code == 302
+    assert client.get('/api/parts/9999/download').status_code == 404
+
+def test_match_parts(client, upload_part):
+    """Test the closest parts are returned with the scale factors to fit them"""
+    def upload(name, radius, height):
+        return upload_part(trimesh.creation.cylinder(radius=radius, height=height, sections=64), name)['id']
+
+    # Sizes in mm; measurements in cm
+    small = upload('leg socket small', radius=40, height=300)
+    large = upload('leg socket large', radius=60, height=450)
+    arm = upload('arm cuff', radius=40, height=300)
+
+    response = client.get('/api/parts/match?length=31&circumference=26&width=8.2&limb=Left_Knee&k=2')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['limb_type'] == 'leg'
+    assert [match['id'] for match in data['matches']] == [small, large]
+    best = data['matches'][0]
+    assert abs(best['dimensions']['length'] - 30) < 0.1
+    assert abs(best['scale_factors']['length'] - 31 / 30) < 1e-3
+
+    response = client.get('/api/parts/match?length=30&circumference=25&width=8')
+    assert response.get_json()['matches'][0]['id'] in (small, arm)
+
+    # New uploads are indexed
+    larger = upload('leg socket xl', radius=80, height=600)
+    response = client.get('/api/parts/match?length=60&circumference=50&width=16&limb=leg&k=1')
+    assert [match['id'] for match in response.get_json()['matches']] == [larger]
+
+    assert client.get('/api/parts/match?length=30&width=8').status_code == 400
+    assert client.get('/api/parts/match?length=-1&circumference=25&width=8').status_code == 400
+
+def test_similar_parts(client, storage_dirs, upload_part):
+    """Test near-identical uploads rank first, from stored descriptors only"""
+    finger = trimesh.creation.capsule(height=40, radius=6)
+    variant = finger.copy()
+    variant.apply_transform(trimesh.transformations.rotation_matrix(1.2, [0, 1, 1]))
+    variant.apply_scale(1.1)
+    finger_id = upload_part(finger, 'CB_Finger')['id']
+    variant_id = upload_part(variant, 'CB_Finger_v2')['id']
+    upload_part(trimesh.creation.box(extents=(60, 50, 15)), 'Palm')
+    upload_part(trimesh.creation.cylinder(radius=40, height=120), 'Socket')
+
+    # Queries read descriptors, not mesh files
+    for path in (storage_dirs / 'uploads').iterdir():
+        path.unlink()
+    response = client.get(f'/api/parts/{finger_id}/similar?k=2')
+    assert response.status_code == 200
+    similar = response.get_json()['similar']
+    assert [part['id'] for part in similar][0] == variant_id
+    assert finger_id not in [part['id'] for part in similar]
+    assert similar[0]['distance'] < similar[1]['distance']
+
+    assert client.get('/api/parts/9999/similar').status_code == 404
+
+def test_part_thumbnail(client, storage_dirs, upload_part):
+    """Test thumbnails are rendered at upload and served with cache headers"""
+    part = upload_part(trimesh.creation.box(extents=(10, 20, 30)), 'Hand')
+    content_hash = part['model_metadata']['thumbnail']
+    assert part['thumbnail_url'] == f"/api/parts/{part['id']}/thumbnail?v={content_hash}"
+    assert len(list((storage_dirs / 'mesh_cache' / 'thumbnails').iterdir())) == 2
+
+    listed = next(p for p in client.get('/api/parts').get_json() if p['id'] == part['id'])
+    assert listed['thumbnail_url'] == part['thumbnail_url']
+
+    response = client.get(part['thumbnail_url'])
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response.headers['ETag'] == f'"{content_hash}"'
+
+    response = client.get(f"/api/parts/{part['id']}/thumbnail?format=png")
+    assert response.data.startswith(b'\x89PNG')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    response = client.get(f"/api/parts/{part['id']}/thumbnail", headers={'If-None-Match': f'"{content_hash}"'})
+    assert response.status_code == 304
+
+    assert client.get(f"/api/parts/{part['id']}/thumbnail?format=gif").status_code == 400
+    assert client.get('/api/parts/9999/thumbnail').status_code == 404
+
+def test_delete_part_removes_what_it_can(client, storage_dirs, upload_part, monkeypatch):
+    """Test a failing file delete does not skip the derived copies or keep the part"""
+    part = upload_part(trimesh.creation.box(), 'Box')
+
+    def refuse(ref):
+        raise PermissionError(ref)
+
+    monkeypatch.setattr('app.utils.blob_storage.delete', refuse)
+    assert client.delete(f"/api/parts/{part['id']}").status_code == 200
+    assert list((storage_dirs / 'uploads').glob('*.stl'))
+    assert not list((storage_dirs / 'mesh_cache').glob('*.npz'))
+    assert all(p['id'] != part['id'] for p in client.get('/api/parts').get_json())
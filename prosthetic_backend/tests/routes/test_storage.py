@@ -0,0 +1,28 @@
+import os
+import time
+
+
+def test_storage_usage(client, storage_dirs):
+    (storage_dirs / 'uploads').mkdir(exist_ok=True)
+    (storage_dirs / 'uploads' / 'part.stl').write_bytes(b'x' * 84)
+
+    response = client.get('/api/storage')
+    assert response.status_code == 200
+    assert response.get_json()['usage']['uploads'] == {
+        'path': str(storage_dirs / 'uploads'), 'files': 1, 'bytes': 84, 'quota_bytes': None}
+
+
+def test_collect_keeps_files_younger_than_the_configured_grace(client, storage_dirs):
+    """Test a caller cannot shorten the grace that protects files still being written"""
+    (storage_dirs / 'uploads').mkdir(exist_ok=True)
+    fresh = storage_dirs / 'uploads' / 'in_flight.stl'
+    fresh.write_bytes(b'x' * 84)
+    orphan = storage_dirs / 'uploads' / 'orphan.stl'
+    orphan.write_bytes(b'x' * 84)
+    stamp = time.time() - 2 * 3600
+    os.utime(orphan, (stamp, stamp))
+
+    response = client.post('/api/storage/collect?grace=0')
+    assert response.status_code == 200
+    assert response.get_json()['deleted'] == 1
+    assert fresh.exists() and not orphan.exists()
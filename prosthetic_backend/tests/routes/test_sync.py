@@ -0,0 +1,45 @@
+import trimesh
+
+
+def test_sync_returns_only_changes(client, upload_part):
+    """Test a client catches up on changes and deletes since its last revision"""
+    box = trimesh.creation.box()
+    part_ids = [upload_part(box, f'Part {i}')['id'] for i in range(3)]
+    assembly_id = client.post('/api/assemblies', json={'name': 'Leg'}).get_json()['id']
+
+    snapshot = client.get('/api/sync').get_json()
+    assert snapshot['full'] is True
+    assert [part['id'] for part in snapshot['parts']] == part_ids
+    assert [assembly['id'] for assembly in snapshot['assemblies']] == [assembly_id]
+    revision = snapshot['revision']
+
+    # Nothing changed
+    response = client.get(f'/api/sync?since={revision}').get_json()
+    assert response['revision'] == revision and response['full'] is False
+    assert response['parts'] == response['assemblies'] == response['assembly_parts'] == []
+    assert response['deleted'] == {'parts': [], 'assemblies': [], 'assembly_parts': []}
+
+    client.post(f'/api/assemblies/{assembly_id}/parts', json={'part_id': part_ids[0]})
+    client.delete(f'/api/parts/{part_ids[2]}')
+    response = client.get(f'/api/sync?since={revision}').get_json()
+    assert response['revision'] > revision
+    assert response['parts'] == []
+    assert [row['part_id'] for row in response['assembly_parts']] == [part_ids[0]]
+    assert response['deleted']['parts'] == [part_ids[2]]
+    revision = response['revision']
+
+    client.put(f'/api/assemblies/{assembly_id}', json={'name': 'Left leg'})
+    response = client.get(f'/api/sync?since={revision}').get_json()
+    assert [assembly['name'] for assembly in response['assemblies']] == ['Left leg']
+    revision = response['revision']
+
+    # Deleting an assembly deletes its parts too
+    client.delete(f'/api/assemblies/{assembly_id}')
+    response = client.get(f'/api/sync?since={revision}').get_json()
+    assert response['deleted']['assemblies'] == [assembly_id]
+    assert len(response['deleted']['assembly_parts']) == 1
+
+    # A revision from another database gets a full snapshot
+    assert client.get('/api/sync?since=100000').get_json()['full'] is True
+    assert client.get('/api/sync?since=-1').status_code == 400
+    assert client.get('/api/sync?since=latest').status_code == 400
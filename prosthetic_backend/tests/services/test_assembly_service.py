@@ -1,6 +1,8 @@
 import pytest
+import trimesh
 from app.models.database import db, Assembly, Part, AssemblyPart
 from app.services.assembly_service import AssemblyService
+from app.services.compaction_service import CompactionService
 
 def test_create_assembly(client):
     """Test creating a new assembly."""
@@ -40,3 +42,45 @@ def test_merge_assembly(client, mocker):
         merged_path = AssemblyService.merge_assembly(assembly.id)
         assert merged_path is not None
         assert assembly.merged_file_path is not None
+
+def test_stream_merge_announces_recorded_face_counts(client, storage_dirs, upload_part, monkeypatch):
+    """Test the STL header uses counts recorded at upload and a mismatch fails the stream."""
+    part = upload_part(trimesh.creation.box(), 'Box')
+    assembly_id = client.post('/api/assemblies', json={'name': 'Stream'}).get_json()['id']
+    client.post(f'/api/assemblies/{assembly_id}/parts', json={'part_id': part['id']})
+
+    def unexpected(file_path):
+        raise AssertionError("face_count should not be needed")
+
+    monkeypatch.setattr(CompactionService, 'face_count', unexpected)
+    with client.application.app_context():
+        chunks, _, size = AssemblyService.stream_merge(assembly_id)
+        assert size == 84 + 12 * 50
+        assert len(b''.join(chunks)) == size
+
+        stored = db.session.get(Part, part['id'])
+        compaction = dict(stored.model_metadata['compaction'], faces_after=13)
+        stored.model_metadata = dict(stored.model_metadata, compaction=compaction)
+        db.session.commit()
+        chunks, _, size = AssemblyService.stream_merge(assembly_id)
+        assert size == 84 + 13 * 50
+        with pytest.raises(RuntimeError, match='13 were announced'):
+            b''.join(chunks)
+    assert not list((storage_dirs / 'merged').glob('*.tmp'))
+
+def test_stream_merge_discards_the_superseded_merge(client, storage_dirs, upload_part):
+    """Test a new merge result replaces the previous file instead of leaving it behind."""
+    part = upload_part(trimesh.creation.box(), 'Box')
+    assembly_id = client.post('/api/assemblies', json={'name': 'Remerge'}).get_json()['id']
+    client.post(f'/api/assemblies/{assembly_id}/parts', json={'part_id': part['id']})
+    previous = storage_dirs / 'merged' / f'merged_{assembly_id}_100.stl'
+    previous.parent.mkdir(exist_ok=True)
+    previous.write_bytes(b'old merge')
+
+    with client.application.app_context():
+        db.session.get(Assembly, assembly_id).merged_file_path = str(previous)
+        db.session.commit()
+        chunks, merged_path, _ = AssemblyService.stream_merge(assembly_id)
+        b''.join(chunks)
+        assert db.session.get(Assembly, assembly_id).merged_file_path == merged_path
+    assert not previous.exists()
@@ -19,9 +19,9 @@ def mock_db_session():
         yield mock_session
 
 @pytest.fixture
-def mock_config():
+def mock_config(storage_dirs):
     """Mock the configuration upload folder."""
-    with patch("config.Config.UPLOAD_FOLDER", "tests/uploads"):
+    with patch("config.Config.UPLOAD_FOLDER", storage_dirs / "uploads"):
         yield
 
 @pytest.fixture
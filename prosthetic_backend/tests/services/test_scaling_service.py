@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import trimesh
+from types import SimpleNamespace
+from app.services.scaling_service import ScalingService
+from app.utils import stl
+
+@pytest.fixture
+def cache_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.MESH_CACHE_FOLDER', tmp_path / 'mesh_cache')
+    return tmp_path / 'mesh_cache'
+
+@pytest.fixture
+def box_part(tmp_path):
+    path = tmp_path / 'arm_socket.stl'
+    trimesh.creation.box(extents=(10, 20, 30)).export(str(path))
+    return SimpleNamespace(id=1, file_path=str(path))
+
+@pytest.mark.parametrize('age,limb,expected', [
+    (4, 'generic', (0.5, 0.5, 0.5)),
+    (10, 'arm', (0.63, 0.77, 0.7)),
+    (15, 'leg', (0.8075, 1.02, 0.85)),
+    (25, 'hand', (0.8, 0.8, 1.0)),
+    (40, 'foot', (1.078, 0.686, 0.98)),
+    (70, 'Upper Arm', (0.855, 1.045, 0.95)),
+])
+def test_scale_factors(age, limb, expected):
+    """Test factors match the app's prosthetic scaler"""
+    factors = ScalingService.scale_factors(age, limb)
+    assert [factors[axis] for axis in 'xyz'] == pytest.approx(expected)
+
+@pytest.mark.parametrize('path,expected', [
+    ('uploads/Left_Wrist.stl', 'arm'),
+    ('uploads/ankle-brace.obj', 'leg'),
+    ('uploads/cyborg_beast.stl', 'hand'),
+    ('uploads/part.stl', 'generic'),
+])
+def test_limb_type_from_path(path, expected):
+    assert ScalingService.limb_type_from_path(path) == expected
+
+def test_scaled_binary_stl(cache_folder, box_part):
+    """Test vertices and normals are scaled and the variant is cached"""
+    path, factors, cached = ScalingService.get_scaled_part(box_part, 10)
+    assert not cached
+    assert path.parent == cache_folder / 'scaled'
+
+    _, original = stl.read_binary_stl(box_part.file_path)
+    _, scaled = stl.read_binary_stl(path)
+    scale = np.array([factors[axis] for axis in 'xyz'], dtype=np.float32)
+    np.testing.assert_allclose(scaled['vertices'], original['vertices'] * scale, rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(scaled['normal'], axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(trimesh.load(str(path)).extents, np.array([10, 20, 30]) * scale, rtol=1e-5)
+
+    again, _, cached = ScalingService.get_scaled_part(box_part, 10)
+    assert cached and again == path
+    assert ScalingService.get_scaled_part(box_part, 30)[0] != path
+
+def test_scaled_obj(cache_folder, tmp_path):
+    """Test non-binary formats fall back to trimesh"""
+    path = tmp_path / 'knee.obj'
+    trimesh.creation.box(extents=(10, 20, 30)).export(str(path))
+    scaled, factors, _ = ScalingService.get_scaled_part(SimpleNamespace(id=2, file_path=str(path)), 5, 'leg')
+    assert scaled.suffix == '.obj'
+    expected = np.array([10, 20, 30]) * [factors[axis] for axis in 'xyz']
+    np.testing.assert_allclose(trimesh.load(str(scaled)).extents, expected, rtol=1e-5)
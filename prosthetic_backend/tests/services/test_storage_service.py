@@ -0,0 +1,136 @@
+import os
+import time
+
+import pytest
+from flask import current_app
+
+from app.models.database import Assembly, Part, db
+from app.services.storage_service import StorageManager, StorageService
+from app.utils import blob_storage
+
+
+@pytest.fixture
+def storage(client, storage_dirs):
+    """Empty storage folders and a database to reconcile them against"""
+    folders = {}
+    for name in ('uploads', 'merged', 'mesh_cache', 'temp'):
+        folders[name] = storage_dirs / name
+        folders[name].mkdir(exist_ok=True)
+    with client.application.app_context():
+        yield folders
+
+
+def _write(path, size=10, age=7200):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_collect_removes_orphans_only(storage):
+    """Test unreferenced files are deleted while live files and their derivatives stay"""
+    live = _write(storage['uploads'] / 'arm_1.stl')
+    current = _write(storage['merged'] / 'merged_1_200.stl')
+    db.session.add(Part(name='Arm', type='arm', file_path=str(live)))
+    db.session.add(Assembly(name='Assembly', merged_file_path=str(current)))
+    db.session.commit()
+
+    kept = [
+        live, current,
+        _write(storage['uploads'] / 'arm_1.glb'),
+        _write(storage['mesh_cache'] / 'arm_1.stl.bvh.npz'),
+        _write(storage['mesh_cache'] / 'arm_1.stl.mesh.npz'),
+        _write(storage['uploads'] / 'fresh_upload.stl', age=0),  # still inside the grace period
+    ]
+    orphans = [
+        _write(storage['uploads'] / 'deleted_part.stl'),
+        _write(storage['uploads'] / 'deleted_part.glb'),
+        _write(storage['merged'] / 'merged_1_100.stl'),  # superseded by a later merge
+        _write(storage['mesh_cache'] / 'deleted_part.stl.bvh.npz'),
+        _write(storage['temp'] / 'merge_script_abc.py'),
+    ]
+
+    report = StorageService.collect(grace=3600, batch_size=2)
+
+    assert all(path.exists() for path in kept)
+    assert not any(path.exists() for path in orphans)
+    assert report['deleted'] == len(orphans)
+    assert report['freed_bytes'] == 10 * len(orphans)
+    assert report['usage']['uploads']['files'] == 3
+    assert StorageService.last_run()['deleted'] == len(orphans)
+
+
+def test_collect_sweeps_unreferenced_bucket_objects(storage, monkeypatch):
+    """Test bucket objects no row refers to are deleted and referenced ones kept"""
+    boto3 = pytest.importorskip('boto3')
+    moto = pytest.importorskip('moto')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setattr('config.Config.BLOB_STORAGE', 's3')
+    monkeypatch.setattr('config.Config.S3_BUCKET', 'parts')
+    monkeypatch.setattr('config.Config.S3_REGION', 'us-east-1')
+    monkeypatch.setattr(blob_storage, '_stores', {})
+
+    with moto.mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='parts')
+        refs = {}
+        for key in ('uploads/arm_1.stl', 'merged/merged_1_200.stl', 'merged/merged_1_100.stl'):
+            s3.put_object(Bucket='parts', Key=key, Body=b'x' * 10)
+            refs[key] = f's3://parts/{key}'
+        db.session.add(Part(name='Arm', type='arm', file_path=refs['uploads/arm_1.stl']))
+        db.session.add(Assembly(name='Assembly', merged_file_path=refs['merged/merged_1_200.stl']))
+        db.session.commit()
+
+        assert StorageService.collect(grace=3600)['deleted'] == 0
+        report = StorageService.collect(grace=0)
+
+        keys = {item['Key'] for item in s3.list_objects_v2(Bucket='parts')['Contents']}
+        assert keys == {'uploads/arm_1.stl', 'merged/merged_1_200.stl'}
+        assert (report['deleted'], report['freed_bytes'], report['errors']) == (1, 10, 0)
+
+
+def test_collect_keeps_scaled_variants_of_live_parts(storage):
+    from app.utils.helpers import file_sha256
+
+    live = _write(storage['uploads'] / 'hand_1.stl')
+    db.session.add(Part(name='Hand', type='hand', file_path=str(live)))
+    db.session.commit()
+    kept = _write(storage['mesh_cache'] / 'scaled' / f"{file_sha256(live)}_0.5000_0.5000_0.5000.stl")
+    orphan = _write(storage['mesh_cache'] / 'scaled' / f"{'0' * 64}_0.5000_0.5000_0.5000.stl")
+    thumbnail = _write(storage['mesh_cache'] / 'thumbnails' / f"{file_sha256(live)}_256.webp")
+    stale_thumbnail = _write(storage['mesh_cache'] / 'thumbnails' / f"{'0' * 64}_256.webp")
+
+    StorageService.collect(grace=3600)
+    assert kept.exists() and thumbnail.exists()
+    assert not orphan.exists() and not stale_thumbnail.exists()
+
+
+def test_quota_evicts_least_recently_used(storage, monkeypatch):
+    """Test merged outputs over quota are evicted oldest first and unlinked from assemblies"""
+    monkeypatch.setattr('config.Config.MERGED_QUOTA_BYTES', 250)
+    paths = [_write(storage['merged'] / f'merged_{i}_1.stl', size=100, age=100 * (5 - i)) for i in range(5)]
+    for i, path in enumerate(paths):
+        db.session.add(Assembly(name=f'Assembly {i}', merged_file_path=str(path)))
+    db.session.commit()
+
+    report = StorageService.collect(grace=3600)
+
+    # Evicts down to 90% of the quota
+    assert [path.exists() for path in paths] == [False, False, False, True, True]
+    assert report['evicted'] == 3
+    assert [assembly.merged_file_path for assembly in Assembly.query.order_by(Assembly.id)] == \
+        [None, None, None, str(paths[3]), str(paths[4])]
+
+
+def test_manager_runs_in_background(storage):
+    orphan = _write(storage['temp'] / 'merge_script_old.py', age=10 ** 6)
+    manager = StorageManager(current_app._get_current_object(), interval=0.01, pause=0).start()
+    try:
+        deadline = time.time() + 5
+        while orphan.exists() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        manager.stop()
+    assert not orphan.exists()
@@ -0,0 +1,49 @@
+from benchmarks import baseline
+
+
+def _stats(median):
+    return {'median_ms': median, 'p95_ms': median, 'min_ms': median, 'iterations': 1}
+
+
+def test_time_stage_reports_latency():
+    calls = []
+    stats = baseline.time_stage(lambda: calls.append(1), iterations=5, warmup=2)
+    assert len(calls) == 7
+    assert stats['iterations'] == 5
+    assert 0 <= stats['min_ms'] <= stats['median_ms'] <= stats['p95_ms']
+
+
+def test_compare_flags_stages_over_threshold(tmp_path):
+    path = tmp_path / 'baseline.json'
+    baseline.save(path, {'decode': _stats(10.0), 'estimate_pose': _stats(40.0)}, {'model_complexity': 1})
+    previous = baseline.load(path)
+    assert previous['config'] == {'model_complexity': 1}
+
+    current = {'decode': _stats(12.0), 'estimate_pose': _stats(60.0), 'new_stage': _stats(5.0)}
+    regressions = baseline.compare(current, previous, threshold=0.25)
+    assert [name for name, *_ in regressions] == ['estimate_pose']
+    assert regressions[0][3] == 1.5
+
+
+def test_load_missing_baseline(tmp_path):
+    assert baseline.load(tmp_path / 'missing.json') is None
+
+
+def test_load_test_summary_compares_p95(tmp_path):
+    from benchmarks import load_test
+
+    stats_csv = tmp_path / 'locust_stats.csv'
+    stats_csv.write_text(
+        'Type,Name,Request Count,Failure Count,50%,95%,99%,Requests/s\n'
+        'GET,/api/parts,120,0,8,40,55,4.0\n'
+        'POST,/api/parts,30,1,18,90,120,1.0\n'
+        ',Aggregated,150,1,10,60,110,5.0\n'
+    )
+    stages = load_test.summarize(stats_csv)
+    assert stages['GET /api/parts'] == {
+        'requests': 120, 'failures': 0, 'median_ms': 8.0, 'p95_ms': 40.0, 'p99_ms': 55.0, 'rps': 4.0}
+    assert stages['Aggregated']['requests'] == 150
+
+    previous = {'stages': {'GET /api/parts': {'median_ms': 8.0, 'p95_ms': 20.0}}}
+    regressions = baseline.compare(stages, previous, threshold=0.25, metric='p95_ms')
+    assert regressions == [('GET /api/parts', 20.0, 40.0, 2.0)]
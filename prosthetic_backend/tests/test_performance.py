@@ -1,53 +1,59 @@
-import pytest
-import time
+import io
 import os
-import requests
+import time
+
+import pytest
+
+from benchmarks import bench_backend
 
-BASE_URL = "http://127.0.0.1:5000"  # Change if running on a different port
 
 @pytest.fixture
-def large_test_file(tmp_path):
-    """Creates a large temporary file (50MB) for testing."""
-    file_path = tmp_path / "large_test.stl"
-    with open(file_path, "wb") as f:
-        f.write(os.urandom(50 * 1024 * 1024))  # 50MB random data
-    return str(file_path)
-
-def test_upload_large_file(large_test_file):
-    """Tests if the app properly rejects large files."""
-    url = f"{BASE_URL}/parts"
-    files = {"file": open(large_test_file, "rb")}
-    data = {"name": "Large Test Part", "type": "stl"}
-
-    start_time = time.time()
-    try:
-        response = requests.post(url, files=files, data=data)
-        elapsed_time = time.time() - start_time
-
-        if response.status_code == 413:
-            print("✅ Large file correctly rejected (413 Payload Too Large)")
-        else:
-            assert response.status_code == 201, f"Failed: {response.json()}"
-            assert elapsed_time < 10, f"Upload took too long: {elapsed_time:.2f}s"
-    
-    except requests.exceptions.ConnectionError:
-        print("✅ Flask forcefully rejected large file (expected behavior)")
-
-def test_multiple_file_uploads():
-    """Sends multiple files to test response time."""
-    url = f"{BASE_URL}/parts"
-    test_file = {"file": ("test.stl", b"x" * 1024)}  # 1KB file
-    data = {"name": "Test Part", "type": "stl"}
-
-    start_time = time.time()
-    for _ in range(10):  # Upload 10 files
-        try:
-            print("The URL: ", url)
-            response = requests.post(url, files=test_file, data=data)
-            print("Here is the reponse: ", response.status_code, response.json())
-            assert response.status_code == 404, f"Failed: {response.json()}"
-        except requests.exceptions.ConnectionError:
-            pytest.fail("❌ Connection error occurred during multiple uploads")
-    
-    elapsed_time = time.time() - start_time
+def upload_folder(tmp_path, monkeypatch):
+    """Keep uploaded files and their cached derivatives out of the checkout."""
+    monkeypatch.setattr("config.Config.UPLOAD_FOLDER", tmp_path)
+    monkeypatch.setattr("config.Config.MESH_CACHE_FOLDER", tmp_path / "mesh_cache")
+    return tmp_path
+
+
+def test_upload_large_file(client, upload_folder):
+    """Tests if the app properly rejects files over MAX_CONTENT_LENGTH."""
+    data = {
+        "file": (io.BytesIO(os.urandom(50 * 1024 * 1024)), "large_test.stl"),
+        "name": "Large Test Part",
+        "type": "stl",
+    }
+    response = client.post("/api/parts", data=data, content_type="multipart/form-data")
+    assert response.status_code == 413
+
+
+def test_multiple_file_uploads(client, upload_folder):
+    """Uploads several generated meshes and checks they are all stored quickly."""
+    mesh = bench_backend.stl_mesh(subdivisions=3)
+
+    start_time = time.perf_counter()
+    for i in range(10):
+        data = {"file": (io.BytesIO(mesh), f"part_{i}.stl"), "name": f"Test Part {i}", "type": "stl"}
+        response = client.post("/api/parts", data=data, content_type="multipart/form-data")
+        assert response.status_code == 201, response.get_json()
+        assert response.get_json()["model_metadata"]["faces"] == 1280
+    elapsed_time = time.perf_counter() - start_time
+
     assert elapsed_time < 5, f"Multiple uploads took too long: {elapsed_time:.2f}s"
+
+
+def test_benchmark_harness_runs(tmp_path, capsys):
+    """Runs every harness scenario at a tiny size."""
+    exit_code = bench_backend.main([
+        "--iterations", "1", "--list-iterations", "1", "--merge-iterations", "1",
+        "--mesh-subdivisions", "1", "--rows", "50", "--assembly-sizes", "5", "--merge-parts", "2",
+        "--interference-parts", "3",
+        "--baseline", str(tmp_path / "backend.json"), "--update-baseline",
+    ])
+    assert exit_code == 0
+
+    output = capsys.readouterr().out
+    for stage in ("upload/80_faces", "list/parts/50_rows", "sync_delta/50_rows", "assembly_detail/5_parts",
+                  "merge/2_parts", "merge_stream/2_parts", "interference/3_parts", "export_glb/80_faces",
+                  "thumbnail/80_faces", "match/50_rows", "match_lookup/50_rows", "similar/50_rows"):
+        assert stage in output
+    assert (tmp_path / "backend.json").exists()
@@ -0,0 +1,67 @@
+import json
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app import create_app
+from server import Gateway, wsgi_to_asgi
+
+
+def test_gateway_routes_by_path():
+    """Test /analyze goes to the measurement app and everything else to Flask"""
+    measurement = FastAPI()
+
+    @measurement.get('/analyze/ping')
+    async def ping():
+        return {'service': 'measurement'}
+
+    backend, thread_limit = wsgi_to_asgi(create_app(), 2)
+    with TestClient(Gateway(backend, measurement, thread_limit)) as client:
+        assert client.get('/analyze/ping').json() == {'service': 'measurement'}
+        assert client.get('/test').text == 'Backend is working!'
+        assert client.get('/api/parts').status_code == 200
+        # A shared prefix is not enough to reach the measurement app
+        assert client.get('/analyzer').json() == {'error': 'Not found'}
+
+
+WORKER_SCRIPT = textwrap.dedent("""
+    import json, os, sys
+    from server import Arbiter, bind_socket
+
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': json.dumps(os.getpid()).encode()})
+
+    sock = bind_socket('127.0.0.1:0')
+    print(sock.getsockname()[1], flush=True)
+    Arbiter(app, sock, workers=2, max_requests=2, graceful_timeout=5).run()
+""")
+
+
+def test_workers_are_recycled():
+    """Test workers are replaced after their request limit and stop cleanly"""
+    process = subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT], stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(process.stdout.readline())
+        pids = set()
+        for _ in range(12):
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=10) as response:
+                pids.add(json.loads(response.read()))
+            # uvicorn checks its request limit on a 0.1 s tick
+            time.sleep(0.25)
+        # Two workers serving about two requests each
+        assert len(pids) >= 4
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=20) == 0
+    finally:
+        process.kill()
+        process.stdout.close()
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from app.utils import blob_storage
+
+
+def test_local_refs_are_paths(tmp_path):
+    path = tmp_path / 'part.stl'
+    path.write_bytes(b'solid')
+    ref = blob_storage.put(path, 'uploads')
+    assert ref == str(path)
+    assert blob_storage.fetch(ref) == path
+    assert blob_storage.exists(ref)
+    blob_storage.delete(ref)
+    assert not path.exists()
+    assert not blob_storage.exists(ref)
+
+
+def sign(ref, expires_in=60):
+    return blob_storage._serializer().dumps({'ref': str(ref), 'exp': int(time.time() + expires_in)})
+
+
+def test_download_tokens(storage_dirs, monkeypatch):
+    ref = str(storage_dirs / 'uploads' / 'part.stl')
+    token = sign(ref)
+    assert blob_storage.verify_token(token) == ref
+    assert blob_storage.verify_token(token[:-2] + 'xx') is None
+    assert blob_storage.verify_token(sign(ref, expires_in=-1)) is None
+
+    monkeypatch.setattr('config.Config.SECRET_KEY', 'rotated')
+    assert blob_storage.verify_token(token) is None
+
+
+def test_download_tokens_only_reach_storage_folders(client, storage_dirs):
+    """Test validly signed links to files outside the upload and merged folders are refused"""
+    (storage_dirs / 'secret.txt').write_text('secret')
+    for ref in ('/etc/passwd', storage_dirs / 'secret.txt', storage_dirs / 'uploads' / '..' / 'secret.txt'):
+        assert blob_storage.verify_token(sign(ref)) is None
+        assert client.get(f'/api/blobs/{sign(ref)}').status_code == 403
+    with pytest.raises(ValueError):
+        blob_storage.url('/etc/passwd')
+
+
+def test_default_secret_key_is_refused(storage_dirs, monkeypatch):
+    ref = str(storage_dirs / 'uploads' / 'part.stl')
+    token = sign(ref)
+    monkeypatch.setattr('config.Config.SECRET_KEY', 'dev')
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        blob_storage.url(ref)
+    assert blob_storage.verify_token(token) is None
+
+
+def test_s3_round_trip(tmp_path, monkeypatch):
+    """Test objects are stored in the bucket and the local folder is only a cache"""
+    boto3 = pytest.importorskip('boto3')
+    moto = pytest.importorskip('moto')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setattr('config.Config.BLOB_STORAGE', 's3')
+    monkeypatch.setattr('config.Config.S3_BUCKET', 'parts')
+    monkeypatch.setattr('config.Config.S3_REGION', 'us-east-1')
+    monkeypatch.setattr('config.Config.UPLOAD_FOLDER', tmp_path / 'uploads')
+    monkeypatch.setattr(blob_storage, '_stores', {})
+
+    with moto.mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='parts')
+        (tmp_path / 'uploads').mkdir()
+        path = tmp_path / 'uploads' / 'part.stl'
+        path.write_bytes(b'solid part')
+
+        ref = blob_storage.put(path, 'uploads')
+        assert ref == 's3://parts/uploads/part.stl'
+        path.unlink()
+        assert blob_storage.exists(ref)
+        assert blob_storage.fetch(ref) == path
+        assert path.read_bytes() == b'solid part'
+
+        url = blob_storage.url(ref, expires=60)
+        assert url.startswith('https://parts.s3.amazonaws.com/uploads/part.stl?')
+        assert 'Expires=' in url or 'X-Amz-Expires=60' in url
+
+        blob_storage.delete(ref)
+        assert not path.exists()
+        assert not blob_storage.exists(ref)
@@ -0,0 +1,96 @@
+import numpy as np
+import trimesh
+
+from app.utils.bvh import MeshBVH, contains_points, intersecting_triangles, triangles_intersect
+from app.utils.transforms import transform_matrix
+
+
+
+
+def test_build_bounds_cover_every_triangle():
+    """Test that each leaf box contains its triangles and the root covers the mesh."""
+    mesh = trimesh.creation.icosphere(subdivisions=3, radius=5)
+    bvh = MeshBVH.build(mesh.vertices, mesh.faces)
+
+    assert np.allclose(np.array(bvh.bounds), mesh.bounds)
+    assert sorted(map(tuple, np.sort(bvh.faces, axis=1))) == sorted(map(tuple, np.sort(mesh.faces, axis=1)))
+    triangles = bvh.vertices[bvh.faces]
+    for leaf in range(bvh.n_leaves):
+        faces = bvh.leaf_faces(np.array([leaf]))[0]
+        faces = faces[faces >= 0]
+        node = bvh.n_leaves - 1 + leaf
+        if len(faces):
+            assert np.all(triangles[faces].min(axis=(0, 1)) >= bvh.lo[node])
+            assert np.all(triangles[faces].max(axis=(0, 1)) <= bvh.hi[node])
+
+
+def test_world_boxes_match_transformed_corners():
+    mesh = trimesh.creation.icosphere(subdivisions=2, radius=3)
+    bvh = MeshBVH.build(mesh.vertices, mesh.faces)
+    matrix = transform_matrix({'x': 4}, {'x': 0.7, 'y': 0.1, 'z': -1.3}, {'x': 1, 'y': 2, 'z': 0.5})
+    lo, hi = bvh.world_boxes(matrix)
+
+    node = 5
+    corners = np.array(np.meshgrid(*zip(bvh.lo[node], bvh.hi[node]), indexing='ij')).reshape(3, -1).T
+    moved = corners @ matrix[:3, :3].T + matrix[:3, 3]
+    assert np.allclose(lo[node], moved.min(axis=0))
+    assert np.allclose(hi[node], moved.max(axis=0))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    mesh = trimesh.creation.box(extents=(1, 2, 3))
+    bvh = MeshBVH.build(mesh.vertices, mesh.faces)
+    bvh.save(tmp_path / 'box.bvh.npz')
+
+    loaded = MeshBVH.load(tmp_path / 'box.bvh.npz')
+    assert np.array_equal(loaded.faces, bvh.faces)
+    assert np.array_equal(loaded.lo, bvh.lo)
+    assert loaded.depth == bvh.depth
+
+
+def test_intersecting_triangles_matches_brute_force():
+    """Test the hierarchy finds exactly the triangle pairs an all-pairs test finds."""
+    mesh = trimesh.creation.icosphere(subdivisions=2, radius=10)
+    bvh = MeshBVH.build(mesh.vertices, mesh.faces)
+    matrix_a = transform_matrix()
+    matrix_b = transform_matrix({'x': 15, 'y': 3}, {'x': 0.2, 'z': 0.4}, {'x': 1.2})
+    world_a, world_b = bvh.world_triangles(matrix_a), bvh.world_triangles(matrix_b)
+
+    faces_a, faces_b = intersecting_triangles(bvh, matrix_a, bvh, matrix_b)
+
+    a, b = np.meshgrid(np.arange(len(world_a)), np.arange(len(world_b)), indexing='ij')
+    a, b = a.ravel(), b.ravel()
+    hit = triangles_intersect(world_a[a], world_b[b])
+    assert len(faces_a) > 0
+    assert set(zip(faces_a.tolist(), faces_b.tolist())) == set(zip(a[hit].tolist(), b[hit].tolist()))
+
+
+def test_separated_parts_have_no_contacts():
+    mesh = trimesh.creation.icosphere(subdivisions=3, radius=10)
+    bvh = MeshBVH.build(mesh.vertices, mesh.faces)
+    faces_a, _ = intersecting_triangles(bvh, transform_matrix(), bvh, transform_matrix({'x': 20.5}))
+    assert len(faces_a) == 0
+
+
+def test_touching_triangles_do_not_intersect():
+    t1 = np.array([[[0, 0, 0], [1, 0, 0], [0, 1, 0]]], dtype=float)
+    t2 = t1 + [0, 0, 1]
+    crossing = np.array([[[0.2, 0.2, -1], [0.2, 0.2, 1], [0.3, 0.25, 0]]], dtype=float)
+    assert not triangles_intersect(t1, t1)[0]
+    assert not triangles_intersect(t1, t2)[0]
+    assert triangles_intersect(t1, crossing)[0]
+
+
+def test_contains_points():
+    mesh = trimesh.creation.icosphere(subdivisions=3, radius=10)
+    triangles = mesh.vertices[mesh.faces]
+    inside = contains_points(triangles, np.array([[0, 0, 0], [3, -2, 1], [12, 0, 0], [0, 30, 0]], dtype=float))
+    assert inside.tolist() == [True, True, False, False]
+
+
+def test_transform_matches_blender_xyz_euler():
+    """Test rotation order X, then Y, then Z, scale before rotation, then location."""
+    matrix = transform_matrix({'x': 1, 'y': 2, 'z': 3}, {'x': 0.3, 'y': -0.2, 'z': 1.1}, {'x': 2, 'y': 1, 'z': 0.5})
+    expected = trimesh.transformations.euler_matrix(0.3, -0.2, 1.1, 'sxyz') @ np.diag([2, 1, 0.5, 1])
+    expected[:3, 3] = [1, 2, 3]
+    assert np.allclose(matrix, expected)
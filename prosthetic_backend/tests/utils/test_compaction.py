@@ -0,0 +1,58 @@
+import numpy as np
+import trimesh
+
+from app.utils.compaction import compact, unique_rows, weld
+
+
+def _soup(mesh):
+    vertices = mesh.vertices[mesh.faces].reshape(-1, 3)
+    return vertices, np.arange(len(vertices)).reshape(-1, 3)
+
+
+def test_compact_welds_triangle_soup():
+    """Test an STL-style soup welds back to the indexed mesh"""
+    mesh = trimesh.creation.icosphere(subdivisions=3)
+    vertices, faces, stats = compact(*_soup(mesh))
+
+    assert stats['vertices_before'] == 3 * len(mesh.faces)
+    assert stats['vertices_after'] == len(vertices) == len(mesh.vertices)
+    assert stats['faces_after'] == len(faces) == len(mesh.faces)
+    np.testing.assert_allclose(vertices[faces], mesh.vertices[mesh.faces])
+
+
+def test_weld_within_tolerance():
+    """Test near-coincident vertices merge, including across grid cells"""
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 10, (200, 3))
+    noisy = np.concatenate([points, points + rng.normal(0, 1e-7, points.shape)])
+
+    welded, inverse = weld(noisy, tolerance=1e-5)
+    assert len(welded) == len(points)
+    np.testing.assert_array_equal(inverse[:200], inverse[200:])
+
+    welded, _ = weld(noisy, tolerance=0.0)
+    assert len(welded) == len(noisy)
+
+
+def test_compact_drops_degenerate_and_duplicate_faces():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1e-9], [2, 0, 0], [9, 9, 9]], dtype=float)
+    faces = np.array([
+        [0, 1, 2],
+        [2, 1, 0],  # same triangle, opposite winding
+        [0, 1, 3],  # collapses when 3 welds onto 0
+        [0, 1, 4],  # zero area
+    ])
+    vertices, faces, stats = compact(vertices, faces, tolerance=1e-6)
+    assert vertices[faces].tolist() == [[[0, 0, 0], [1, 0, 0], [0, 1, 0]]]
+    assert len(vertices) == 3  # unreferenced vertices are dropped
+    assert stats['degenerate_faces'] == 2
+    assert stats['duplicate_faces'] == 1
+
+
+def test_unique_rows_matches_numpy():
+    rows = np.random.default_rng(1).integers(0, 4, (500, 3))
+    unique, first, inverse = unique_rows(rows)
+    expected, expected_first, expected_inverse = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+    np.testing.assert_array_equal(unique, expected)
+    np.testing.assert_array_equal(first, expected_first)
+    np.testing.assert_array_equal(inverse, expected_inverse.reshape(-1))
@@ -0,0 +1,72 @@
+import io
+import json
+import struct
+
+import numpy as np
+import trimesh
+
+from app.utils.gltf import optimize, quantize, split_primitives, to_glb
+
+
+def _chunks(data):
+    magic, version, length = struct.unpack_from('<4sII', data)
+    assert (magic, version, length) == (b'glTF', 2, len(data))
+    json_length, _ = struct.unpack_from('<I4s', data, 12)
+    document = json.loads(data[20:20 + json_length])
+    return document, data[28 + json_length:]
+
+
+def test_glb_round_trip():
+    """Test the GLB reloads with the same shape and is smaller than STL"""
+    mesh = trimesh.creation.icosphere(subdivisions=5, radius=10)
+    data = to_glb(mesh.vertices, mesh.faces)
+    assert len(data) * 3 < len(mesh.export(file_type='stl'))
+
+    document, binary = _chunks(data)
+    assert document['extensionsRequired'] == ['KHR_mesh_quantization']
+    assert len(binary) == document['buffers'][0]['byteLength']
+    assert all(view['byteOffset'] % 4 == 0 for view in document['bufferViews'])
+
+    loaded = trimesh.load(io.BytesIO(data), file_type='glb', force='mesh')
+    assert len(loaded.faces) == len(mesh.faces)
+    np.testing.assert_allclose(loaded.bounds, mesh.bounds, atol=1e-3)
+    np.testing.assert_allclose(loaded.area, mesh.area, rtol=1e-4)
+
+
+def test_quantize_keeps_creases():
+    """Test curved surfaces weld while a box keeps one vertex per face corner"""
+    box = trimesh.creation.box(extents=(10, 20, 30))
+    positions, normals, faces, _, _ = quantize(box.vertices, box.faces)
+    assert len(positions) == 24 and len(faces) == 12
+    np.testing.assert_array_equal(np.abs(normals).max(axis=1), 127)
+
+    sphere = trimesh.creation.icosphere(subdivisions=3)
+    positions, _, faces, scale, offset = quantize(sphere.vertices, sphere.faces)
+    assert len(positions) == len(sphere.vertices)
+    distances = np.linalg.norm((positions * scale + offset)[:, None] - sphere.vertices[None], axis=-1)
+    assert distances.min(axis=1).max() <= scale
+
+
+def test_quantize_drops_degenerate_faces():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [2, 0, 0]], dtype=float)
+    faces = np.array([[0, 1, 2], [0, 1, 3], [1, 1, 2]])
+    _, _, faces, _, _ = quantize(vertices, faces)
+    assert len(faces) == 1
+
+
+def test_optimize_orders_vertices_by_first_use():
+    sphere = trimesh.creation.icosphere(subdivisions=3)
+    vertex_order, faces = optimize(np.asarray(sphere.vertices), np.asarray(sphere.faces))
+    first_use = np.unique(faces.ravel(), return_index=True)[1]
+    assert np.all(np.diff(first_use) > 0)
+    np.testing.assert_array_equal(np.sort(vertex_order), np.arange(len(sphere.vertices)))
+    assert len(faces) == len(sphere.faces)
+
+
+def test_split_primitives_limits_vertices():
+    sphere = trimesh.creation.icosphere(subdivisions=4)
+    faces = np.asarray(sphere.faces)
+    parts = list(split_primitives(faces, max_vertices=500))
+    assert len(parts) > 1
+    assert all(len(used) <= 500 for used, _ in parts)
+    np.testing.assert_array_equal(np.concatenate([used[local] for used, local in parts]), faces)
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from app.utils import metrics
+
+
+def test_histogram_render():
+    """Test cumulative buckets, sum and count in the text format."""
+    histogram = metrics.Histogram('demo_seconds', 'Demo.', ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='decode')
+    histogram.observe(0.5, stage='decode')
+    histogram.observe(5, stage='decode')
+
+    text = histogram.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="decode",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="decode",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{stage="decode",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="decode"} 3' in text
+
+
+def test_stage_records_request_timings():
+    timings = metrics.begin_request('test')
+    with metrics.stage('parse'):
+        pass
+    assert [name for name, _ in timings] == ['parse']
+    assert metrics.server_timing([('parse', 0.0125)], 0.02) == 'parse;dur=12.50, total;dur=20.00'
+
+
+def test_server_timing_header_and_metrics_endpoint(client):
+    """Test that Flask responses carry Server-Timing and /metrics is scrapeable."""
+    response = client.get('/api/parts')
+    assert response.status_code == 200
+    assert 'db;dur=' in response.headers['Server-Timing']
+    assert 'total;dur=' in response.headers['Server-Timing']
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert 'stage_duration_seconds_count{service="backend",stage="db"}' in body
+    assert 'http_request_duration_seconds_count{service="backend",method="GET",route="/api/parts",status="200"}' in body
+
+
+def test_core_does_not_import_flask():
+    """Test the measurement service can time and profile requests without loading the Flask app."""
+    code = ("import sys, telemetry.metrics, telemetry.profiling; "
+            "print(sorted({'flask', 'sqlalchemy', 'app'} & set(sys.modules)))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).resolve().parents[2])
+    assert result.stdout.strip() == '[]'
@@ -0,0 +1,35 @@
+import numpy as np
+import trimesh
+
+from app.utils.part_index import PartIndex, dimensions, principal_extents
+
+
+def test_principal_extents_ignore_orientation():
+    """Test a rotated box reports its own edge lengths, not its bounding box"""
+    box = trimesh.creation.box(extents=(40, 10, 20))
+    box.apply_transform(trimesh.transformations.rotation_matrix(0.7, [1, 1, 0]))
+    np.testing.assert_allclose(principal_extents(box.vertices), [40, 20, 10], atol=1e-6)
+
+
+def test_dimensions_of_a_cylinder():
+    sizes = dimensions([8, 30, 8])
+    assert sizes['length'] == 30 and sizes['width'] == sizes['depth'] == 8
+    np.testing.assert_allclose(sizes['circumference'], np.pi * 8)
+
+
+def test_query_is_nearest_in_scale():
+    """Test distance is symmetric in ratio and limb types are searched separately"""
+    index = PartIndex(
+        ids=[1, 2, 3, 4],
+        limbs=['leg', 'leg', 'arm', 'leg'],
+        features=[[40, 30, 10], [44, 33, 11], [40, 30, 10], [0, 0, 0]])
+    assert index.size == 3
+
+    hits = index.query([42, 31.5, 10.5], k=2, limb='leg')
+    assert [part_id for part_id, _, _ in hits] in ([1, 2], [2, 1])
+    # 40 -> 42 and 42 -> 44 are both about 5% scaling
+    np.testing.assert_allclose(hits[0][2], hits[1][2], rtol=0.05)
+
+    assert [part_id for part_id, _, _ in index.query([40, 30, 10], k=1, limb='arm')] == [3]
+    assert len(index.query([40, 30, 10], k=10)) == 3
+    assert index.query([40, 30, 10], limb='hand') == []
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import create_app
+from app.models.database import db
+from app.utils import profiling
+from config import Config
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    class ProfiledConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+        PROFILE_TOKEN = 'secret'
+        PROFILE_FOLDER = tmp_path / 'profiles'
+        PROFILE_INTERVAL = 0.001
+
+    app = create_app(ProfiledConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_disabled_profiling_installs_no_hooks():
+    app = create_app()
+    hooks = [f.__name__ for funcs in app.before_request_funcs.values() for f in funcs]
+    assert '_start_profile' not in hooks
+    assert not any(rule.rule.startswith('/api/profiles') for rule in app.url_map.iter_rules())
+
+
+def test_token_header_profiles_flask_request(profiled_app):
+    client = profiled_app.test_client()
+    assert profiling.ID_HEADER not in client.get('/api/parts').headers
+
+    response = client.get('/api/parts', headers={profiling.TOKEN_HEADER: 'secret'})
+    assert response.status_code == 200
+    profile_id = response.headers[profiling.ID_HEADER]
+
+    assert client.get('/api/profiles').status_code == 403
+    assert client.get('/api/profiles', headers={profiling.TOKEN_HEADER: 'wrong'}).status_code == 403
+    auth = {profiling.TOKEN_HEADER: 'secret'}
+    listed = client.get('/api/profiles', headers=auth).get_json()['profiles']
+    assert [(p['id'], p['path'], p['status'], p['trigger']) for p in listed] == [
+        (profile_id, '/api/parts', 200, 'header')]
+
+    folded = client.get(f'/api/profiles/{profile_id}', headers=auth)
+    assert folded.status_code == 200
+    assert all(line.rpartition(' ')[2].isdigit() for line in folded.get_data(as_text=True).splitlines())
+    flamegraph = client.get(f'/api/profiles/{profile_id}/flamegraph', headers=auth)
+    assert flamegraph.content_type == profiling.SVG_CONTENT_TYPE
+    assert flamegraph.get_data(as_text=True).startswith('<svg')
+    assert client.get('/api/profiles/../app.db', headers=auth).status_code == 404
+
+
+def test_followed_work_is_sampled(tmp_path):
+    """Test that a thread running work for a profiled request shows in its profile."""
+    profiler = profiling.RequestProfiler(profiling.ProfileStore(tmp_path), sample_rate=1.0, interval=0.001)
+    assert profiler.trigger({}) == 'sampled'
+    profile = profiler.start('test', 'GET', '/busy', 'sampled')
+    worker = threading.Thread(target=profiling.follow(busy), args=(0.1,))
+    worker.start()
+    worker.join()
+    profiler.finish(profile, 200, 0.1)
+    assert profiling.follow(busy) is busy
+
+    metadata, folded = profiler.store.get(profile.id)
+    assert metadata['samples'] > 0
+    assert 'busy (' in folded
+
+
+def test_store_keeps_newest_profiles(tmp_path):
+    store = profiling.ProfileStore(tmp_path, limit=2)
+    ids = []
+    for started in range(3):
+        profile = profiling.Profile('test', 'GET', '/', 'sampled', 0.005)
+        profile.started = started
+        store.save(profile)
+        ids.append(profile.id)
+    assert [p['id'] for p in store.list()] == ids[:0:-1]
+    assert store.get(ids[0]) is None
+
+
+def test_flamegraph_widths_follow_sample_counts():
+    svg = profiling.render_flamegraph('main;parse 3\nmain;<render> 1\n', width=400)
+    assert 'main (4 samples, 100.0%)' in svg
+    assert '&lt;render&gt; (1 samples, 25.0%)' in svg
+    assert 'width="300.0"' in svg and 'width="100.0"' in svg
+
+
+def on_loop(seconds):
+    busy(seconds)
+
+
+def test_asgi_middleware_profiles_requests(tmp_path):
+    """Test a profile holds the request's followed work but not the shared loop thread."""
+    profiler = profiling.RequestProfiler(profiling.ProfileStore(tmp_path), token='secret', interval=0.001)
+
+    async def slow(request):
+        on_loop(0.02)
+        await run_in_threadpool(profiling.follow(busy), 0.02)
+        return PlainTextResponse('done')
+
+    app = profiling.ProfilingMiddleware(Starlette(routes=[Route('/analyze/slow', slow)]), profiler)
+    client = TestClient(app)
+    assert profiling.ID_HEADER.lower() not in client.get('/analyze/slow').headers
+    response = client.get('/analyze/slow', headers={profiling.TOKEN_HEADER: 'secret'})
+    profile_id = response.headers[profiling.ID_HEADER]
+    metadata, folded = profiler.store.get(profile_id)
+    assert (metadata['service'], metadata['path'], metadata['status']) == ('measurement', '/analyze/slow', 200)
+    assert 'busy (' in folded
+    assert 'on_loop (' not in folded
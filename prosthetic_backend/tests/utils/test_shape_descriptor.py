@@ -0,0 +1,36 @@
+import numpy as np
+import trimesh
+
+from app.utils.shape_descriptor import SIZE, ShapeIndex, decode, describe, encode
+
+
+def test_shape_descriptor_is_rotation_invariant():
+    """Test moved, rotated and rescaled copies describe alike and other shapes do not"""
+    sphere = trimesh.creation.icosphere(subdivisions=4)
+    moved = sphere.copy()
+    moved.apply_transform(trimesh.transformations.random_rotation_matrix(rand=np.random.default_rng(1).random(3)))
+    moved.apply_scale(3)
+    moved.apply_translation([5, 0, 2])
+    finer = trimesh.creation.icosphere(subdivisions=5)
+    box = trimesh.creation.box(extents=(1, 2, 3))
+
+    descriptor = describe(sphere.vertices, sphere.faces)
+    assert descriptor.shape == (SIZE,)
+    np.testing.assert_allclose(decode(encode(descriptor)), descriptor, atol=1e-3)
+    assert np.linalg.norm(describe(moved.vertices, moved.faces) - descriptor) < 1e-3
+    close = np.linalg.norm(describe(finer.vertices, finer.faces) - descriptor)
+    far = np.linalg.norm(describe(box.vertices, box.faces) - descriptor)
+    assert close * 5 < far
+
+
+def test_shape_index_matches_exact_search():
+    rng = np.random.default_rng(0)
+    descriptors = rng.random((2000, SIZE)).astype(np.float32)
+    index = ShapeIndex(np.arange(2000) + 1, descriptors)
+    query = descriptors[10] + rng.normal(0, 0.01, SIZE).astype(np.float32)
+
+    hits = index.query(query, k=5, candidates=2000)
+    exact = np.argsort(np.linalg.norm(descriptors - query, axis=1))[:5] + 1
+    assert [part_id for part_id, _ in hits] == exact.tolist()
+    assert hits[0][0] == 11
+    assert 11 not in [part_id for part_id, _ in index.query(query, k=5, exclude=11)]
@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+import trimesh
+
+from app.utils.thumbnail import encode, rasterize, render
+
+
+def test_render_frames_the_mesh_on_transparent_background():
+    box = trimesh.creation.box(extents=(10, 20, 30))
+    image = render(box.vertices, box.faces, size=64)
+    assert image.shape == (64, 64, 4) and image.dtype == np.uint8
+
+    alpha = image[..., 3]
+    assert alpha[0, 0] == 0 and alpha[32, 32] == 255
+    # Fitted inside the margin, touching it on the longer side
+    rows, cols = np.nonzero(alpha)
+    assert rows.min() >= 2 and rows.max() <= 61 and cols.min() >= 2 and cols.max() <= 61
+    assert max(rows.max() - rows.min(), cols.max() - cols.min()) >= 54
+    # Flat shading gives the visible sides different brightness
+    assert len(np.unique(image[alpha == 255][:, 0])) >= 3
+
+
+def test_rasterize_keeps_nearest_triangle():
+    # Two overlapping triangles, the second nearer
+    far = [[[0, 0, 5], [8, 0, 5], [0, 8, 5]]]
+    near = [[[2, 2, 1], [8, 2, 1], [2, 8, 1]]]
+    owner = rasterize(np.array(far + near, dtype=np.float64), 8)
+    assert owner[3, 3] == 1
+    assert owner[0, 0] == 0
+    assert owner[7, 7] == -1
+    # Drawing order does not matter
+    swapped = rasterize(np.array(near + far, dtype=np.float64), 8)
+    np.testing.assert_array_equal(swapped, np.where(owner >= 0, 1 - owner, -1))
+
+
+def test_render_empty_mesh():
+    image = render(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64), size=16)
+    assert not image.any()
+
+
+def test_encode_formats():
+    sphere = trimesh.creation.icosphere(subdivisions=2)
+    image = render(sphere.vertices, sphere.faces, size=32)
+    png = encode(image, 'png')
+    webp = encode(image, 'webp')
+    assert png.startswith(b'\x89PNG')
+    assert webp[:4] == b'RIFF' and webp[8:12] == b'WEBP'
+    decoded = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_UNCHANGED)
+    np.testing.assert_array_equal(decoded, image)